@@ -0,0 +1,144 @@
+"""
+基准测试使用的合成数据
+
+所有数据在本地确定性地生成，不需要网络、API key 或 MCP server：
+模型的 chunk 流由 MockModel 录制一次后重放，航班结果由 SerpApi 替身的 build_results 生成。
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+from mcp.types import Tool
+
+from loadtest.mock_serpapi import build_results
+from model.MockModel import MockModel
+from model.ModelInterface import ModelInterface
+
+# google_flights 以脚本方式运行，它的模块不在包中
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server", "google_flights")
+)
+from result_class import FlightSearchParams  # noqa: E402
+
+FLIGHT_SEARCH_ARGUMENTS = {
+    "departure_id": "SFO",
+    "arrival_id": "JFK",
+    "outbound_date": "2025-06-01",
+    "return_date": "2025-06-08",
+    "type": 1,
+    "max_results": 3,
+}
+
+
+def record_stream(**mock_args) -> list:
+    """用不限速的 MockModel 生成一次完整的 chunk 流并保存为列表"""
+    model = MockModel(tokens_per_second=0, time_to_first_token=0, **mock_args)
+    tools = [{"type": "function", "function": {"name": call["name"]}} for call in mock_args.get("tool_calls") or []]
+
+    async def collect():
+        return [chunk async for chunk in await model.get_chat_completion([], tools)]
+
+    return asyncio.run(collect())
+
+
+def answer_stream(thinking_tokens: int = 200, answer_tokens: int = 300) -> list:
+    """只有思考过程和回答的 chunk 流"""
+    return record_stream(thinking_tokens=thinking_tokens, answer_tokens=answer_tokens)
+
+
+def tool_call_stream(tool_calls: int = 3, arguments_chunk_size: int = 4) -> list:
+    """思考过程之后并发发起多个工具调用的 chunk 流，参数按 arguments_chunk_size 个字符分片"""
+    calls = [
+        {"name": f"search_flights_{i}", "arguments": {**FLIGHT_SEARCH_ARGUMENTS, "note": "x" * 200}}
+        for i in range(tool_calls)
+    ]
+    return record_stream(
+        thinking_tokens=50, answer_tokens=0, tool_calls=calls, arguments_chunk_size=arguments_chunk_size
+    )
+
+
+async def replay(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+
+class ReplayModel(ModelInterface):
+    """重放录制的 chunk 流：最后一条消息是工具结果时返回回答，否则返回工具调用"""
+
+    def __init__(self, tool_chunks: list, answer_chunks: list):
+        self.tool_chunks = tool_chunks
+        self.answer_chunks = answer_chunks
+
+    async def get_chat_completion(self, messages, tools=None):
+        if messages and messages[-1].get("role") == "tool":
+            return replay(self.answer_chunks)
+        return replay(self.tool_chunks)
+
+
+def mcp_tools(count: int = 30) -> list[Tool]:
+    """与实际 server 规模相当的工具列表，参数结构取自航班搜索和文件系统工具"""
+    flight_schema = FlightSearchParams.model_json_schema()
+    file_schema = {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "Path of the file"},
+            "edits": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"oldText": {"type": "string"}, "newText": {"type": "string"}},
+                    "required": ["oldText", "newText"],
+                },
+            },
+            "dryRun": {"type": "boolean", "default": False},
+        },
+        "required": ["path", "edits"],
+    }
+    return [
+        Tool(
+            name=f"tool_{i}",
+            description=f"Synthetic tool {i}. " + "Detailed usage notes for the model. " * 10,
+            inputSchema=flight_schema if i % 2 else file_schema,
+        )
+        for i in range(count)
+    ]
+
+
+def tool_arguments_text() -> str:
+    """一次航班搜索工具调用的完整参数 JSON"""
+    return json.dumps({**FLIGHT_SEARCH_ARGUMENTS, "note": "x" * 200})
+
+
+def serpapi_payload(flights: int = 200) -> dict:
+    """一份较大的 SerpApi 航班搜索结果"""
+    return build_results({**FLIGHT_SEARCH_ARGUMENTS, "engine": "google_flights"}, flights=flights)
+
+
+def chat_history(turns: int = 10) -> list[dict]:
+    """gradio_app 的 internal_messages：多轮对话，每轮包含一次工具调用和较长的工具结果"""
+    tool_result = json.dumps(serpapi_payload(10)["best_flights"], ensure_ascii=False)
+    messages = [{"role": "system", "content": "You are a helpful travel assistant."}]
+    for turn in range(turns):
+        call_id = f"call_{turn}"
+        messages.extend(
+            [
+                {"role": "user", "content": f"Find me a flight from SFO to JFK, option {turn}."},
+                {
+                    "role": "assistant",
+                    "content": "",
+                    "tool_calls": [
+                        {
+                            "id": call_id,
+                            "type": "function",
+                            "index": 0,
+                            "function": {"name": "search_flights", "arguments": tool_arguments_text()},
+                        }
+                    ],
+                },
+                {"role": "tool", "tool_call_id": call_id, "content": tool_result},
+                {"role": "assistant", "content": "Here are the cheapest flights I found. " * 20},
+            ]
+        )
+    return messages
@@ -0,0 +1,300 @@
+"""
+编排热点路径的微基准测试
+
+每轮对话都会经过的代码：流式响应解析和工具调用参数累积、工具列表格式转换、JSON 完整性检查、
+航班结果的 pydantic 校验和序列化，以及 gradio_app 每个 chunk 都要进行的历史记录序列化。
+全部使用 bench.fixtures 中的合成数据离线运行。
+
+每个基准报告单次操作耗时（多轮采样的最小值、中位数、平均值和标准差，单位微秒）和内存分配
+（tracemalloc 统计的单次操作峰值和残留字节数）。结果可写入 JSON 文件，并与之前的结果对比，
+耗时或峰值内存超过阈值时以非零状态码退出；耗时的比较还要求本次最快的采样慢于基线采样的中位数，
+避免把运行之间的噪声报告为回归。
+
+运行（在仓库根目录）:
+    python -m bench.run_bench --output bench_result.json
+    python -m bench.run_bench --compare bench_result.json --threshold 0.25
+    python -m bench.run_bench --filter flights
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from bench import fixtures
+from loadtest.run_loadtest import git_revision
+
+
+@dataclass
+class Benchmark:
+    name: str
+    description: str
+    # 执行一次被测操作；异步操作返回协程
+    run: Callable
+    is_async: bool = False
+
+
+def build_benchmarks() -> list[Benchmark]:
+    from client.LLMClient import LLMClient
+    from result_class import FlightsResponseModel
+    from util.mytools import get_tools_format, is_valid_json
+
+    answer_chunks = fixtures.answer_stream()
+    tool_chunks = fixtures.tool_call_stream()
+    # 不连接 MCP server：工具调用走"找不到 server"的分支，直接返回错误结果
+    llm_client = LLMClient(model=fixtures.ReplayModel(tool_chunks, answer_chunks), watch_config=False)
+    llm_client.available_tools = [
+        {"type": "function", "function": {"name": f"search_flights_{i}"}} for i in range(3)
+    ]
+    # 关闭调用日志，避免把终端输出的耗时算进去
+    logging.getLogger("client.MCPClient").setLevel(logging.WARNING)
+
+    tools = fixtures.mcp_tools()
+    arguments = fixtures.tool_arguments_text()
+    # 流式累积参数时每收到一个 chunk 都会检查一次当前前缀
+    argument_prefixes = [arguments[:end] for end in range(4, len(arguments) + 4, 4)]
+    payload = fixtures.serpapi_payload()
+    flights_model = FlightsResponseModel.model_validate(payload)
+    history = fixtures.chat_history()
+
+    async def consume_stream(chunks):
+        async for _ in llm_client.process_streamed_response(fixtures.replay(chunks)):
+            pass
+
+    async def tool_turn():
+        messages = [{"role": "user", "content": "Find flights"}]
+        async for _ in llm_client.run_tool_loop(messages, llm_client.available_tools):
+            pass
+
+    return [
+        Benchmark(
+            "process_streamed_response.answer",
+            f"parse a {len(answer_chunks)}-chunk thinking + answer stream",
+            lambda: consume_stream(answer_chunks),
+            is_async=True,
+        ),
+        Benchmark(
+            "process_streamed_response.tool_calls",
+            f"parse a {len(tool_chunks)}-chunk stream with 3 tool calls",
+            lambda: consume_stream(tool_chunks),
+            is_async=True,
+        ),
+        Benchmark(
+            "run_tool_loop.tool_turn",
+            "one turn: tool call stream, argument accumulation, 3 tool calls, answer stream",
+            tool_turn,
+            is_async=True,
+        ),
+        Benchmark(
+            "get_tools_format",
+            f"convert {len(tools)} MCP tools to the model tool format",
+            lambda: get_tools_format(tools),
+        ),
+        Benchmark(
+            "is_valid_json.complete",
+            f"check complete {len(arguments)}-char tool arguments",
+            lambda: is_valid_json(arguments),
+        ),
+        Benchmark(
+            "is_valid_json.streaming_prefixes",
+            f"check {len(argument_prefixes)} growing argument prefixes as during streaming",
+            lambda: [is_valid_json(prefix) for prefix in argument_prefixes],
+        ),
+        Benchmark(
+            "flights.model_validate",
+            f"validate a SerpApi payload with {len(payload['best_flights']) + len(payload['other_flights'])} itineraries",
+            lambda: FlightsResponseModel.model_validate(payload),
+        ),
+        Benchmark(
+            "flights.model_dump",
+            "dump the validated payload with exclude_none",
+            lambda: flights_model.model_dump(exclude_none=True),
+        ),
+        Benchmark(
+            "gradio.history_serialization",
+            f"json.dumps(internal_messages, indent=4) of a {len(history)}-message history, done per chunk",
+            lambda: json.dumps(history, indent=4),
+        ),
+    ]
+
+
+def run_loops(loop: asyncio.AbstractEventLoop, benchmark: Benchmark, loops: int) -> float:
+    """执行 loops 次操作，返回总耗时（秒）"""
+    if benchmark.is_async:
+
+        async def run_all():
+            start = time.perf_counter()
+            for _ in range(loops):
+                await benchmark.run()
+            return time.perf_counter() - start
+
+        return loop.run_until_complete(run_all())
+
+    run = benchmark.run
+    start = time.perf_counter()
+    for _ in range(loops):
+        run()
+    return time.perf_counter() - start
+
+
+def calibrate_loops(loop, benchmark: Benchmark, min_time: float) -> int:
+    """预热，并确定每次采样的循环次数，使单次采样至少持续 min_time 秒"""
+    loops = 1
+    while True:
+        elapsed = run_loops(loop, benchmark, loops)
+        if elapsed >= min_time:
+            return loops
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+
+def measure_times(loop, benchmarks: list[Benchmark], repeat: int, min_time: float) -> dict[str, dict]:
+    """
+    轮流对每个基准采样 repeat 轮
+
+    机器的速度在几秒内会有波动（CPU 频率、其它负载），连续采样同一个基准时所有采样可能都落在较慢的
+    时段；轮流采样使每个基准的采样分布在整个运行期间，最小值更稳定。
+    """
+    loops = {benchmark.name: calibrate_loops(loop, benchmark, min_time) for benchmark in benchmarks}
+    samples: dict[str, list[float]] = {benchmark.name: [] for benchmark in benchmarks}
+    for _ in range(repeat):
+        for benchmark in benchmarks:
+            count = loops[benchmark.name]
+            samples[benchmark.name].append(run_loops(loop, benchmark, count) / count * 1e6)
+    return {
+        name: {
+            "loops": loops[name],
+            "min_us": round(min(values), 3),
+            "max_us": round(max(values), 3),
+            "median_us": round(statistics.median(values), 3),
+            "mean_us": round(statistics.fmean(values), 3),
+            "stdev_us": round(statistics.stdev(values), 3) if len(values) > 1 else 0.0,
+        }
+        for name, values in samples.items()
+    }
+
+
+def measure_memory(loop, benchmark: Benchmark, runs: int = 5) -> dict:
+    """用 tracemalloc 统计单次操作的内存峰值和操作结束后残留的内存"""
+    tracemalloc.start()
+    try:
+        peaks, retained = [], []
+        for _ in range(runs):
+            # 先回收之前的垃圾，否则峰值取决于垃圾回收在操作中的哪个时刻发生
+            gc.collect()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run_loops(loop, benchmark, 1)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    # 第一次运行会分配 tracemalloc 启动前已存在的缓存，峰值偏高，取中位数
+    return {"peak_bytes": int(statistics.median(peaks)), "retained_bytes": int(statistics.median(retained))}
+
+
+def run(args) -> dict:
+    benchmarks = [
+        benchmark
+        for benchmark in build_benchmarks()
+        if not args.filter or any(pattern in benchmark.name for pattern in args.filter)
+    ]
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        timings = measure_times(loop, benchmarks, args.repeat, args.min_time)
+        for benchmark in benchmarks:
+            timing = timings[benchmark.name]
+            memory = measure_memory(loop, benchmark)
+            results[benchmark.name] = {"description": benchmark.description, **timing, **memory}
+            print(f"  {benchmark.name:<40} {timing['median_us']:>12.1f} us  {memory['peak_bytes'] / 1024:>10.1f} KiB", file=sys.stderr)
+    finally:
+        loop.close()
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {"repeat": args.repeat, "min_time": args.min_time},
+        "benchmarks": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    打印与基线的对比，返回耗时或内存峰值超过阈值的基准
+
+    耗时比较最小值：它受机器上其它负载的影响最小，比中位数更稳定。耗时超过阈值，并且最快的采样
+    也比基线采样的中位数慢时才算回归：否则差异在基线自身的采样波动范围内，无法与噪声区分。
+    """
+    regressions = []
+    print(f"revision {report['revision']} vs baseline {baseline.get('revision')}")
+    print(f"  {'benchmark':<40} {'min':>12} {'baseline':>12} {'change':>8} {'peak':>10} {'change':>8}")
+    for name, result in report["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            print(f"  {name:<40} {result['min_us']:>10.1f}us {'(new)':>12}")
+            continue
+        time_change = result["min_us"] / base["min_us"] - 1 if base["min_us"] else 0.0
+        memory_change = result["peak_bytes"] / base["peak_bytes"] - 1 if base["peak_bytes"] else 0.0
+        slower = time_change > threshold and result["min_us"] > base["median_us"]
+        flag = ""
+        if slower or memory_change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"  {name:<40} {result['min_us']:>10.1f}us {base['min_us']:>10.1f}us {time_change:>+8.1%}"
+            f" {result['peak_bytes'] / 1024:>8.1f}KB {memory_change:>+8.1%}{flag}"
+        )
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"revision {report['revision']}  python {report['python']}")
+    print(f"  {'benchmark':<40} {'median':>12} {'min':>12} {'stdev':>10} {'peak':>10} {'retained':>10}")
+    for name, result in report["benchmarks"].items():
+        print(
+            f"  {name:<40} {result['median_us']:>10.1f}us {result['min_us']:>10.1f}us {result['stdev_us']:>8.1f}us"
+            f" {result['peak_bytes'] / 1024:>8.1f}KB {result['retained_bytes'] / 1024:>8.1f}KB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the orchestration hot paths")
+    parser.add_argument("--repeat", type=int, default=7, help="timing samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum duration of one sample (seconds)")
+    parser.add_argument("--filter", action="append", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative slowdown or memory growth reported as a regression (slowdowns must also exceed the spread of the baseline samples)",
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
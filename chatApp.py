@@ -1,13 +1,56 @@
+from util.startup import StartupTimer
+
+startup_timer = StartupTimer("chatApp")
+
+import argparse
 import asyncio
-from rich import print as rprint
+import threading
+
 from client.LLMClient import LLMClient
 
+startup_timer.mark("imports")
+
+
+def read_input(prompt: str) -> asyncio.Future:
+    """在守护线程中读取输入，等待输入时事件循环可以继续在后台连接 MCP servers"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def run():
+        try:
+            result = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(future.set_result, result)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
 
 class ChatApp:
 
+    def __init__(self):
+        self.llm_client: LLMClient | None = None
+        self.client_ready = asyncio.Event()
+        self.stop = asyncio.Event()
+
+    async def run_client(self):
+        """在单独的任务中连接 MCP servers 并持有 LLMClient，直到聊天结束"""
+        try:
+            async with LLMClient() as llmClient:
+                self.llm_client = llmClient
+                self.client_ready.set()
+                await self.stop.wait()
+        finally:
+            # 连接失败时也要唤醒等待的聊天循环
+            self.client_ready.set()
+
     async def chat_loop(self):
         """Run an interactive chat loop"""
         """Process a query using Claude and available tools"""
+        from rich import print as rprint
+
         messages = [
             {
                 "role": "system",
@@ -15,7 +58,9 @@ class ChatApp:
             },
         ]
 
-        async with LLMClient() as llmClient:
+        # 在用户输入第一个问题的同时连接 MCP servers
+        client_task = asyncio.create_task(self.run_client())
+        try:
             print("\nMCP Client Started!")
             print("Type your queries or 'quit' to exit.")
 
@@ -25,7 +70,8 @@ class ChatApp:
                     print(f"\n\n{'*' * 20} Chat round {round} {'*' * 20}")
                     round += 1
 
-                    query = input("\nQuery: ").strip()
+                    startup_timer.report("first_prompt")
+                    query = (await read_input("\nQuery: ")).strip()
 
                     if query.lower() == "quit":
                         break
@@ -33,6 +79,12 @@ class ChatApp:
                     if not query:
                         continue
 
+                    await self.client_ready.wait()
+                    if self.llm_client is None:
+                        # 连接失败，抛出 run_client 中的异常
+                        await client_task
+                    llmClient = self.llm_client
+
                     messages.append({"role": "user", "content": query})
 
                     current_type = None
@@ -52,12 +104,42 @@ class ChatApp:
                                 current_type = "tool_call"
                                 rprint( "[bold green]" + "\n" + "=" * 20 + "工具调用" + "=" * 20 + "[/bold green]\n")
                             rprint(chunk.content, end="", flush=True)        
-                except KeyboardInterrupt:
+                        elif chunk.type == "tool_call_progress":
+                            if current_type != "tool_call_progress":
+                                current_type = "tool_call_progress"
+                                rprint( "[bold green]" + "\n" + "=" * 20 + "工具执行中" + "=" * 20 + "[/bold green]\n")
+                            progress = chunk.content
+                            if progress.message:
+                                # 部分输出可能包含方括号，不经过 rich 的标记解析
+                                print(progress.message, end="", flush=True)
+                            else:
+                                total = f"/{progress.total:g}" if progress.total else ""
+                                print(f"[{progress.name}] {progress.progress:g}{total}", flush=True)
+                except (KeyboardInterrupt, EOFError):
                     break
+        finally:
+            self.stop.set()
+            await client_task
 
 def load_system_prompt():
     with open("system_prompt.txt", "r") as f:
         return f.read()
 
 if __name__ == "__main__":
-    asyncio.run(ChatApp().chat_loop())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Interactive MCP chat client")
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="print the modules that take the longest to import and exit",
+    )
+    args = parser.parse_args()
+
+    if args.profile_imports:
+        from util.startup import print_import_profile
+
+        print_import_profile("chatApp")
+    else:
+        try:
+            asyncio.run(ChatApp().chat_loop())
+        except KeyboardInterrupt:
+            pass
\ No newline at end of file
@@ -1,52 +1,166 @@
-from model.QwenModel import QwenModel
+from model.ModelInterface import ModelInterface
 from .MCPClient import MCPClient
-from util.data import AssistantResponseChunk, ToolCallInfo
-from util.mytools import get_tools_format, is_valid_json
-from mcp.types import CallToolResult
+from .SubAgent import (
+    SPAWN_SUBAGENTS_TOOL_NAME,
+    SubAgentLimits,
+    SubAgentOrchestrator,
+    TokenBudget,
+    spawn_subagents_tool,
+)
+from .ToolPlan import RUN_TOOL_PLAN_TOOL_NAME, ToolPlanExecutor, ToolPlanLimits, run_tool_plan_tool
+from .ToolProgress import ProgressThrottle
+from util.data import AssistantResponseChunk, ToolCallInfo, ToolCallProgress
+from util.loop_monitor import LoopMonitor
+from util.mytools import estimate_tokens, get_tools_format, is_valid_json
 
-from typing import Any
+from typing import TYPE_CHECKING, Any
 import asyncio
 import json
 
-from openai import AsyncStream
-from openai.types.chat import ChatCompletionChunk
-from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
+from util.constants import MODEL_CONFIG_FILE, SERVER_CONFIG_FILE
 
-from mcp import Tool
-from util.constants import SERVER_CONFIG_FILE
+# openai 和 mcp 只在类型注解中使用，运行时在第一次用到时才导入，缩短启动时间
+if TYPE_CHECKING:
+    from mcp import Tool
+    from mcp.types import CallToolResult
+    from openai import AsyncStream
+    from openai.types.chat import ChatCompletionChunk
+    from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
 
 
 class LLMClient:
     
-    def __init__(self, mcp_config_file=SERVER_CONFIG_FILE):
+    def __init__(
+        self,
+        mcp_config_file=SERVER_CONFIG_FILE,
+        model: ModelInterface | None = None,
+        model_config_file=MODEL_CONFIG_FILE,
+        enable_subagents: bool = True,
+        subagent_limits: SubAgentLimits | None = None,
+        watch_config: bool = True,
+        progress_interval: float = 0.5,
+        enable_tool_plans: bool = True,
+        tool_plan_limits: ToolPlanLimits | None = None,
+    ):
         # 传递给模型接口的工具列表
         self.available_tools = []
+        # MCP server 提供的工具（不含内置工具），子代理从中选择工具子集
+        self.mcp_tools_format = []
         # MCPClient支持的所有工具列表
-        self.tools: list[Tool] = []  
+        self.tools: list["Tool"] = []  
         # MCPClient
         self.mcpClient = MCPClient()
 
-        self.qwenClient = QwenModel()
+        # 未指定模型时在第一次请求时根据模型配置文件创建（多个后端之间路由和故障切换），压测时可传入 MockModel
+        self._model = model
+        self.model_config_file = model_config_file
         self.mcp_config_file = mcp_config_file
+        # 监视 MCP server 配置文件，修改后自动重新加载 server，无需重启
+        self.watch_config = watch_config
+        # 事件循环延迟监控，LOOP_MONITOR_ENABLED=0 时关闭
+        self.loop_monitor = LoopMonitor.from_env("LLMClient")
+        # 同一个工具调用的进度通知（tool_call_progress）之间的最小间隔（秒）
+        self.progress_interval = progress_interval
+
+        # 内置的子代理编排工具
+        self.orchestrator = (
+            SubAgentOrchestrator(self, subagent_limits or SubAgentLimits())
+            if enable_subagents
+            else None
+        )
+        # 内置的工具计划工具：一次执行有依赖关系的多个工具调用
+        self.tool_planner = (
+            ToolPlanExecutor(self, tool_plan_limits or ToolPlanLimits())
+            if enable_tool_plans
+            else None
+        )
 
 
     # async with中的初始化方法
     async def __aenter__(self):
-        await self.mcpClient.initialize(config_file=self.mcp_config_file)
-        self.tools = self.mcpClient.list_tools()
-        self.available_tools = get_tools_format(self.tools, type="qwen")
+        if self.loop_monitor:
+            self.loop_monitor.start()
+        # 创建模型客户端需要导入 openai，在线程中进行，不阻塞事件循环
+        await asyncio.to_thread(lambda: self.modelClient)
+        self.mcpClient.tools_listeners.append(self.update_tools)
+        await self.mcpClient.initialize(
+            config_file=self.mcp_config_file, watch=self.watch_config
+        )
         return self
 
+    def update_tools(self):
+        """MCP server 的工具列表变化时重新生成传递给模型的工具列表，生成后整体替换"""
+        tools = self.mcpClient.list_tools()
+        mcp_tools_format = get_tools_format(tools, type="qwen")
+        available_tools = list(mcp_tools_format)
+        if self.orchestrator and mcp_tools_format:
+            available_tools.append(spawn_subagents_tool([tool.name for tool in tools]))
+        if self.tool_planner and mcp_tools_format:
+            available_tools.append(run_tool_plan_tool([tool.name for tool in tools]))
+        self.tools, self.mcp_tools_format, self.available_tools = (
+            tools,
+            mcp_tools_format,
+            available_tools,
+        )
+
     # 退出的方法
     async def __aexit__(self, exc_type, exc_value, traceback):
         await self.mcpClient.cleanup()
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+
+    @property
+    def modelClient(self) -> ModelInterface:
+        if self._model is None:
+            from model.ModelRegistry import load_model
+
+            self._model = load_model(self.model_config_file)
+        return self._model
 
-    async def get_chat_completion(self, messages):
-        return await self.qwenClient.get_chat_completion(messages, self.available_tools)
+    async def get_chat_completion(self, messages, tools=None):
+        return await self.modelClient.get_chat_completion(
+            messages, self.available_tools if tools is None else tools
+        )
+
+    async def call_tool(
+        self,
+        tool_call_id: str,
+        tool_name: str,
+        tool_args: dict,
+        depth=0,
+        budget=None,
+        progress_callback=None,
+    ) -> ToolCallInfo:
+        if self.loop_monitor:
+            with self.loop_monitor.context(tool=tool_name, tool_call_id=tool_call_id, depth=depth):
+                return await self._call_tool(
+                    tool_call_id, tool_name, tool_args, depth, budget, progress_callback
+                )
+        return await self._call_tool(
+            tool_call_id, tool_name, tool_args, depth, budget, progress_callback
+        )
+
+    async def _call_tool(
+        self, tool_call_id, tool_name, tool_args, depth, budget, progress_callback=None
+    ) -> ToolCallInfo:
+        # 内置工具在本地执行，其它工具转发给对应的 MCP server
+        if tool_name == SPAWN_SUBAGENTS_TOOL_NAME and self.orchestrator:
+            result = await self.orchestrator.run(tool_args, depth=depth, budget=budget)
+            return ToolCallInfo(id=tool_call_id, name=tool_name, args=tool_args, result=result)
+        if tool_name == RUN_TOOL_PLAN_TOOL_NAME and self.tool_planner:
+            result = await self.tool_planner.run(
+                tool_call_id, tool_args, depth=depth, budget=budget, progress_callback=progress_callback
+            )
+            return ToolCallInfo(id=tool_call_id, name=tool_name, args=tool_args, result=result)
+        return await self.mcpClient.call_tool(
+            tool_call_id, tool_name, tool_args, progress_callback
+        )
     
     def get_tool_result_message(
-        self, result: CallToolResult | Any, tool_call_id: str, type="tool"
+        self, result: "CallToolResult | Any", tool_call_id: str, type="tool"
     ):
+        from mcp.types import CallToolResult
+
         if type == "tool":
             return {
                 "content": (
@@ -60,7 +174,7 @@ class LLMClient:
         if type == "user":
             return {"content": result.content, "role": "user", "name": "tool caller"}
 
-    async def process_streamed_response(self, response: AsyncStream[ChatCompletionChunk]):
+    async def process_streamed_response(self, response: "AsyncStream[ChatCompletionChunk]"):
         async for chunk in response:
             delta = chunk.choices[0].delta
             if hasattr(delta, "reasoning_content") and delta.reasoning_content != None:
@@ -82,17 +196,46 @@ class LLMClient:
                         yield AssistantResponseChunk(type="tool_call", content=tool_call)
 
     async def get_assistant_response(self, messages):
+        async for chunk in self.run_tool_loop(messages, self.available_tools):
+            yield chunk
+
+    async def run_tool_loop(
+        self,
+        messages,
+        tools,
+        depth=0,
+        budget: TokenBudget | None = None,
+        max_iterations: int | None = None,
+    ):
+        """
+        请求模型并执行工具调用，直到模型不再调用工具
 
+        子代理使用自己的工具子集和深度调用该方法，budget 为编排共享的 token 预算，
+        预算用完或达到 max_iterations 次模型请求后停止循环。
+
+        工具执行期间 server 发送的进度通知经过节流后以 tool_call_progress 类型的 chunk 返回，
+        同一个工具调用的进度通知总是在它的 tool_call_result 之前。
+        """
+        iteration = 0
         while True:
-            response = await self.get_chat_completion(messages)
+            if budget is not None:
+                if budget.exhausted:
+                    break
+                budget.charge(estimate_tokens(json.dumps(messages, ensure_ascii=False)))
+            iteration += 1
+
+            response = await self.get_chat_completion(messages, tools)
             result = self.process_streamed_response(response)
 
             answer_content = ""
             reasoning_content = ""
-            tool_call_message_params: dict[int:ChoiceDeltaToolCall] = {}
+            tool_call_message_params: dict[int, "ChoiceDeltaToolCall"] = {}
             tool_call_tasks = []
             tool_call_info = {}
             notified_calls = set()
+            # 工具调用的进度通知（ToolCallProgress）和已完成的工具调用任务，按发生的顺序排列
+            tool_events: asyncio.Queue = asyncio.Queue()
+            finished_tasks: list[asyncio.Task] = []
             
             async for chunk in result:
                 if chunk.type == "answer":
@@ -102,7 +245,7 @@ class LLMClient:
                     reasoning_content += chunk.content
                     yield chunk
                 elif chunk.type == "tool_call":
-                    tool_call_param: ChoiceDeltaToolCall = chunk.content
+                    tool_call_param: "ChoiceDeltaToolCall" = chunk.content
                     index = tool_call_param.index
                     if index not in tool_call_message_params:
                         tool_call_message_params[index] = tool_call_param
@@ -117,10 +260,27 @@ class LLMClient:
                         tool_name = tool_call_param.function.name
                         tool_args = json.loads(tool_call_param.function.arguments)
 
-                        # 创建工具调用的异步任务
+                        # 创建工具调用的异步任务，任务结束时先发出剩余的进度通知，再通知结果
+                        throttle = ProgressThrottle(
+                            tool_call_param.id,
+                            tool_name,
+                            tool_events.put_nowait,
+                            self.progress_interval,
+                        )
                         task = asyncio.create_task(
-                            self.mcpClient.call_tool(
-                                tool_call_param.id, tool_name, tool_args
+                            self.call_tool(
+                                tool_call_param.id,
+                                tool_name,
+                                tool_args,
+                                depth,
+                                budget,
+                                progress_callback=throttle,
+                            )
+                        )
+                        task.add_done_callback(
+                            lambda task, throttle=throttle: (
+                                throttle.close(),
+                                tool_events.put_nowait(task),
                             )
                         )
                         tool_call_tasks.append(task)
@@ -141,6 +301,17 @@ class LLMClient:
                             type="tool_call", content=tool_info
                         )
 
+                # 模型还在输出时先转发已经收到的进度通知，已完成的工具调用等模型输出结束后再处理
+                while not tool_events.empty():
+                    event = tool_events.get_nowait()
+                    if isinstance(event, ToolCallProgress):
+                        yield AssistantResponseChunk(type="tool_call_progress", content=event)
+                    else:
+                        finished_tasks.append(event)
+
+            if budget is not None:
+                budget.charge(estimate_tokens(reasoning_content + answer_content))
+
             # 首先将完整的回复信息记录到 messages中
             assistant_msg_record = {
                 "role": "assistant",
@@ -154,12 +325,20 @@ class LLMClient:
                 ]
             messages.append(assistant_msg_record)
 
-            async for task in asyncio.as_completed(tool_call_tasks):
-                result: ToolCallInfo = await task
+            remaining = len(tool_call_tasks)
+            while remaining:
+                event = finished_tasks.pop(0) if finished_tasks else await tool_events.get()
+                if isinstance(event, ToolCallProgress):
+                    yield AssistantResponseChunk(type="tool_call_progress", content=event)
+                    continue
+                remaining -= 1
+                result: ToolCallInfo = event.result()
                 messages.append(self.get_tool_result_message(result.result, result.id))
                 yield AssistantResponseChunk(type="tool_call_result", content=result)
 
             if not tool_call_info:
                 break
+            if max_iterations is not None and iteration >= max_iterations:
+                break
 
 
@@ -1,38 +1,160 @@
 from util.constants import SERVER_CONFIG_FILE
 from util.data import ToolCallInfo
+from util.server_metrics import MetricsExporter, ServerMetrics, find_server_pids, snapshot
 
+import asyncio
+import importlib
 import json
 import logging
-from rich import logging as rich_logging
-from contextlib import AsyncExitStack
+import os
+import time
+from typing import TYPE_CHECKING, Callable
 
-
-from mcp import ClientSession, StdioServerParameters, Tool
-from mcp.client.stdio import stdio_client
-from mcp.types import CallToolResult
+# mcp 在连接 server 时才导入，缩短启动时间
+if TYPE_CHECKING:
+    from mcp import ClientSession, Tool
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(rich_logging.RichHandler())
+
+
+def setup_logging():
+    """第一次创建 MCPClient 时才配置 RichHandler，避免导入本模块时加载 rich"""
+    if logger.handlers:
+        return
+    from rich import logging as rich_logging
+
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(rich_logging.RichHandler())
+
+
+class ServerConnection:
+    """
+    一个 MCP Server 的连接
+
+    连接在自己的任务中建立和关闭（stdio_client 和 ClientSession 的上下文必须在同一个任务中进入和退出），
+    因此可以单独启动或停止某个 server，而不影响其它 server。
+    """
+
+    def __init__(self, name: str, config: dict, metrics: ServerMetrics | None = None):
+        self.name = name
+        self.config = config
+        self.metrics = metrics
+        # server 进程的 pid，连接成功后由 MCPClient 根据命令行查找
+        self.pid: int | None = None
+        self.session: "ClientSession | None" = None
+        self.tools: list["Tool"] = []
+        # 正在进行中的工具调用数量，停止前需要等待它们完成
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """启动连接任务并等待 server 初始化完成，失败时抛出异常"""
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.name}")
+        await self._ready
+
+    async def _run(self):
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        try:
+            async with stdio_client(StdioServerParameters(**self.config)) as (stdio, write):
+                async with ClientSession(stdio, write) as session:
+                    await session.initialize()
+                    # List available tools
+                    response = await session.list_tools()
+                    self.session = session
+                    self.tools = response.tools
+                    self._ready.set_result(None)
+                    await self._stop.wait()
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"MCP server {self.name} stopped with error: {e!r}")
+
+    async def call_tool(self, tool_name, tool_args, progress_callback=None):
+        self.in_flight += 1
+        self._idle.clear()
+        start = time.perf_counter()
+        is_error = True
+        try:
+            result = await self.session.call_tool(
+                tool_name, tool_args, progress_callback=progress_callback
+            )
+            is_error = bool(result.isError)
+            return result
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_call(self.name, tool_name, time.perf_counter() - start, is_error)
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def stop(self, drain_timeout: float | None = None):
+        """等待进行中的工具调用完成（最多 drain_timeout 秒）后关闭连接"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"MCP server {self.name} still has {self.in_flight} calls in flight, stopping anyway"
+            )
+        self._stop.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), 10)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        except Exception:
+            pass
 
 
 class MCPClient:
     def __init__(self):
+        setup_logging()
         # 所有连接成功的 MCP Server sessions
-        self.mcpSessions = {}     
+        self.mcpSessions = {}
         # 所有 Server中的所有工具集合
-        self.tools: list[Tool] = []
+        self.tools: list["Tool"] = []
         # 工具名与 工具所在session的映射关系
         self.mcpToolsSessionMap = {}
-        self.exit_stack = AsyncExitStack()
+        # 工具名与工具所在 server 连接的映射关系
+        self.mcpToolsServerMap: dict[str, ServerConnection] = {}
+        # 所有连接成功的 server
+        self.servers: dict[str, ServerConnection] = {}
         # Server配置文件
         self.mcpServersConfig = {}
-    
-    
-    async def initialize(self, config_file=SERVER_CONFIG_FILE):
+        self.config_file = None
+        self._config_mtime = None
+        # 工具列表变化时的回调
+        self.tools_listeners: list[Callable[[], None]] = []
+        self._watch_task: asyncio.Task | None = None
+        self._reload_lock = asyncio.Lock()
+        # 工具调用统计和资源占用导出（见 util.server_metrics）
+        self.metrics = ServerMetrics()
+        self.metrics_exporter: MetricsExporter | None = None
+
+    async def initialize(self, config_file=SERVER_CONFIG_FILE, watch=False, watch_interval=2.0):
+        """
+        连接配置文件中的所有 server
+
+        watch 为 True 时定期检查配置文件，文件变化后自动重新加载（见 reload）。
+        """
+        self.config_file = config_file
+        self._config_mtime = self._get_config_mtime()
         with open(config_file, "r") as f:
             self.mcpServersConfig = json.load(f)
         await self.connect_to_server(self.mcpServersConfig)
+        if watch:
+            self._watch_task = asyncio.create_task(self.watch_config(watch_interval))
+        self.metrics_exporter = MetricsExporter.from_env(self.metrics_snapshot)
+        if self.metrics_exporter is not None:
+            await self.metrics_exporter.start()
 
     async def connect_to_server(self, configs: dict):
         """
@@ -47,57 +169,163 @@ class MCPClient:
             "other_server": {...}
         }
         """
-        for server_name, config in configs.items():
-            server_params = StdioServerParameters(**config)
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            stdio, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(stdio, write)
+        # mcp 的导入较慢，在线程中导入，不阻塞事件循环
+        await asyncio.to_thread(importlib.import_module, "mcp.client.stdio")
+
+        # 各个 server 并发启动，启动失败的 server 记录错误后跳过
+        connections = [ServerConnection(name, config, self.metrics) for name, config in configs.items()]
+        results = await asyncio.gather(
+            *[connection.start() for connection in connections], return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to connect to MCP server {connection.name}: {result!r}")
+                continue
+            logger.info(
+                f"\nConnected to server {connection.name} with tools: {[tool.name for tool in connection.tools]}"
             )
+            self.servers[connection.name] = connection
+        self._assign_pids(connections)
+        self._rebuild_tool_maps()
 
-            await session.initialize()
+    def _assign_pids(self, connections: list[ServerConnection], exclude: list[ServerConnection] = ()):
+        """查找新连接的 server 进程 pid，exclude 中的连接（如正在关闭的旧连接）的进程不会被分配"""
+        pending = {c.name: c.config for c in connections if c.session is not None and c.pid is None}
+        if not pending:
+            return
+        claimed = {c.pid for c in [*self.servers.values(), *exclude] if c.pid is not None}
+        pids = find_server_pids(pending, claimed)
+        for connection in connections:
+            connection.pid = pids.get(connection.name, connection.pid)
 
-            # List available tools
-            response = await session.list_tools()
-            tools = response.tools
-            logger.info(
-                f"\nConnected to server with tools: {[tool.name for tool in tools]}"
+    def metrics_snapshot(self) -> dict:
+        """所有 server 的进程资源占用和工具调用统计，可以在线程中调用"""
+        servers = {
+            name: {"pid": connection.pid, "in_flight": connection.in_flight}
+            for name, connection in list(self.servers.items())
+        }
+        return snapshot(self.metrics, servers)
+
+    def _rebuild_tool_maps(self):
+        """根据当前的 server 连接重新生成工具映射，生成后整体替换，调用方看到的始终是一致的状态"""
+        sessions = {}
+        tools = []
+        tools_session_map = {}
+        tools_server_map = {}
+        for name in self.mcpServersConfig:
+            connection = self.servers.get(name)
+            if connection is None:
+                continue
+            sessions[name] = connection.session
+            for tool in connection.tools:
+                tools_session_map[tool.name] = connection.session
+                tools_server_map[tool.name] = connection
+            tools.extend(connection.tools)
+
+        self.mcpSessions = sessions
+        self.tools = tools
+        self.mcpToolsSessionMap = tools_session_map
+        self.mcpToolsServerMap = tools_server_map
+        for listener in self.tools_listeners:
+            listener()
+
+    def _get_config_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    async def watch_config(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._get_config_mtime()
+            if mtime is None or mtime == self._config_mtime:
+                continue
+            self._config_mtime = mtime
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Failed to reload {self.config_file}: {e!r}")
+
+    async def reload(self):
+        """
+        重新读取配置文件并与当前配置比较
+
+        只启动新增或配置变化的 server，新连接就绪后才替换旧连接（启动失败时保留旧连接）；
+        被删除或被替换的 server 等进行中的工具调用完成后再关闭，配置未变的 server 保持连接。
+        """
+        async with self._reload_lock:
+            with open(self.config_file, "r") as f:
+                new_configs = json.load(f)
+
+            old_configs = self.mcpServersConfig
+            removed = [name for name in old_configs if name not in new_configs]
+            started = [
+                name
+                for name, config in new_configs.items()
+                if old_configs.get(name) != config or name not in self.servers
+            ]
+            if not removed and not started and list(old_configs) == list(new_configs):
+                return
+            logger.info(f"Reloading MCP servers: start {started}, remove {removed}")
+
+            connections = [ServerConnection(name, new_configs[name], self.metrics) for name in started]
+            results = await asyncio.gather(
+                *[connection.start() for connection in connections], return_exceptions=True
             )
+            retired = [self.servers.pop(name) for name in removed if name in self.servers]
+            for connection, result in zip(connections, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to start MCP server {connection.name}: {result!r}")
+                    if connection.name in self.servers:
+                        new_configs[connection.name] = old_configs[connection.name]
+                    continue
+                if connection.name in self.servers:
+                    retired.append(self.servers[connection.name])
+                self.servers[connection.name] = connection
 
-            self.mcpSessions[server_name] = session
-            for tool in tools:
-                self.mcpToolsSessionMap[tool.name] = session
+            self.mcpServersConfig = new_configs
+            self._assign_pids(connections, retired)
+            self._rebuild_tool_maps()
 
-            self.tools.extend(tools)
-    
-        
-    async def call_tool(self, id, tool_name, tool_args) -> ToolCallInfo:
+        await asyncio.gather(*[connection.stop(drain_timeout=60) for connection in retired])
+
+    async def call_tool(self, id, tool_name, tool_args, progress_callback=None) -> ToolCallInfo:
+        """
+        调用工具，progress_callback 不为 None 时会收到 server 发送的进度通知
+        （progress、total、message，见 mcp.shared.session.ProgressFnT）
+        """
         logger.debug(f"call_tool: {tool_name} with args {str(tool_args)[:100]}...")
-        session: ClientSession = self.mcpToolsSessionMap[tool_name]
-        if session is None:
+        connection = self.mcpToolsServerMap.get(tool_name)
+        if connection is None:
+            from mcp.types import CallToolResult, TextContent
+
             return ToolCallInfo(
                 id=id,
                 name=tool_name,
                 args=tool_args,
                 result=CallToolResult(
-                    content=[{"text": f"Cannot find servers for tool {tool_name}"}],
+                    content=[TextContent(type="text", text=f"Cannot find servers for tool {tool_name}")],
                     isError=True,
                 ),
             )
 
-        result = await session.call_tool(tool_name, tool_args)
+        result = await connection.call_tool(tool_name, tool_args, progress_callback)
         logger.debug(
             f"[Calling tool {tool_name} with args {tool_args}], \n  result: {
                 result.content}"
         )
         return ToolCallInfo(id=id, name=tool_name, args=tool_args, result=result)
-    
+
 
     def list_tools(self):
         return self.tools
 
     async def cleanup(self):
         """Clean up resources"""
-        await self.exit_stack.aclose()
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        if self.metrics_exporter is not None:
+            await self.metrics_exporter.stop()
+        servers, self.servers = list(self.servers.values()), {}
+        await asyncio.gather(*[connection.stop(drain_timeout=5) for connection in servers])
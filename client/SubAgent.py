@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+import asyncio
+import json
+
+from util.mytools import estimate_tokens
+
+# 内置的编排工具名称，不会转发给 MCP server
+SPAWN_SUBAGENTS_TOOL_NAME = "spawn_subagents"
+
+SUBAGENT_SYSTEM_PROMPT = (
+    "You are a sub-agent working on one part of a larger request. "
+    "Use the available tools to complete only the task you are given, "
+    "then reply with a concise, self-contained summary of the findings. "
+    "Do not ask the user questions."
+)
+
+
+@dataclass
+class SubAgentLimits:
+    # 一次编排中同时运行的子代理数量
+    max_concurrency: int = 4
+    # 一次编排最多创建的子代理数量
+    max_subagents: int = 8
+    # 最大嵌套深度，1 表示子代理不能再创建子代理
+    max_depth: int = 1
+    # 一次编排（包括嵌套的子代理）所有模型请求的估算 token 总数上限
+    max_total_tokens: int = 60000
+    # 每个子代理最多请求模型的次数
+    max_iterations: int = 5
+    # 合并回父对话的每个子代理结果的最大字符数
+    max_result_chars: int = 2000
+
+
+class TokenBudget:
+    """一次编排共享的 token 预算，所有子代理的模型请求都从中扣除"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    def charge(self, tokens: int):
+        self.used += tokens
+
+    @property
+    def exhausted(self) -> bool:
+        return self.used >= self.limit
+
+
+def spawn_subagents_tool(tool_names: list[str]) -> dict:
+    """编排工具的描述，格式与 get_tools_format 生成的工具一致"""
+    return {
+        "type": "function",
+        "function": {
+            "name": SPAWN_SUBAGENTS_TOOL_NAME,
+            "description": (
+                "Split a multi-part request into independent sub-tasks and run them concurrently "
+                "as sub-agents. Each sub-agent starts with a fresh context containing only its task "
+                "and can use only the listed tools. Returns a concise result for every sub-task. "
+                "Use it when a request has several independent parts (e.g. the same lookups for "
+                "several cities); answer simple requests directly."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "tasks": {
+                        "type": "array",
+                        "description": "Independent sub-tasks to run concurrently",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "task": {
+                                    "type": "string",
+                                    "description": "Complete, self-contained instructions for the sub-agent",
+                                },
+                                "tools": {
+                                    "type": "array",
+                                    "items": {"type": "string", "enum": tool_names},
+                                    "description": "Tools the sub-agent may use; all tools when omitted",
+                                },
+                            },
+                            "required": ["task"],
+                        },
+                    }
+                },
+                "required": ["tasks"],
+            },
+        },
+    }
+
+
+class SubAgentOrchestrator:
+    """
+    执行 spawn_subagents 工具调用：为每个子任务运行独立的 LLMClient 工具循环
+
+    子代理共享同一个 MCPClient，只携带各自的任务和工具子集，并发数、嵌套深度、
+    子代理数量和 token 总数都受 SubAgentLimits 限制。每个子代理的最终回答截断后
+    作为工具结果合并回父对话。
+
+    参数:
+        llm_client (LLMClient): 提供模型和工具循环的客户端
+        limits (SubAgentLimits): 编排的限制
+    """
+
+    def __init__(self, llm_client, limits: SubAgentLimits):
+        self.llm_client = llm_client
+        self.limits = limits
+
+    def tools_for(self, requested: list[str] | None, depth: int) -> list[dict]:
+        tools = [
+            tool
+            for tool in self.llm_client.mcp_tools_format
+            if requested is None or tool["function"]["name"] in requested
+        ]
+        # depth 为子代理自身的深度，它调用 spawn_subagents 时 run() 收到的就是这个深度
+        if depth < self.limits.max_depth:
+            tools.append(spawn_subagents_tool([tool["function"]["name"] for tool in tools]))
+        return tools
+
+    async def run(self, args: dict, depth: int = 0, budget: TokenBudget | None = None) -> str:
+        if depth >= self.limits.max_depth:
+            return json.dumps({"error": "Maximum sub-agent depth reached, complete the task directly."})
+
+        tasks = args.get("tasks") or []
+        skipped = tasks[self.limits.max_subagents :]
+        tasks = tasks[: self.limits.max_subagents]
+        budget = budget or TokenBudget(self.limits.max_total_tokens)
+        semaphore = asyncio.Semaphore(self.limits.max_concurrency)
+
+        async def run_one(spec: dict) -> dict:
+            async with semaphore:
+                return await self.run_subagent(spec, depth + 1, budget)
+
+        results = await asyncio.gather(*[run_one(spec) for spec in tasks])
+        results.extend(
+            {"task": spec.get("task", ""), "status": "skipped", "result": "Too many sub-tasks"}
+            for spec in skipped
+        )
+        return json.dumps(
+            {"results": results, "tokens_used": budget.used}, ensure_ascii=False
+        )
+
+    async def run_subagent(self, spec: dict, depth: int, budget: TokenBudget) -> dict:
+        task = spec.get("task", "")
+        if budget.exhausted:
+            return {"task": task, "status": "skipped", "result": "Token budget exhausted"}
+
+        messages = [
+            {"role": "system", "content": SUBAGENT_SYSTEM_PROMPT},
+            {"role": "user", "content": task},
+        ]
+        answer = ""
+        try:
+            async for chunk in self.llm_client.run_tool_loop(
+                messages,
+                self.tools_for(spec.get("tools"), depth),
+                depth=depth,
+                budget=budget,
+                max_iterations=self.limits.max_iterations,
+            ):
+                if chunk.type == "answer":
+                    answer += chunk.content
+                elif chunk.type == "tool_call_result":
+                    # 只保留最后一轮（工具调用之后）的回答
+                    answer = ""
+        except Exception as e:
+            return {"task": task, "status": "error", "result": repr(e)}
+
+        status = "ok" if answer else "incomplete"
+        if len(answer) > self.limits.max_result_chars:
+            answer = answer[: self.limits.max_result_chars] + "...(truncated)"
+        return {"task": task, "status": status, "result": answer}
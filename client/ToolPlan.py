@@ -0,0 +1,248 @@
+from dataclasses import dataclass
+import asyncio
+import json
+import re
+
+# 内置的工具计划工具名称，不会转发给 MCP server
+RUN_TOOL_PLAN_TOOL_NAME = "run_tool_plan"
+
+# 参数中对前面步骤结果的引用：${step_id} 为完整的结果文本，${step_id.field.0} 为 JSON 结果中的字段
+REFERENCE_PATTERN = re.compile(r"\$\{([A-Za-z_][\w-]*)((?:\.[\w-]+)*)\}")
+
+
+@dataclass
+class ToolPlanLimits:
+    # 一个计划最多包含的步骤数
+    max_steps: int = 12
+    # 同时执行的工具调用数量
+    max_concurrency: int = 4
+    # 合并结果中每个步骤结果的最大字符数
+    max_result_chars: int = 2000
+
+
+class PlanError(ValueError):
+    pass
+
+
+def run_tool_plan_tool(tool_names: list[str]) -> dict:
+    """工具计划工具的描述，格式与 get_tools_format 生成的工具一致"""
+    return {
+        "type": "function",
+        "function": {
+            "name": RUN_TOOL_PLAN_TOOL_NAME,
+            "description": (
+                "Run several tool calls in one step as a dependency graph. A step's arguments may "
+                "reference the result of an earlier step: a string that is exactly '${step_id}' is "
+                "replaced by that step's full result text, and '${step_id.field.0.name}' by a field "
+                "of a JSON result (references inside longer strings are substituted as text). Steps "
+                "without dependencies run concurrently, the others as soon as their inputs are ready. "
+                "Returns the result of every step. Use it when the follow-up calls are known in "
+                "advance, e.g. look something up and then pass the answer to another tool."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "steps": {
+                        "type": "array",
+                        "description": "Tool calls to run",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {
+                                    "type": "string",
+                                    "description": "Unique step id used in references (letters, digits, _ and -)",
+                                },
+                                "tool": {"type": "string", "enum": tool_names},
+                                "arguments": {
+                                    "type": "object",
+                                    "description": "Tool arguments, may contain ${step_id...} references",
+                                },
+                                "depends_on": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Extra steps that must finish first (references are added automatically)",
+                                },
+                            },
+                            "required": ["id", "tool"],
+                        },
+                    }
+                },
+                "required": ["steps"],
+            },
+        },
+    }
+
+
+def find_references(value) -> set[str]:
+    """参数中引用的步骤 id"""
+    if isinstance(value, str):
+        return {match.group(1) for match in REFERENCE_PATTERN.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*[find_references(v) for v in value.values()])
+    if isinstance(value, list):
+        return set().union(*[find_references(v) for v in value])
+    return set()
+
+
+def lookup(result: str, path: str):
+    """按 .field.0.name 形式的路径从步骤结果中取值，路径为空时返回完整的结果文本"""
+    if not path:
+        return result
+    try:
+        value = json.loads(result)
+    except json.JSONDecodeError:
+        raise PlanError("result is not JSON, only the whole result can be referenced")
+    for key in path.strip(".").split("."):
+        if isinstance(value, list) and key.lstrip("-").isdigit() and -len(value) <= int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise PlanError(f"field {key!r} not found")
+    return value
+
+
+def resolve_references(value, results: dict[str, str]):
+    """把参数中的引用替换为前面步骤的结果"""
+    if isinstance(value, str):
+        match = REFERENCE_PATTERN.fullmatch(value)
+        if match:
+            # 整个字符串就是一个引用时保留结果的类型（数字、对象等）
+            return lookup(results[match.group(1)], match.group(2))
+
+        def substitute(match: re.Match) -> str:
+            found = lookup(results[match.group(1)], match.group(2))
+            return found if isinstance(found, str) else json.dumps(found, ensure_ascii=False)
+
+        return REFERENCE_PATTERN.sub(substitute, value)
+    if isinstance(value, dict):
+        return {k: resolve_references(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(v, results) for v in value]
+    return value
+
+
+def validate_plan(steps: list[dict], tool_names: set[str]) -> dict[str, set[str]]:
+    """
+    检查步骤的类型、id、工具名称和依赖关系，返回每个步骤依赖的步骤；计划无效时抛出 PlanError
+
+    计划来自模型的输出，任何字段都可能是错误的类型，都作为 PlanError 返回给模型，不能让其它异常中断对话。
+    """
+    if not isinstance(steps, list):
+        raise PlanError(f"steps must be a list, got {type(steps).__name__}")
+    dependencies: dict[str, set[str]] = {}
+    for step in steps:
+        if not isinstance(step, dict):
+            raise PlanError(f"each step must be an object, got {step!r}")
+        step_id = step.get("id")
+        if not isinstance(step_id, str) or not re.fullmatch(r"[A-Za-z_][\w-]*", step_id):
+            raise PlanError(f"invalid step id {step_id!r}")
+        if step_id in dependencies:
+            raise PlanError(f"duplicate step id {step_id!r}")
+        tool = step.get("tool")
+        if not isinstance(tool, str) or tool not in tool_names:
+            raise PlanError(f"step {step_id!r} uses unknown tool {tool!r}")
+        arguments = step.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise PlanError(f"arguments of step {step_id!r} must be an object")
+        depends_on = step.get("depends_on") or []
+        if not isinstance(depends_on, list) or not all(isinstance(d, str) for d in depends_on):
+            raise PlanError(f"depends_on of step {step_id!r} must be a list of step ids")
+        dependencies[step_id] = find_references(arguments) | set(depends_on)
+
+    for step_id, required in dependencies.items():
+        unknown = required - dependencies.keys()
+        if unknown:
+            raise PlanError(f"step {step_id!r} depends on unknown steps {sorted(unknown)}")
+
+    # 拓扑排序检查是否有环
+    remaining = {step_id: set(required) for step_id, required in dependencies.items()}
+    while remaining:
+        ready = [step_id for step_id, required in remaining.items() if not required]
+        if not ready:
+            raise PlanError(f"steps {sorted(remaining)} form a dependency cycle")
+        for step_id in ready:
+            del remaining[step_id]
+        for required in remaining.values():
+            required.difference_update(ready)
+    return dependencies
+
+
+class ToolPlanExecutor:
+    """
+    执行 run_tool_plan 工具调用：在一次工具调用中按依赖关系执行多个 MCP 工具
+
+    没有依赖的步骤并发执行，其它步骤在依赖的步骤都成功后立即开始；依赖的步骤失败时跳过。
+    所有步骤的结果截断后合并为一个工具结果返回，省去中间的模型请求。
+
+    参数:
+        llm_client (LLMClient): 执行工具调用的客户端
+        limits (ToolPlanLimits): 计划的限制
+    """
+
+    def __init__(self, llm_client, limits: ToolPlanLimits):
+        self.llm_client = llm_client
+        self.limits = limits
+
+    async def run(
+        self, tool_call_id: str, args: dict, depth: int = 0, budget=None, progress_callback=None
+    ) -> str:
+        steps = args.get("steps") or []
+        tool_names = {tool["function"]["name"] for tool in self.llm_client.mcp_tools_format}
+        try:
+            dependencies = validate_plan(steps, tool_names)
+            if len(steps) > self.limits.max_steps:
+                raise PlanError(f"a plan can have at most {self.limits.max_steps} steps")
+        except PlanError as e:
+            return json.dumps({"error": f"Invalid plan: {e}"}, ensure_ascii=False)
+
+        semaphore = asyncio.Semaphore(self.limits.max_concurrency)
+        # 成功步骤的完整结果文本，供后续步骤引用
+        results: dict[str, str] = {}
+        tasks: dict[str, asyncio.Task] = {}
+        completed = 0
+
+        async def run_step(step: dict) -> dict:
+            nonlocal completed
+            step_id = step["id"]
+            report = {"id": step_id, "tool": step["tool"]}
+            required = dependencies[step_id]
+            await asyncio.gather(*[tasks[dependency] for dependency in required])
+            failed = sorted(dependency for dependency in required if dependency not in results)
+            if failed:
+                report.update(status="skipped", result=f"Dependencies failed: {failed}")
+            else:
+                report.update(await self.call_step(tool_call_id, step, results, semaphore, depth, budget))
+            completed += 1
+            if progress_callback is not None:
+                await progress_callback(completed, len(steps), f"{step_id}: {report['status']}\n")
+            return report
+
+        for step in steps:
+            tasks[step["id"]] = asyncio.create_task(run_step(step))
+        reports = await asyncio.gather(*tasks.values())
+        return json.dumps({"results": reports}, ensure_ascii=False)
+
+    async def call_step(self, tool_call_id, step, results, semaphore, depth, budget) -> dict:
+        try:
+            arguments = resolve_references(step.get("arguments") or {}, results)
+        except PlanError as e:
+            return {"status": "error", "result": f"Cannot resolve arguments: {e}"}
+
+        async with semaphore:
+            try:
+                info = await self.llm_client.call_tool(
+                    f"{tool_call_id}:{step['id']}", step["tool"], arguments, depth, budget
+                )
+            except Exception as e:
+                return {"status": "error", "arguments": arguments, "result": repr(e)}
+
+        text = self.llm_client.get_tool_result_message(info.result, info.id)["content"]
+        if getattr(info.result, "isError", False):
+            status = "error"
+        else:
+            status = "ok"
+            results[step["id"]] = text
+        if len(text) > self.limits.max_result_chars:
+            text = text[: self.limits.max_result_chars] + "...(truncated)"
+        return {"status": status, "arguments": arguments, "result": text}
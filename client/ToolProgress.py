@@ -0,0 +1,79 @@
+from util.data import ToolCallProgress
+
+import asyncio
+import time
+from typing import Callable
+
+# 合并后的单条进度消息最多保留的字符数（保留最新的部分）
+PROGRESS_MESSAGE_LIMIT = 4000
+
+
+class ProgressThrottle:
+    """
+    合并同一个工具调用的 MCP 进度通知，每 interval 秒最多发出一次
+
+    实例本身就是 session.call_tool 的 progress_callback。间隔内收到的通知会被合并：
+    进度取最新值，消息（如部分输出）按顺序拼接，间隔结束时由定时器发出；工具调用结束时调用 close
+    发出剩余的通知，保证部分输出不会丢失。
+    """
+
+    def __init__(
+        self,
+        tool_call_id: str,
+        tool_name: str,
+        emit: Callable[[ToolCallProgress], None],
+        interval: float = 0.5,
+    ):
+        self.tool_call_id = tool_call_id
+        self.tool_name = tool_name
+        self.emit = emit
+        self.interval = interval
+        self.progress = 0.0
+        self.total: float | None = None
+        self._messages: list[str] = []
+        self._dirty = False
+        self._last_emit = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._closed = False
+
+    async def __call__(self, progress: float, total: float | None, message: str | None):
+        if self._closed:
+            return
+        self.progress = progress
+        self.total = total
+        if message:
+            self._messages.append(message)
+        self._dirty = True
+
+        wait = self._last_emit + self.interval - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(wait, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._dirty:
+            return
+        message = "".join(self._messages)
+        if len(message) > PROGRESS_MESSAGE_LIMIT:
+            message = "..." + message[-PROGRESS_MESSAGE_LIMIT:]
+        self._messages.clear()
+        self._dirty = False
+        self._last_emit = time.monotonic()
+        self.emit(
+            ToolCallProgress(
+                id=self.tool_call_id,
+                name=self.tool_name,
+                progress=self.progress,
+                total=self.total,
+                message=message,
+            )
+        )
+
+    def close(self):
+        """工具调用结束时发出剩余的通知，之后收到的通知被忽略"""
+        self.flush()
+        self._closed = True
@@ -1,22 +1,28 @@
+from util.startup import StartupTimer
+
+startup_timer = StartupTimer("gradio_app")
+
 import asyncio
 import json
-import os
+import sys
 from contextlib import AsyncExitStack
-from dataclasses import asdict, dataclass
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Optional
 
 import gradio as gr
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat.chat_completion_chunk import ChoiceDelta, ChoiceDeltaToolCall
 from rich import print as rprint
 
 from client.LLMClient import LLMClient
-from util.data import ToolCallInfo
+from util.data import ToolCallInfo, ToolCallProgress
 from util.constants import SERVER_CONFIG_FILE
 
 load_dotenv()  # load environment variables from .env
 
+startup_timer.mark("imports")
+
+# "Calling tool" 消息中最多显示的部分输出字符数
+PROGRESS_OUTPUT_LIMIT = 4000
+
 
 def load_system_prompt():
     with open("system_prompt.txt", "r") as f:
@@ -56,6 +62,8 @@ llm_client: Optional[LLMClient] = None
 
 async def initialize_client():
     global llm_client
+    # 第一次打开页面时记录冷启动时间，此时界面已经可以输入
+    startup_timer.report("first_prompt")
     llm_client = await exit_stack.enter_async_context(
         LLMClient(mcp_config_file=SERVER_CONFIG_FILE)
     )
@@ -163,6 +171,9 @@ with gr.Blocks(title="MCP Chat Assistant") as demo:
         # LLMClient 会自动将助手和工具消息添加到 internal_messages 中，因此此处无需手动更新
         current_type = None
         tool_call_info = {}
+        # 每个工具调用的参数和已收到的部分输出，用于显示执行进度
+        tool_call_args = {}
+        tool_call_output = {}
         async for response in llm_client.get_assistant_response(internal_messages):
             if response.type == "thinking":
                 # 处理模型思考过程中的中间输出
@@ -211,13 +222,33 @@ with gr.Blocks(title="MCP Chat Assistant") as demo:
                 )
                 history.append(new_message)
                 tool_call_info[tool_info.id] = new_message
+                tool_call_args[tool_info.id] = tool_info.args
+
+            if response.type == "tool_call_progress":
+                # 工具执行中：在对应的 "Calling tool" 消息中显示进度和部分输出
+                progress: ToolCallProgress = response.content
+                tool_call_message = tool_call_info.get(progress.id)
+                if tool_call_message is not None:
+                    output = tool_call_output.get(progress.id, "") + progress.message
+                    tool_call_output[progress.id] = output[-PROGRESS_OUTPUT_LIMIT:]
+                    total = f"/{progress.total:g}" if progress.total else ""
+                    tool_call_message.metadata["title"] = (
+                        f"Calling tool {progress.name} ... ({progress.progress:g}{total})"
+                    )
+                    tool_call_message.content = (
+                        f"calling, args: {str(tool_call_args[progress.id])}"
+                        f"\n\n```\n{tool_call_output[progress.id]}\n```"
+                    )
 
             if response.type == "tool_call_result":
                 # 处理工具调用结果并更新对应的消息状态
                 # print(f"tool_call_result from app: {response.content}")
                 tool_call_result: ToolCallInfo = response.content
                 tool_call_message = tool_call_info[tool_call_result.id]
-                tool_call_message.content = tool_call_result.result.content[0].text
+                # 内置工具（如 spawn_subagents）的结果是字符串而不是 CallToolResult
+                tool_call_message.content = llm_client.get_tool_result_message(
+                    tool_call_result.result, tool_call_result.id
+                )["content"]
                 tool_call_message.metadata["status"] = "done"
 
             # 每次迭代都返回当前历史记录和内部消息状态
@@ -244,4 +275,9 @@ with gr.Blocks(title="MCP Chat Assistant") as demo:
 # Start the Gradio app
 
 if __name__ == "__main__":
-    demo.launch()
+    if "--profile-imports" in sys.argv:
+        from util.startup import print_import_profile
+
+        print_import_profile("gradio_app")
+    else:
+        demo.launch()
@@ -0,0 +1,160 @@
+"""
+本地 SerpApi Google Flights 替身
+
+返回结构与 SerpApi google_flights 引擎一致的合成航班数据，可配置响应延迟。
+google_flights server 设置环境变量 SERPAPI_BASE_URL 指向本服务后即可在不消耗配额的情况下运行。
+
+运行:
+    python -m loadtest.mock_serpapi --port 8765 --latency 0.3
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+AIRLINES = [("United", "UA"), ("Delta", "DL"), ("American", "AA"), ("Alaska", "AS"), ("JetBlue", "B6")]
+HUBS = ["ORD", "DEN", "ATL", "DFW", "SEA"]
+
+
+def _airport(code: str, time_str: str) -> dict:
+    return {"name": f"{code} International Airport", "id": code, "time": time_str}
+
+
+def _leg(rng: random.Random, origin: str, destination: str, departure: datetime) -> tuple[dict, datetime]:
+    airline, code = rng.choice(AIRLINES)
+    duration = rng.randint(60, 360)
+    arrival = departure + timedelta(minutes=duration)
+    leg = {
+        "departure_airport": _airport(origin, departure.strftime("%Y-%m-%d %H:%M")),
+        "arrival_airport": _airport(destination, arrival.strftime("%Y-%m-%d %H:%M")),
+        "duration": duration,
+        "airplane": rng.choice(["Boeing 737", "Airbus A321", "Boeing 787", "Airbus A320"]),
+        "airline": airline,
+        "airline_logo": f"https://www.gstatic.com/flights/airline_logos/70px/{code}.png",
+        "travel_class": "Economy",
+        "flight_number": f"{code} {rng.randint(100, 2999)}",
+        "legroom": f"{rng.randint(30, 32)} in",
+        "extensions": ["Average legroom", "Wi-Fi for a fee", "In-seat power & USB outlets"],
+    }
+    return leg, arrival
+
+
+def _itinerary(rng: random.Random, origin: str, destination: str, day: str, returning: bool) -> dict:
+    departure = datetime.fromisoformat(day) + timedelta(hours=rng.randint(5, 21))
+    stops = rng.choice([0, 0, 1, 1, 2])
+    airports = [origin] + rng.sample(HUBS, stops) + [destination]
+
+    flights, layovers = [], []
+    for i in range(len(airports) - 1):
+        leg, arrival = _leg(rng, airports[i], airports[i + 1], departure)
+        flights.append(leg)
+        if i < len(airports) - 2:
+            layover = rng.randint(45, 240)
+            layovers.append({"duration": layover, "name": f"{airports[i + 1]} International Airport", "id": airports[i + 1]})
+            departure = arrival + timedelta(minutes=layover)
+
+    itinerary = {
+        "flights": flights,
+        "total_duration": sum(leg["duration"] for leg in flights) + sum(l["duration"] for l in layovers),
+        "carbon_emissions": {"this_flight": rng.randint(200000, 600000), "typical_for_this_route": 350000},
+        "price": rng.randint(120, 900),
+        "type": "Round trip",
+        "airline_logo": flights[0]["airline_logo"],
+    }
+    if layovers:
+        itinerary["layovers"] = layovers
+    if returning:
+        itinerary["booking_token"] = hashlib.sha1(repr(rng.random()).encode()).hexdigest() * 4
+    else:
+        itinerary["departure_token"] = hashlib.sha1(repr(rng.random()).encode()).hexdigest() * 3
+    return itinerary
+
+
+def build_results(params: dict, flights: int = 15) -> dict:
+    """根据请求参数确定性地生成一份 SerpApi 风格的航班搜索结果"""
+    seed_source = json.dumps({k: v for k, v in params.items() if k not in ("api_key", "source")}, sort_keys=True)
+    rng = random.Random(hashlib.sha256(seed_source.encode()).hexdigest())
+
+    returning = "departure_token" in params
+    origin, destination = params.get("departure_id", "SFO"), params.get("arrival_id", "JFK")
+    day = params.get("outbound_date", "2025-06-01")
+    if returning:
+        origin, destination = destination, origin
+        day = params.get("return_date") or day
+
+    itineraries = sorted(
+        (_itinerary(rng, origin, destination, day, returning) for _ in range(flights)),
+        key=lambda itinerary: itinerary["price"],
+    )
+    best_count = min(3, len(itineraries))
+    prices = [itinerary["price"] for itinerary in itineraries]
+    return {
+        "search_metadata": {
+            "id": rng.getrandbits(64),
+            "status": "Success",
+            "json_endpoint": "http://mock-serpapi/searches/mock.json",
+        },
+        "search_parameters": {k: v for k, v in params.items() if k != "api_key"},
+        "best_flights": itineraries[:best_count],
+        "other_flights": itineraries[best_count:],
+        "price_insights": {
+            "lowest_price": min(prices),
+            "price_level": "typical",
+            "typical_price_range": [min(prices), max(prices)],
+            "price_history": [[1700000000 + i * 86400, rng.randint(150, 900)] for i in range(30)],
+        },
+    }
+
+
+class MockSerpApiHandler(BaseHTTPRequestHandler):
+    # 由 make_server 设置
+    latency = 0.0
+    flights = 15
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/search":
+            self.send_error(404)
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        time.sleep(self.latency)
+
+        body = json.dumps(build_results(params, self.flights)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port: int = 0, latency: float = 0.3, flights: int = 15) -> ThreadingHTTPServer:
+    handler = type("ConfiguredMockSerpApiHandler", (MockSerpApiHandler,), {"latency": latency, "flights": flights})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def start_in_thread(port: int = 0, latency: float = 0.3, flights: int = 15) -> tuple[ThreadingHTTPServer, str]:
+    """在后台线程中启动替身服务，返回服务对象和基础 URL"""
+    server = make_server(port, latency, flights)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SerpApi Google Flights stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds to wait before each response")
+    parser.add_argument("--flights", type=int, default=15, help="itineraries per response")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.flights)
+    print(f"Mock SerpApi listening on http://127.0.0.1:{server.server_port}")
+    server.serve_forever()
@@ -0,0 +1,220 @@
+"""
+并发压测：N 个模拟用户同时通过 LLMClient.get_assistant_response 进行多轮对话
+
+模型使用 MockModel（按配置速率流式输出合成 chunk），航班工具使用本地 SerpApi 替身，
+不消耗任何真实配额。报告吞吐量、首 token 时间和单轮延迟的 p50/p95/p99，以及事件循环延迟，
+结果可写入 JSON 文件，并与之前某次提交的结果对比。
+
+运行（在仓库根目录）:
+    python -m loadtest.run_loadtest --users 20 --turns 3 --output loadtest_result.json
+    python -m loadtest.run_loadtest --users 20 --compare loadtest_result.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from client.LLMClient import LLMClient
+from loadtest import mock_serpapi
+from model.MockModel import MockModel
+from util.mytools import percentiles
+
+# 模拟用户在每轮对话中发起的航班搜索
+DEFAULT_TOOL_CALL = {
+    "name": "search_flights",
+    "arguments": {
+        "departure_id": "SFO",
+        "arrival_id": "JFK",
+        "outbound_date": "2025-06-01",
+        "return_date": "2025-06-08",
+        "type": 1,
+        "max_results": 3,
+    },
+}
+
+
+@dataclass
+class TurnResult:
+    ttft: float | None
+    latency: float
+    chunks: int
+    tool_calls: int
+    error: str | None = None
+
+
+@dataclass
+class LoopLagSampler:
+    """定期 sleep 并测量实际唤醒时间比预期晚了多少，即事件循环延迟"""
+
+    interval: float = 0.05
+    samples: list[float] = field(default_factory=list)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_server_config(args, serpapi_url: str | None) -> str:
+    """生成只包含 google-flights server 的 MCP 配置文件，并将其指向本地 SerpApi 替身"""
+    config = {}
+    if serpapi_url:
+        config["google-flights"] = {
+            "command": sys.executable,
+            "args": ["./server/google_flights/google_flights.py"],
+            "env": {
+                "SERPAPI_BASE_URL": serpapi_url,
+                "SERPAPI_API_KEY": "mock",
+                "FLIGHTS_CACHE_ENABLED": "1" if args.flights_cache else "0",
+                "MCP_CACHE_DIR": tempfile.mkdtemp(prefix="loadtest-cache-"),
+            },
+        }
+    fd, path = tempfile.mkstemp(prefix="loadtest-servers-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+async def simulate_user(llm_client: LLMClient, user_id: int, turns: int) -> list[TurnResult]:
+    messages = [{"role": "system", "content": "You are a helpful travel assistant."}]
+    results = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"User {user_id}, turn {turn}: find me a flight."})
+        start = time.perf_counter()
+        ttft = None
+        chunks = tool_calls = 0
+        try:
+            async for chunk in llm_client.get_assistant_response(messages):
+                chunks += 1
+                if ttft is None and chunk.type in ("thinking", "answer"):
+                    ttft = time.perf_counter() - start
+                if chunk.type == "tool_call":
+                    tool_calls += 1
+            results.append(TurnResult(ttft, time.perf_counter() - start, chunks, tool_calls))
+        except Exception as e:
+            results.append(TurnResult(ttft, time.perf_counter() - start, chunks, tool_calls, error=repr(e)))
+    return results
+
+
+async def run(args) -> dict:
+    serpapi_url = None
+    if not args.no_tools:
+        _, serpapi_url = mock_serpapi.start_in_thread(latency=args.serpapi_latency)
+    config_file = write_server_config(args, serpapi_url)
+
+    model = MockModel(
+        tokens_per_second=args.tokens_per_second,
+        time_to_first_token=args.ttft,
+        thinking_tokens=args.thinking_tokens,
+        answer_tokens=args.answer_tokens,
+        tool_calls=[] if args.no_tools else [DEFAULT_TOOL_CALL],
+    )
+
+    sampler = LoopLagSampler()
+    sampler_task = asyncio.create_task(sampler.run())
+    try:
+        async with LLMClient(mcp_config_file=config_file, model=model) as llm_client:
+            start = time.perf_counter()
+            per_user = await asyncio.gather(
+                *[simulate_user(llm_client, user_id, args.turns) for user_id in range(args.users)]
+            )
+            duration = time.perf_counter() - start
+    finally:
+        sampler_task.cancel()
+        os.unlink(config_file)
+
+    turns = [turn for user in per_user for turn in user]
+    ok = [turn for turn in turns if turn.error is None]
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "users": args.users,
+            "turns": args.turns,
+            "tokens_per_second": args.tokens_per_second,
+            "ttft": args.ttft,
+            "thinking_tokens": args.thinking_tokens,
+            "answer_tokens": args.answer_tokens,
+            "tools": not args.no_tools,
+            "serpapi_latency": args.serpapi_latency,
+        },
+        "duration": round(duration, 3),
+        "turns_completed": len(ok),
+        "errors": len(turns) - len(ok),
+        "error_samples": sorted({turn.error for turn in turns if turn.error})[:5],
+        "throughput_turns_per_s": round(len(ok) / duration, 3) if duration else 0,
+        "throughput_chunks_per_s": round(sum(turn.chunks for turn in ok) / duration, 1) if duration else 0,
+        "ttft": percentiles([turn.ttft for turn in ok if turn.ttft is not None]),
+        "turn_latency": percentiles([turn.latency for turn in ok]),
+        "event_loop_lag": percentiles(sampler.samples),
+    }
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    print(f"revision {report['revision']}  users={report['config']['users']} turns={report['config']['turns']}")
+    print(f"  completed turns : {report['turns_completed']}  errors: {report['errors']}")
+    for name in ("throughput_turns_per_s", "throughput_chunks_per_s"):
+        line = f"  {name:<24}: {report[name]}"
+        if baseline and baseline.get(name):
+            line += f"  (baseline {baseline[name]}, {report[name] / baseline[name] - 1:+.1%})"
+        print(line)
+    for section in ("ttft", "turn_latency", "event_loop_lag"):
+        for stat in ("p50", "p95", "p99"):
+            value = report[section].get(stat)
+            if value is None:
+                continue
+            line = f"  {section + ' ' + stat:<24}: {value * 1000:.1f} ms"
+            base = (baseline or {}).get(section, {}).get(stat)
+            if base:
+                line += f"  (baseline {base * 1000:.1f} ms, {value / base - 1:+.1%})"
+            print(line)
+    for error in report["error_samples"]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the orchestrator using mock backends")
+    parser.add_argument("--users", type=int, default=10, help="number of concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=3, help="conversation turns per user")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--ttft", type=float, default=0.3, help="mock model time to first token (seconds)")
+    parser.add_argument("--thinking-tokens", type=int, default=40)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--serpapi-latency", type=float, default=0.3, help="mock SerpApi response delay (seconds)")
+    parser.add_argument("--flights-cache", action="store_true", help="enable the flight search cache in the server")
+    parser.add_argument("--no-tools", action="store_true", help="do not start any MCP server or call tools")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
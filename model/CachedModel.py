@@ -0,0 +1,115 @@
+from .CompletionCache import CompletionCache
+from .ModelInterface import ModelInterface
+
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from openai.types.chat import ChatCompletionChunk
+
+logger = logging.getLogger(__name__)
+
+# 参与缓存键计算的模型配置属性
+IDENTITY_ATTRIBUTES = ("name", "model", "max_tokens", "extra_body", "adaptive_thinking")
+
+
+def model_identity(model: ModelInterface):
+    """描述模型配置的可序列化对象，配置不同的模型不会共用缓存"""
+    providers = getattr(model, "providers", None)
+    if providers is not None:
+        return [model_identity(provider) for provider in providers]
+    identity = {"type": type(model).__name__}
+    for attribute in IDENTITY_ATTRIBUTES:
+        if hasattr(model, attribute):
+            identity[attribute] = getattr(model, attribute)
+    return identity
+
+
+def tool_names_by_call_id(messages: list[dict]) -> dict[str, str]:
+    names = {}
+    for message in messages:
+        for tool_call in message.get("tool_calls") or []:
+            names[tool_call["id"]] = tool_call["function"]["name"]
+    return names
+
+
+class CachedModel(ModelInterface):
+    """
+    精确匹配的补全缓存，包装任意模型
+
+    缓存键为模型配置、工具列表和消息列表的哈希。未命中时转发到被包装的模型，
+    并在流正常结束后保存完整的 chunk 序列；命中时按原顺序重新生成同样的 chunk 流，
+    调用方（process_streamed_response）无法区分缓存结果与实时结果。
+
+    参数:
+        model (ModelInterface): 被包装的模型
+        cache (CompletionCache): 保存 chunk 序列的缓存
+        nondeterministic_tools (list[str]): 这些工具的结果出现在消息中时不读写缓存，
+            "*" 表示任意工具结果都不缓存（只缓存不含工具结果的请求）
+    """
+
+    def __init__(
+        self,
+        model: ModelInterface,
+        cache: CompletionCache,
+        nondeterministic_tools: Optional[list[str]] = None,
+    ):
+        self.model = model
+        self.cache = cache
+        self.nondeterministic_tools = set(nondeterministic_tools or [])
+        self._identity = model_identity(model)
+        # 与被包装的模型保持一致，便于日志和路由使用
+        self.name = getattr(model, "name", "cached")
+
+    def cache_key(self, messages, tools) -> str:
+        payload = json.dumps(
+            {"model": self._identity, "tools": tools, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, messages) -> bool:
+        if not self.nondeterministic_tools:
+            return True
+        tool_messages = [message for message in messages if message.get("role") == "tool"]
+        if not tool_messages:
+            return True
+        if "*" in self.nondeterministic_tools:
+            return False
+        names = tool_names_by_call_id(messages)
+        return not any(
+            names.get(message.get("tool_call_id")) in self.nondeterministic_tools
+            for message in tool_messages
+        )
+
+    async def get_chat_completion(self, messages, tools):
+        if not self.is_cacheable(messages):
+            return await self.model.get_chat_completion(messages, tools)
+
+        key = self.cache_key(messages, tools)
+        chunks = await self.cache.get(key)
+        if chunks is not None:
+            logger.debug(f"Completion cache hit {key[:12]}")
+            return self._replay(chunks)
+
+        stream = await self.model.get_chat_completion(messages, tools)
+        return self._record(key, stream)
+
+    async def _replay(self, chunks: list[dict]):
+        for chunk in chunks:
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    async def _record(self, key: str, stream):
+        """转发实时的 chunk 流，只有流完整结束（收到 finish_reason）时才写入缓存"""
+        chunks = []
+        finished = False
+        async for chunk in stream:
+            chunks.append(chunk.model_dump(mode="json"))
+            if any(choice.finish_reason for choice in chunk.choices):
+                finished = True
+            yield chunk
+        if finished:
+            await self.cache.put(key, chunks)
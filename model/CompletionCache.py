@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class CompletionCache:
+    """
+    两级的补全结果缓存：内存 LRU + 可选的 SQLite 持久层
+
+    值为一次流式补全的完整 chunk 序列（每个 chunk 为 JSON 可序列化的字典）。
+    内存层按条目数和总字节数淘汰最久未使用的条目；内存未命中时查询持久层并提升到内存。
+    持久层的读写（包括 commit）在线程中执行，不阻塞事件循环；内存层只在事件循环中访问。
+
+    参数:
+        max_entries (int): 内存层最多保留的条目数
+        max_bytes (int): 内存层所有条目序列化后的总字节数上限
+        path (str): 持久层 SQLite 文件路径，为 None 时只使用内存层
+        ttl (float): 条目的有效期（秒），为 None 时永不过期
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (写入时间, 序列化后的 chunk 序列)
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS completions (
+                        key TEXT PRIMARY KEY,
+                        chunks TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )"""
+                )
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    async def get(self, key: str) -> Optional[list[dict]]:
+        entry = self._memory.get(key)
+        if entry is not None and self._expired(entry[0]):
+            self._evict(key)
+            entry = None
+
+        if entry is None and self._conn is not None:
+            row = await asyncio.to_thread(self._load, key)
+            if row is not None and not self._expired(row[0]):
+                entry = (row[0], row[1])
+                self._put_memory(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        # 超过内存层上限的条目只保存在持久层中，不在内存里
+        if key in self._memory:
+            self._memory.move_to_end(key)
+        self.hits += 1
+        return json.loads(entry[1])
+
+    async def put(self, key: str, chunks: list[dict]):
+        entry = (time.time(), json.dumps(chunks))
+        self._put_memory(key, entry)
+        if self._conn is not None:
+            await asyncio.to_thread(self._store, key, entry)
+
+    def _load(self, key: str) -> Optional[tuple[float, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT created_at, chunks FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _store(self, key: str, entry: tuple[float, str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                (key, entry[1], entry[0]),
+            )
+
+    def _put_memory(self, key: str, entry: tuple[float, str]):
+        if len(entry[1]) > self.max_bytes:
+            return
+        self._evict(key)
+        self._memory[key] = entry
+        self._memory_bytes += len(entry[1])
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            self._evict(next(iter(self._memory)))
+
+    def _evict(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
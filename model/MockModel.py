@@ -0,0 +1,123 @@
+from .ModelInterface import ModelInterface
+
+import asyncio
+import itertools
+import json
+import time
+from typing import Optional
+
+from openai.types.chat import ChatCompletionChunk
+
+
+# 生成合成文本使用的词表
+SYNTHETIC_WORDS = (
+    "the flight weather search result tool answer model stream token latency "
+    "orchestrator server client request response price date city forecast"
+).split()
+
+
+class MockModel(ModelInterface):
+    """
+    本地模拟模型，按配置的速率流式返回合成的思考、回答和工具调用 chunk
+
+    返回的 chunk 与 DashScope 兼容接口的结构一致（思考内容在 delta.reasoning_content 中），
+    LLMClient 无法区分它与真实模型，可用于在不消耗配额的情况下压测整个编排链路。
+
+    参数:
+        name (str): 后端名称，在模型配置文件中作为 "mock" 类型的后端使用时由注册表传入
+        tokens_per_second (float): 每秒输出的 token 数量
+        time_to_first_token (float): 收到请求到输出第一个 chunk 的延迟（秒）
+        thinking_tokens (int): 每次回复的思考 token 数量，0 表示不输出思考过程
+        answer_tokens (int): 每次回复的回答 token 数量
+        tool_calls (list[dict]): 每轮对话第一次请求时发起的工具调用，形如
+            [{"name": "search_flights", "arguments": {...}}]；只调用 tools 中存在的工具，
+            最后一条消息是工具结果时直接输出回答
+        arguments_chunk_size (int): 工具调用参数每个 chunk 包含的字符数
+    """
+
+    def __init__(
+        self,
+        name: str = "mock",
+        tokens_per_second: float = 50.0,
+        time_to_first_token: float = 0.3,
+        thinking_tokens: int = 40,
+        answer_tokens: int = 80,
+        tool_calls: Optional[list[dict]] = None,
+        arguments_chunk_size: int = 8,
+    ):
+        self.name = name
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+        self.thinking_tokens = thinking_tokens
+        self.answer_tokens = answer_tokens
+        self.tool_calls = tool_calls or []
+        self.arguments_chunk_size = arguments_chunk_size
+        self._call_ids = itertools.count(1)
+
+    async def get_chat_completion(self, messages, tools=None):
+        return self._stream(messages, tools or [])
+
+    def _chunk(self, delta: dict, finish_reason: Optional[str] = None) -> ChatCompletionChunk:
+        return ChatCompletionChunk.model_validate(
+            {
+                "id": "mock-completion",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "mock-model",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+        )
+
+    def _pending_tool_calls(self, messages, tools) -> list[dict]:
+        # 工具结果返回后不再发起新的调用，避免无限循环
+        if messages and messages[-1].get("role") == "tool":
+            return []
+        available = {tool["function"]["name"] for tool in tools}
+        return [call for call in self.tool_calls if call["name"] in available]
+
+    async def _emit_tokens(self, count: int, field: str):
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for i in range(count):
+            await asyncio.sleep(delay)
+            yield self._chunk({field: SYNTHETIC_WORDS[i % len(SYNTHETIC_WORDS)] + " "})
+
+    async def _stream(self, messages, tools):
+        await asyncio.sleep(self.time_to_first_token)
+
+        async for chunk in self._emit_tokens(self.thinking_tokens, "reasoning_content"):
+            yield chunk
+
+        tool_calls = self._pending_tool_calls(messages, tools)
+        if not tool_calls:
+            async for chunk in self._emit_tokens(self.answer_tokens, "content"):
+                yield chunk
+            yield self._chunk({}, finish_reason="stop")
+            return
+
+        for index, call in enumerate(tool_calls):
+            yield self._chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": index,
+                            "id": f"call_mock_{next(self._call_ids)}",
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": ""},
+                        }
+                    ]
+                }
+            )
+            arguments = json.dumps(call.get("arguments", {}))
+            for start in range(0, len(arguments), self.arguments_chunk_size):
+                await asyncio.sleep(1 / self.tokens_per_second if self.tokens_per_second > 0 else 0)
+                yield self._chunk(
+                    {
+                        "tool_calls": [
+                            {
+                                "index": index,
+                                "function": {"arguments": arguments[start : start + self.arguments_chunk_size]},
+                            }
+                        ]
+                    }
+                )
+        yield self._chunk({}, finish_reason="tool_calls")
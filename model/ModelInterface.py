@@ -2,5 +2,5 @@ from abc import abstractmethod
 
 class ModelInterface:
     @abstractmethod
-    async def get_chat_completion(self, messages):
-        pass
\ No newline at end of file
+    async def get_chat_completion(self, messages, tools):
+        pass
@@ -0,0 +1,94 @@
+from .CachedModel import CachedModel
+from .CompletionCache import CompletionCache
+from .MockModel import MockModel
+from .ModelInterface import ModelInterface
+from .ModelRouter import ModelRouter
+from .OpenAICompatibleModel import OpenAICompatibleModel
+from .QwenModel import QwenModel
+
+import json
+import logging
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# 配置文件中 provider 的 type 与实现类的对应关系
+PROVIDER_TYPES: dict[str, type[ModelInterface]] = {
+    "openai": OpenAICompatibleModel,
+    "qwen": QwenModel,
+    "mock": MockModel,
+}
+
+
+def register_provider_type(type_name: str, cls: type[ModelInterface]):
+    PROVIDER_TYPES[type_name] = cls
+
+
+def create_provider(name: str, config: dict) -> ModelInterface:
+    config = dict(config)
+    type_name = config.pop("type", "openai")
+    if type_name not in PROVIDER_TYPES:
+        raise ValueError(f"Unknown model provider type {type_name!r} for provider {name!r}")
+    return PROVIDER_TYPES[type_name](name=name, **config)
+
+
+def load_model(config_file: str) -> ModelInterface:
+    """
+    根据模型配置文件创建模型；配置文件不存在时使用默认的 QwenModel
+
+    Example config:
+    {
+        "routing": "least_outstanding",
+        "ttft_deadline": 15,
+        "providers": {
+            "dashscope": {
+                "type": "qwen",
+                "model": "qwen3-235b-a22b",
+                "max_connections": 20
+            },
+            "backup": {
+                "type": "openai",
+                "base_url": "https://example.com/v1",
+                "api_key_env": "BACKUP_API_KEY",
+                "model": "some-model"
+            }
+        },
+        "completion_cache": {
+            "enabled": true,
+            "max_entries": 256,
+            "max_bytes": 33554432,
+            "path": ".cache/completions.sqlite3",
+            "ttl": 86400,
+            "nondeterministic_tools": ["*"]
+        }
+    }
+    """
+    load_dotenv()
+    try:
+        with open(config_file, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.info(f"Model config {config_file} not found, using default QwenModel")
+        return QwenModel()
+
+    providers = [
+        create_provider(name, provider_config)
+        for name, provider_config in config.get("providers", {}).items()
+    ]
+    router_config = {
+        key: value
+        for key, value in config.items()
+        if key not in ("providers", "completion_cache")
+    }
+    model = ModelRouter(providers, **router_config)
+    return wrap_with_cache(model, config.get("completion_cache"))
+
+
+def wrap_with_cache(model: ModelInterface, cache_config: dict | None) -> ModelInterface:
+    """按配置为模型加上补全缓存；缓存默认关闭，需要在配置中显式设置 "enabled": true"""
+    cache_config = dict(cache_config or {})
+    if not cache_config.pop("enabled", False):
+        return model
+    nondeterministic_tools = cache_config.pop("nondeterministic_tools", ["*"])
+    return CachedModel(model, CompletionCache(**cache_config), nondeterministic_tools)
@@ -0,0 +1,159 @@
+from .ModelInterface import ModelInterface
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# 可选的路由策略
+ROUTING_STRATEGIES = ("least_outstanding", "latency")
+
+
+@dataclass
+class ProviderStats:
+    # 正在进行中的请求数量（从发出请求到流结束）
+    outstanding: int = 0
+    # 首 token 时间的指数移动平均（秒），None 表示还没有样本
+    ttft_ewma: float | None = None
+    consecutive_failures: int = 0
+    # 在此时间之前该后端处于冷却期，只有其它后端都不可用时才会被选中
+    cooldown_until: float = 0.0
+
+
+class ModelRouter(ModelInterface):
+    """
+    在多个模型后端之间路由请求，并在后端变慢或出错时自动切换
+
+    每个请求按路由策略对后端排序，依次尝试：在 ttft_deadline 秒内没有收到第一个 chunk，
+    或者请求抛出异常，都会让该后端进入冷却期并立即切换到下一个后端。
+
+    参数:
+        providers (list[ModelInterface]): 后端列表，需要有 name 属性
+        routing (str): "least_outstanding" 选择进行中请求最少的后端；
+                       "latency" 选择首 token 时间移动平均最低的后端
+        ttft_deadline (float): 等待第一个 chunk 的最长时间（秒）
+        cooldown (float): 第一次失败后的冷却时间（秒），连续失败时翻倍
+        max_cooldown (float): 冷却时间上限（秒）
+        ewma_alpha (float): 首 token 时间移动平均中新样本的权重
+    """
+
+    def __init__(
+        self,
+        providers: list[ModelInterface],
+        routing: str = "least_outstanding",
+        ttft_deadline: float = 15.0,
+        cooldown: float = 10.0,
+        max_cooldown: float = 300.0,
+        ewma_alpha: float = 0.3,
+    ):
+        if not providers:
+            raise ValueError("ModelRouter needs at least one provider")
+        if routing not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {routing}. Expected one of {ROUTING_STRATEGIES}")
+        self.providers = providers
+        self.routing = routing
+        self.ttft_deadline = ttft_deadline
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.ewma_alpha = ewma_alpha
+        self.stats = {provider.name: ProviderStats() for provider in providers}
+
+    def _ordered_providers(self) -> list[ModelInterface]:
+        now = time.monotonic()
+
+        def sort_key(provider):
+            stats = self.stats[provider.name]
+            cooling = stats.cooldown_until > now
+            if self.routing == "latency":
+                # 没有样本的后端排在前面，以便尽快获得它的延迟数据
+                score = stats.ttft_ewma if stats.ttft_ewma is not None else 0.0
+            else:
+                score = stats.outstanding
+            return (cooling, score)
+
+        return sorted(self.providers, key=sort_key)
+
+    def _record_success(self, stats: ProviderStats, ttft: float):
+        stats.consecutive_failures = 0
+        stats.cooldown_until = 0.0
+        if stats.ttft_ewma is None:
+            stats.ttft_ewma = ttft
+        else:
+            stats.ttft_ewma = self.ewma_alpha * ttft + (1 - self.ewma_alpha) * stats.ttft_ewma
+
+    def _record_failure(self, stats: ProviderStats):
+        stats.consecutive_failures += 1
+        cooldown = min(self.cooldown * 2 ** (stats.consecutive_failures - 1), self.max_cooldown)
+        stats.cooldown_until = time.monotonic() + cooldown
+
+    def metrics(self) -> dict:
+        """每个后端的路由统计和限流器的令牌桶水位"""
+        result = {}
+        for provider in self.providers:
+            stats = self.stats[provider.name]
+            result[provider.name] = {
+                "outstanding": stats.outstanding,
+                "ttft_ewma": stats.ttft_ewma,
+                "consecutive_failures": stats.consecutive_failures,
+                "cooling_down": stats.cooldown_until > time.monotonic(),
+            }
+            rate_limiter = getattr(provider, "rate_limiter", None)
+            if rate_limiter is not None:
+                result[provider.name]["rate_limit"] = rate_limiter.metrics()
+        return result
+
+    async def get_chat_completion(self, messages, tools):
+        last_error: Exception | None = None
+        candidates = self._ordered_providers()
+        for index, provider in enumerate(candidates):
+            stats = self.stats[provider.name]
+            stats.outstanding += 1
+            start = time.monotonic()
+            # 最后一个候选后端没有可以切换的目标，不再限制首 token 时间
+            deadline = self.ttft_deadline if index < len(candidates) - 1 else None
+            stream = None
+            try:
+                stream = await asyncio.wait_for(
+                    provider.get_chat_completion(messages, tools), deadline
+                )
+                remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - start))
+                first_chunk = await asyncio.wait_for(anext(stream), remaining)
+            except Exception as e:
+                stats.outstanding -= 1
+                self._record_failure(stats)
+                if stream is not None:
+                    await _close_stream(stream)
+                logger.warning(f"Model provider {provider.name} failed, trying next provider: {e!r}")
+                last_error = e
+                continue
+
+            self._record_success(stats, time.monotonic() - start)
+            return self._relay(stream, first_chunk, stats)
+
+        raise last_error
+
+    async def _relay(self, stream, first_chunk, stats: ProviderStats):
+        """
+        先返回已经收到的第一个 chunk，再转发流中剩余的 chunk，流结束时更新进行中的请求数
+
+        调用方提前停止读取（关闭或丢弃生成器）时同样关闭后端的流，释放其 HTTP 响应和连接。
+        """
+        try:
+            yield first_chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            stats.outstanding -= 1
+            await _close_stream(stream)
+
+
+async def _close_stream(stream):
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is None:
+        return
+    try:
+        await close()
+    except Exception:
+        pass
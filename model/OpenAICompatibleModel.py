@@ -0,0 +1,106 @@
+from .ModelInterface import ModelInterface
+
+import json
+import logging
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
+
+from util.mytools import estimate_tokens
+from util.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatibleModel(ModelInterface):
+    """
+    任意 OpenAI 兼容接口的模型后端
+
+    每个后端持有自己的 AsyncOpenAI 客户端和按后端调优的连接池。
+
+    参数:
+        name (str): 后端名称，用于日志和路由统计
+        base_url (str): 接口地址
+        model (str): 模型名称
+        api_key (str): API Key，未指定时从 api_key_env 对应的环境变量读取
+        api_key_env (str): 保存 API Key 的环境变量名
+        max_tokens (int): 单次回复的最大 token 数量
+        extra_body (dict): 附加到请求体中的厂商特定参数
+        max_connections (int): 连接池的最大连接数
+        max_keepalive_connections (int): 连接池保持的最大空闲连接数
+        timeout (float): 请求超时时间（秒）
+        rate_limit (dict): 限流配置，形如 {"requests_per_minute": 60, "tokens_per_minute": 100000}；
+            请求前按估算的 token 数（提示词 + max_tokens）排队等待，并根据响应头调整限额
+        max_rate_limit_retries (int): 收到 429 后按 Retry-After 等待并重试的次数
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        api_key_env: Optional[str] = None,
+        max_tokens: int = 1000,
+        extra_body: Optional[dict] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeout: float = 60.0,
+        rate_limit: Optional[dict] = None,
+        max_rate_limit_retries: int = 3,
+    ):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.extra_body = extra_body or {}
+        self.client = AsyncOpenAI(
+            api_key=api_key or (os.getenv(api_key_env) if api_key_env else None),
+            base_url=base_url,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+                timeout=timeout,
+            ),
+        )
+        # 未配置限额时仍然根据 Retry-After 和 x-ratelimit-* 响应头自动限流
+        self.rate_limiter = RateLimiter(name, **(rate_limit or {}))
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+    def get_request_params(self, messages, tools) -> dict:
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": messages,
+            "tools": tools,
+            "tool_choice": "auto",
+            "extra_body": self.extra_body,
+            "stream": True,
+            "parallel_tool_calls": True,
+        }
+
+    def estimate_request_tokens(self, params: dict) -> int:
+        prompt = json.dumps([params["messages"], params["tools"]], ensure_ascii=False, default=str)
+        return estimate_tokens(prompt) + params["max_tokens"]
+
+    async def create_stream(self, params: dict):
+        """经过限流器发出流式请求；被限流（429）时等待 Retry-After 后重试，而不是直接失败"""
+        tokens = self.estimate_request_tokens(params)
+        for attempt in range(self.max_rate_limit_retries + 1):
+            await self.rate_limiter.acquire_async(tokens)
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(**params)
+            except RateLimitError as e:
+                self.rate_limiter.update_from_headers(e.response.headers, status_code=429)
+                if attempt == self.max_rate_limit_retries:
+                    raise
+                logger.warning(f"Model provider {self.name} rate limited, waiting in queue: {e}")
+                continue
+            self.rate_limiter.update_from_headers(raw.headers)
+            return raw.parse()
+
+    async def get_chat_completion(self, messages, tools):
+        return await self.create_stream(self.get_request_params(messages, tools))
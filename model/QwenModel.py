@@ -1,29 +1,113 @@
-from .ModelInterface import ModelInterface
+from .OpenAICompatibleModel import OpenAICompatibleModel
+from .ThinkingPolicy import ThinkingDecision, ThinkingPolicy, extract_signals
+
+import json
+import logging
+import time
+from dataclasses import asdict
+from typing import Optional
 
-import os
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 
 MODEL_NAME = "qwen3-235b-a22b"
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 load_dotenv()  # load environment variables from .env
 
-class QwenModel(ModelInterface):
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=os.getenv("DASHSCOPE_API_KEY"),
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+logger = logging.getLogger(__name__)
+
+
+class QwenModel(OpenAICompatibleModel):
+    """
+    DashScope 上的 Qwen 模型
+
+    开启 adaptive_thinking 时，每次请求由 ThinkingPolicy 根据本地信号决定是否思考以及思考预算，
+    并记录决策和实际延迟（首 chunk 时间、首个回答 chunk 时间、总时间），便于调整策略；
+    指定 thinking_log_file 时这些记录会以 JSON Lines 格式追加到该文件。
+    """
+
+    def __init__(
+        self,
+        name="dashscope",
+        base_url=DASHSCOPE_BASE_URL,
+        model=MODEL_NAME,
+        api_key_env="DASHSCOPE_API_KEY",
+        max_tokens=1000,
+        extra_body=None,
+        adaptive_thinking: bool = True,
+        thinking_policy: Optional[dict] = None,
+        thinking_log_file: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(
+            name=name,
+            base_url=base_url,
+            model=model,
+            api_key_env=api_key_env,
+            max_tokens=max_tokens,
+            extra_body=(
+                extra_body
+                if extra_body is not None
+                else {"enable_thinking": True, "thinking_budget": 500}
+            ),
+            **kwargs,
         )
+        # 只有配置中开启了思考时才需要按请求调整
+        self.adaptive_thinking = adaptive_thinking and bool(self.extra_body.get("enable_thinking"))
+        self.thinking_policy = ThinkingPolicy(**(thinking_policy or {}))
+        self.thinking_log_file = thinking_log_file
 
     async def get_chat_completion(self, messages, tools):
-        response = await self.client.chat.completions.create(
-            model=MODEL_NAME,
-            max_tokens=1000,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            extra_body={"enable_thinking": True, "thinking_budget": 500},
-            stream=True,
-            parallel_tool_calls=True,
-        )
-        return response
\ No newline at end of file
+        params = self.get_request_params(messages, tools)
+        if not self.adaptive_thinking:
+            return await self.create_stream(params)
+
+        signals = extract_signals(messages, tools)
+        decision = self.thinking_policy.decide(signals)
+        extra_body = {**self.extra_body, "enable_thinking": decision.enable_thinking}
+        extra_body.pop("thinking_budget", None)
+        if decision.enable_thinking:
+            extra_body["thinking_budget"] = decision.thinking_budget
+        params["extra_body"] = extra_body
+
+        start = time.monotonic()
+        stream = await self.create_stream(params)
+        return self._measure(stream, decision, asdict(signals), start)
+
+    async def _measure(self, stream, decision: ThinkingDecision, signals: dict, start: float):
+        """转发流中的 chunk，同时记录首 chunk、首个回答 chunk 的时间和思考 chunk 数量"""
+        first_chunk = first_answer = None
+        reasoning_chunks = 0
+        try:
+            async for chunk in stream:
+                now = time.monotonic()
+                if first_chunk is None:
+                    first_chunk = now - start
+                if chunk.choices:
+                    delta = chunk.choices[0].delta
+                    if getattr(delta, "reasoning_content", None):
+                        reasoning_chunks += 1
+                    elif (delta.content or delta.tool_calls) and first_answer is None:
+                        first_answer = now - start
+                yield chunk
+        finally:
+            self._log_thinking(
+                {
+                    "provider": self.name,
+                    "decision": decision.to_dict(),
+                    "signals": signals,
+                    "time_to_first_chunk": first_chunk,
+                    "time_to_first_answer": first_answer,
+                    "total_time": time.monotonic() - start,
+                    "reasoning_chunks": reasoning_chunks,
+                }
+            )
+
+    def _log_thinking(self, record: dict):
+        logger.info(f"thinking: {json.dumps(record)}")
+        if self.thinking_log_file:
+            try:
+                with open(self.thinking_log_file, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Cannot write thinking log {self.thinking_log_file}: {e}")
@@ -0,0 +1,99 @@
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class ThinkingSignals:
+    # 当前用户消息之后已经进行了几轮工具调用循环，0 表示本轮对话的第一次请求
+    iteration: int
+    # 最后一条消息是否为工具调用结果
+    last_is_tool_result: bool
+    # 最新一条用户消息的字符数
+    query_length: int
+    # 之前是否已经有过助手回复（即是否为追问）
+    is_follow_up: bool
+    # 本次请求是否携带了工具
+    tools_available: bool
+
+
+@dataclass
+class ThinkingDecision:
+    enable_thinking: bool
+    thinking_budget: int | None
+    reason: str
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def extract_signals(messages: list[dict], tools: list | None) -> ThinkingSignals:
+    """从消息列表中提取用于决策的本地信号，不做任何网络请求"""
+    last_user_index = -1
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            last_user_index = i
+            break
+
+    query = messages[last_user_index].get("content") if last_user_index >= 0 else ""
+    return ThinkingSignals(
+        iteration=sum(1 for m in messages[last_user_index + 1 :] if m.get("role") == "assistant"),
+        last_is_tool_result=bool(messages) and messages[-1].get("role") == "tool",
+        query_length=len(query) if isinstance(query, str) else 0,
+        is_follow_up=any(m.get("role") == "assistant" for m in messages[: max(last_user_index, 0)]),
+        tools_available=bool(tools),
+    )
+
+
+class ThinkingPolicy:
+    """
+    根据本地信号为每次请求选择是否开启思考以及思考预算
+
+    - 工具循环的后续轮次中，已经没有可用工具或达到 max_tool_iterations 轮时，模型只需要总结
+      工具结果，关闭思考
+    - 工具循环的其它后续轮次使用较小的预算，模型可以根据工具结果决定是否继续调用工具
+    - 简短的追问：没有可用工具时关闭思考，有工具时使用较小的预算选择工具
+    - 较长的问题使用最大预算
+    - 其它情况使用默认预算
+
+    参数:
+        default_budget (int): 默认思考预算
+        small_budget (int): 工具循环后续轮次和带工具的简短追问的思考预算
+        max_budget (int): 较长问题的思考预算
+        short_query_chars (int): 追问的字符数不超过该值时视为简短追问
+        long_query_chars (int): 问题的字符数超过该值时视为较长问题
+        max_tool_iterations (int | None): 工具循环进行到该轮次后只总结结果，None 表示不限制
+    """
+
+    def __init__(
+        self,
+        default_budget: int = 500,
+        small_budget: int = 200,
+        max_budget: int = 800,
+        short_query_chars: int = 20,
+        long_query_chars: int = 300,
+        max_tool_iterations: int | None = 3,
+    ):
+        self.default_budget = default_budget
+        self.small_budget = small_budget
+        self.max_budget = max_budget
+        self.short_query_chars = short_query_chars
+        self.long_query_chars = long_query_chars
+        self.max_tool_iterations = max_tool_iterations
+
+    def decide(self, signals: ThinkingSignals) -> ThinkingDecision:
+        if signals.iteration > 0:
+            if signals.last_is_tool_result and (
+                not signals.tools_available
+                or (
+                    self.max_tool_iterations is not None
+                    and signals.iteration >= self.max_tool_iterations
+                )
+            ):
+                return ThinkingDecision(False, None, "summarize_tool_results")
+            return ThinkingDecision(True, self.small_budget, "tool_loop_iteration")
+        if signals.is_follow_up and signals.query_length <= self.short_query_chars:
+            if signals.tools_available:
+                return ThinkingDecision(True, self.small_budget, "short_follow_up_with_tools")
+            return ThinkingDecision(False, None, "short_follow_up")
+        if signals.query_length > self.long_query_chars:
+            return ThinkingDecision(True, self.max_budget, "long_query")
+        return ThinkingDecision(True, self.default_budget, "default")
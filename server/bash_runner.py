@@ -0,0 +1,197 @@
+"""
+异步 bash 脚本执行
+
+使用 asyncio 子进程执行脚本，增量读取标准输出和标准错误，只保留有上限的头部和尾部输出，
+并为子进程设置 CPU 时间和内存的资源限制，避免失控脚本拖垮宿主机或阻塞其它工具调用。
+"""
+
+import asyncio
+import codecs
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+# 每次从管道读取的字节数
+READ_CHUNK_SIZE = 4096
+# 发送给进度回调的单条部分输出的最大字符数
+PROGRESS_MESSAGE_LIMIT = 2000
+
+# 进度回调：(已读取的总字节数, 本次新增的部分输出)
+ProgressCallback = Callable[[int, str], Awaitable[None]]
+
+
+class CappedOutput:
+    """
+    有上限的输出缓冲区
+
+    超过上限时保留开头和结尾各一半的字节，中间部分丢弃并在结果中插入截断标记。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, data: bytes):
+        self.total += len(data)
+        if len(self.head) < self.head_limit:
+            take = self.head_limit - len(self.head)
+            self.head += data[:take]
+            data = data[take:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[: len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated_bytes(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self) -> str:
+        head = self.head.decode(errors="replace")
+        tail = self.tail.decode(errors="replace")
+        if self.truncated_bytes <= 0:
+            return head + tail
+        return f"{head}\n... [输出过长，已截断 {self.truncated_bytes} 字节] ...\n{tail}"
+
+
+@dataclass
+class BashResult:
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+
+
+def _limit_resources(script: str, cpu_seconds: int, memory_bytes: int) -> str:
+    """
+    在脚本开头用 ulimit 设置资源限制
+
+    Server 会在线程中执行其它工具，多线程进程中 fork 之后执行 Python 代码（preexec_fn）并不安全，
+    因此由 bash 自己设置限制。前缀与脚本的第一行在同一行，错误信息中的行号不变；某些平台（如 macOS）
+    不支持部分限制，设置失败时忽略，不影响脚本执行。
+    """
+    return (
+        f"ulimit -t {int(cpu_seconds)} 2>/dev/null; "
+        f"ulimit -v {int(memory_bytes) // 1024} 2>/dev/null; {script}"
+    )
+
+
+class _ProgressReporter:
+    """合并部分输出，按固定的时间间隔调用进度回调，避免过于频繁的通知"""
+
+    def __init__(self, callback: Optional[ProgressCallback], interval: float):
+        self.callback = callback
+        self.interval = interval
+        self.pending: list[str] = []
+        self.total_bytes = 0
+        self.last_sent = 0.0
+
+    async def feed(self, size: int, text: str):
+        """size 为新读取的字节数，text 为其中已完整解码的部分"""
+        self.total_bytes += size
+        if self.callback is None:
+            return
+        if text:
+            self.pending.append(text)
+        if time.monotonic() - self.last_sent >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if self.callback is None or not self.pending:
+            return
+        message = "".join(self.pending)
+        self.pending.clear()
+        if len(message) > PROGRESS_MESSAGE_LIMIT:
+            message = "..." + message[-PROGRESS_MESSAGE_LIMIT:]
+        self.last_sent = time.monotonic()
+        try:
+            await self.callback(self.total_bytes, message)
+        except Exception:
+            # 进度通知失败不影响脚本本身的执行
+            pass
+
+
+async def run_bash_script(
+    script: str,
+    timeout: float = 30,
+    output_limit: int = 64 * 1024,
+    cpu_seconds: int = 30,
+    memory_bytes: int = 1024 * 1024 * 1024,
+    progress_callback: Optional[ProgressCallback] = None,
+    progress_interval: float = 1.0,
+) -> BashResult:
+    """
+    异步执行 bash 脚本
+
+    参数:
+        script (str): 要执行的 bash 脚本
+        timeout (float): 墙钟超时时间（秒），超时后杀掉整个进程组
+        output_limit (int): 标准输出和标准错误各自最多保留的字节数
+        cpu_seconds (int): 子进程可使用的 CPU 时间上限（秒）
+        memory_bytes (int): 子进程可使用的虚拟内存上限（字节）
+        progress_callback (ProgressCallback): 收到新的输出时调用，用于推送部分输出
+        progress_interval (float): 两次进度回调之间的最小间隔（秒）
+
+    返回:
+        BashResult: 退出码、截断后的标准输出和标准错误，以及是否超时
+    """
+    process = await asyncio.create_subprocess_exec(
+        "bash",
+        "-c",
+        _limit_resources(script, cpu_seconds, memory_bytes),
+        # 不继承 Server 的标准输入，它是 MCP 的 stdio 通道
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        # 放入独立的进程组，超时时可以连同其子进程一起杀掉
+        start_new_session=True,
+    )
+
+    stdout = CappedOutput(output_limit)
+    stderr = CappedOutput(output_limit)
+    reporter = _ProgressReporter(progress_callback, progress_interval)
+
+    async def pump(stream: asyncio.StreamReader, buffer: CappedOutput):
+        # 多字节字符可能跨越两次读取，使用增量解码器，不完整的字节留到下一次解码
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while chunk := await stream.read(READ_CHUNK_SIZE):
+            buffer.feed(chunk)
+            await reporter.feed(len(chunk), decoder.decode(chunk))
+        await reporter.feed(0, decoder.decode(b"", final=True))
+
+    timed_out = False
+    completed = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                pump(process.stdout, stdout),
+                pump(process.stderr, stderr),
+                process.wait(),
+            ),
+            timeout=timeout,
+        )
+        completed = True
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        if not completed:
+            # bash 本身可能已经退出，但后台子进程仍持有管道，因此总是杀掉整个进程组
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+    await reporter.flush()
+    return BashResult(
+        returncode=None if timed_out else process.returncode,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue(),
+        timed_out=timed_out,
+    )
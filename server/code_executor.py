@@ -1,51 +1,75 @@
-from mcp.server.fastmcp import FastMCP
-import io
-import contextlib
-import traceback
-import subprocess
+from mcp.server.fastmcp import Context, FastMCP
+from contextlib import asynccontextmanager
+from typing import Optional
+import os
+
+from bash_runner import run_bash_script
+from python_worker_pool import PythonWorkerPool
+
+from server_setup import create_server
+
+# Python 代码执行进程池配置
+PYTHON_WORKERS = int(os.getenv("CODE_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1)))
+PYTHON_MAX_EXECUTIONS_PER_WORKER = int(os.getenv("CODE_EXECUTOR_MAX_EXECUTIONS", 50))
+PYTHON_TIMEOUT = float(os.getenv("CODE_EXECUTOR_TIMEOUT", 30))
+
+# bash 脚本执行配置：墙钟超时、每个输出流保留的字节数、CPU 时间和内存上限
+BASH_TIMEOUT = float(os.getenv("CODE_EXECUTOR_BASH_TIMEOUT", 30))
+BASH_OUTPUT_LIMIT = int(os.getenv("CODE_EXECUTOR_OUTPUT_LIMIT", 64 * 1024))
+BASH_CPU_SECONDS = int(os.getenv("CODE_EXECUTOR_CPU_SECONDS", 30))
+BASH_MEMORY_MB = int(os.getenv("CODE_EXECUTOR_MEMORY_MB", 1024))
+
+worker_pool = PythonWorkerPool(
+    size=PYTHON_WORKERS,
+    max_executions_per_worker=PYTHON_MAX_EXECUTIONS_PER_WORKER,
+    timeout=PYTHON_TIMEOUT,
+)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    # Server 启动时预热工作进程，退出时回收
+    await worker_pool.start()
+    try:
+        yield
+    finally:
+        await worker_pool.shutdown()
+
 
 # Initialize FastMCP server
-mcp = FastMCP("code_executor")
+mcp = create_server("code_executor", lifespan=server_lifespan)
 
 @mcp.tool()
-async def execute_python_code(code: str) -> str:
+async def execute_python_code(code: str, session_id: Optional[str] = None) -> str:
     """执行给定的Python代码字符串并返回其输出。被执行的代码应打印其输入和输出（如果有）
 
     Args:
         code: 要执行的Python代码。
+        session_id: 可选的会话标识。指定后，同一会话的多次调用在同一个解释器中执行，
+                    之前定义的变量和导入的模块会被保留；不指定时每次都在全新的命名空间中执行。
     """
-    # 创建字符串缓冲区来捕获标准输出和标准错误输出
-    output_buffer = io.StringIO()
-    error_buffer = io.StringIO()
+    # 代码在独立的工作进程中执行，不会阻塞 Server 的事件循环
+    # 对于生产场景，请考虑使用沙箱环境如Docker或受限解释器
+    result = await worker_pool.execute(code, session_id=session_id)
 
-    try:
-        # 重定向标准输出和标准错误以捕获执行代码的输出
-        with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(error_buffer):
-            # 使用受限的命名空间以提高安全性，尽管exec本身具有风险
-            # 对于生产场景，请考虑使用沙箱环境如Docker或受限解释器
-            exec(code, {}) 
-        
-        # 获取标准输出和标准错误的内容
-        stdout = output_buffer.getvalue()
-        stderr = error_buffer.getvalue()
-
-        # 根据是否有错误输出返回相应的结果
-        if stderr:
-            return f"执行完成但有错误:\n{stderr}\n输出:\n{stdout}"
-        else:
-            return f"执行成功:\n输出:\n{stdout}"
+    if result.timed_out:
+        return f"代码执行超时（{worker_pool.timeout}秒），工作进程已被终止。"
 
-    except Exception as e:
-        # 捕获exec执行过程中出现的异常
-        return f"执行代码失败:\n{traceback.format_exc()}"
-    finally:
-        # 清理缓冲区资源
-        output_buffer.close()
-        error_buffer.close()
+    note = "注意：会话的解释器已重建，之前定义的变量已丢失。\n" if result.session_reset else ""
+
+    # 捕获exec执行过程中出现的异常
+    if result.error:
+        return f"{note}执行代码失败:\n{result.error}"
+
+    # 根据是否有错误输出返回相应的结果
+    if result.stderr:
+        return f"{note}执行完成但有错误:\n{result.stderr}\n输出:\n{result.stdout}"
+    else:
+        return f"{note}执行成功:\n输出:\n{result.stdout}"
 
 
 @mcp.tool()
-async def execute_bash_script(script: str) -> str:
+async def execute_bash_script(script: str, ctx: Context) -> str:
     """执行给定的bash脚本字符串并返回其输出。
     尝试过滤掉一些潜在的有害命令。
     执行的脚本应打印其输入和输出（如果有）
@@ -58,33 +82,35 @@ async def execute_bash_script(script: str) -> str:
              或者如果执行失败或超时则返回错误信息。
     """
 
+    async def send_partial_output(total_bytes: int, partial_output: str):
+        # 以 MCP 进度通知的形式推送部分输出，progress 为已读取的字节数
+        await ctx.report_progress(total_bytes, message=partial_output)
+
     try:
         # 执行脚本
-        # 超时设置很重要，可以防止脚本失控运行
-        process = subprocess.run(
-            ['bash', '-c', script],
-            capture_output=True,           # 捕获标准输出和标准错误
-            text=True,                     # 以文本模式处理输出
-            timeout=30,                    # 超时时间（秒）
-            check=False                    # 不自动为非零退出码抛出异常
+        # 超时设置和资源限制很重要，可以防止脚本失控运行
+        result = await run_bash_script(
+            script,
+            timeout=BASH_TIMEOUT,
+            output_limit=BASH_OUTPUT_LIMIT,
+            cpu_seconds=BASH_CPU_SECONDS,
+            memory_bytes=BASH_MEMORY_MB * 1024 * 1024,
+            progress_callback=send_partial_output,
         )
-
-        stdout = process.stdout            # 获取标准输出
-        stderr = process.stderr            # 获取标准错误
-
-        # 检查脚本是否成功执行
-        if process.returncode != 0:
-            return f"脚本执行完成但有错误 (退出码 {process.returncode}):\n标准错误:\n{stderr}\n标准输出:\n{stdout}"
-        else:
-            return f"脚本执行成功:\n标准输出:\n{stdout}\n标准错误:\n{stderr}"
-
-    except subprocess.TimeoutExpired:
-        # 处理超时情况
-        return "脚本执行超时。"
     except Exception as e:
         # 处理其他异常情况
         return f"执行脚本失败:\n{str(e)}"
 
+    if result.timed_out:
+        # 处理超时情况，同时返回超时前已产生的输出
+        return f"脚本执行超时。\n标准错误:\n{result.stderr}\n标准输出:\n{result.stdout}"
+
+    # 检查脚本是否成功执行
+    if result.returncode != 0:
+        return f"脚本执行完成但有错误 (退出码 {result.returncode}):\n标准错误:\n{result.stderr}\n标准输出:\n{result.stdout}"
+    else:
+        return f"脚本执行成功:\n标准输出:\n{result.stdout}\n标准错误:\n{result.stderr}"
+
 
 if __name__ == "__main__":
     # Initialize and run the server
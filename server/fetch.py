@@ -0,0 +1,246 @@
+from mcp.server.fastmcp import FastMCP
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+from html_extract import extract_content
+from http_cache import CachingHTTPClient
+
+from server_setup import create_server
+
+USER_AGENT = os.getenv(
+    "FETCH_USER_AGENT", "ModelContextProtocol/1.0 (Autonomous; +https://github.com/modelcontextprotocol/servers)"
+)
+# 连接池和每个主机同时进行的请求数
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", 20))
+FETCH_MAX_CONNECTIONS_PER_HOST = int(os.getenv("FETCH_MAX_CONNECTIONS_PER_HOST", 4))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 30))
+# 提取结果缓存的总字节数
+FETCH_CONTENT_CACHE_BYTES = int(os.getenv("FETCH_CONTENT_CACHE_BYTES", 32 * 1024 * 1024))
+# 与 mcp-server-fetch 相同，默认遵守 robots.txt，FETCH_IGNORE_ROBOTS_TXT=1 时跳过检查
+FETCH_IGNORE_ROBOTS_TXT = os.getenv("FETCH_IGNORE_ROBOTS_TXT", "0") == "1"
+# robots.txt 解析结果的缓存时间（秒），RFC 9309 建议不超过 24 小时
+FETCH_ROBOTS_TTL = float(os.getenv("FETCH_ROBOTS_TTL", 24 * 60 * 60))
+
+# 原始响应按 URL 缓存，遵循 HTTP 缓存语义（新鲜期内直接返回，过期后条件请求重新验证）
+http_client = CachingHTTPClient(
+    headers={"User-Agent": USER_AGENT},
+    timeout=FETCH_TIMEOUT,
+    max_connections=FETCH_MAX_CONNECTIONS,
+    max_entry_bytes=8 * 1024 * 1024,
+    max_connections_per_host=FETCH_MAX_CONNECTIONS_PER_HOST,
+    follow_redirects=True,
+)
+
+
+class ContentCache:
+    """
+    以响应体摘要为键的提取结果缓存
+
+    响应体相同（重新验证返回 304、不同 URL 返回相同内容、分页读取同一文档）时直接复用提取结果，
+    按总字节数淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def key(content: bytes, raw: bool) -> str:
+        return f"{'raw' if raw else 'markdown'}:{hashlib.sha256(content).hexdigest()}"
+
+    def get(self, key: str) -> str | None:
+        text = self._entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: str, text: str):
+        size = len(text.encode())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key).encode())
+        self._entries[key] = text
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.encode())
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+content_cache = ContentCache(FETCH_CONTENT_CACHE_BYTES)
+
+
+class RobotsCache:
+    """
+    按站点缓存的 robots.txt 解析结果
+
+    robots.txt 通过共享的 http_client 获取（复用连接池，并发请求合并为一次），解析结果缓存 ttl 秒，
+    同一站点的后续请求不再访问 robots.txt。获取失败时不缓存，下次请求重试。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, tuple[float, RobotFileParser]] = {}
+
+    async def get(self, robots_url: str) -> RobotFileParser:
+        cached = self._entries.get(robots_url)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+
+        try:
+            response = await http_client.get(robots_url)
+        except Exception as e:
+            raise ValueError(f"Failed to fetch robots.txt {robots_url} due to a connection issue: {e!r}")
+        parser = RobotFileParser(robots_url)
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            # 没有 robots.txt，不限制抓取
+            parser.allow_all = True
+        elif response.status_code >= 500:
+            raise ValueError(
+                f"Failed to fetch robots.txt {robots_url} - status code {response.status_code}"
+            )
+        else:
+            parser.parse(response.text.splitlines())
+            parser.modified()
+        self._entries[robots_url] = (time.time(), parser)
+        return parser
+
+    def stats(self) -> dict:
+        return {"sites": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+robots_cache = RobotsCache(FETCH_ROBOTS_TTL)
+
+
+async def check_robots_txt(url: str):
+    """robots.txt 不允许 USER_AGENT 抓取 url 时抛出 ValueError"""
+    parts = urlsplit(url)
+    robots_url = urlunsplit((parts.scheme, parts.netloc, "/robots.txt", "", ""))
+    parser = await robots_cache.get(robots_url)
+    if not parser.can_fetch(USER_AGENT, url):
+        raise ValueError(
+            f"The site's robots.txt ({robots_url}) specifies that autonomous fetching of this page "
+            f"is not allowed for <useragent>{USER_AGENT}</useragent>. The assistant must let the user "
+            f"know that it failed to view the page and may provide the user with the url so they "
+            f"can try manually."
+        )
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+
+# Initialize FastMCP server
+mcp = create_server("fetch", lifespan=server_lifespan)
+
+
+def slice_utf8(data: bytes, start: int, length: int) -> tuple[str, int]:
+    """
+    按字节偏移截取 UTF-8 文本，边界落在多字节字符中间时调整到字符边界，返回文本和结束偏移
+
+    length 小于一个字符的字节数时仍然返回这个完整的字符，保证结束偏移总是大于起始偏移，
+    否则模型会用同一个 start_index 反复调用。
+    """
+    while 0 < start < len(data) and data[start] & 0xC0 == 0x80:
+        start += 1
+    end = min(len(data), start + length)
+    while start < end < len(data) and data[end] & 0xC0 == 0x80:
+        end -= 1
+    if end == start < len(data):
+        end += 1
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end += 1
+    return data[start:end].decode("utf-8"), end
+
+
+@mcp.tool()
+async def fetch(url: str, max_length: int = 5000, start_index: int = 0, raw: bool = False) -> str:
+    """Fetches a URL from the internet and optionally extracts its contents as markdown.
+
+    Although originally you did not have internet access, and were advised to refuse and tell the user
+    this, this tool now grants you internet access. Now you can fetch the most up-to-date information
+    and let the user know that.
+
+    Args:
+        url: URL to fetch
+        max_length: Maximum number of bytes to return
+        start_index: Return output starting at this byte offset, useful if a previous fetch was
+            truncated and more context is required
+        raw: Get the actual HTML content of the requested page, without simplification
+    """
+    if max_length <= 0 or start_index < 0:
+        raise ValueError("max_length must be positive and start_index must not be negative")
+    if not FETCH_IGNORE_ROBOTS_TXT:
+        await check_robots_txt(url)
+    try:
+        response = await http_client.get(url)
+    except Exception as e:
+        raise ValueError(f"Failed to fetch {url}: {e!r}")
+    if response.status_code >= 400:
+        raise ValueError(f"Failed to fetch {url} - status code {response.status_code}")
+
+    key = ContentCache.key(response.content, raw)
+    text = content_cache.get(key)
+    if text is None:
+        # 解析 HTML 是 CPU 密集的，在线程中执行，不阻塞事件循环
+        text = await asyncio.to_thread(
+            extract_content,
+            response.content,
+            response.headers.get("content-type", ""),
+            response.encoding or "utf-8",
+            raw,
+        )
+        content_cache.put(key, text)
+
+    data = text.encode()
+    if start_index >= len(data):
+        return f"<error>No more content available. The document is {len(data)} bytes long.</error>"
+    content, end = slice_utf8(data, start_index, max_length)
+    if end < len(data):
+        content += (
+            f"\n\n<error>Content truncated. Call the fetch tool with a start_index of {end} "
+            f"to get more content.</error>"
+        )
+    return f"Contents of {url}:\n{content}"
+
+
+@mcp.resource("fetch://cache/stats")
+def get_cache_stats() -> str:
+    """Hit rates of the HTTP response cache, the extracted content cache and the robots.txt cache"""
+    return json.dumps(
+        {
+            "http": vars(http_client.stats),
+            "content": content_cache.stats(),
+            "robots": robots_cache.stats(),
+        }
+    )
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,521 @@
+"""
+文件系统 server 的增量搜索索引
+
+索引保存所有文件的 mtime/大小以及文本文件内容的 trigram 倒排索引，按文件名或内容搜索时只需检查
+候选文件；索引持久化到磁盘，重启后只重新索引发生变化的文件。文件变化通过 inotify（Linux，经 ctypes
+调用，无需额外依赖）实时更新，其它平台退化为定期遍历目录。
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import logging
+import mmap
+import os
+import pickle
+import re
+import select
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# 不建立索引的目录
+DEFAULT_IGNORE_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".cache", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox"}
+# 超过该大小的文件读取时使用 mmap
+MMAP_THRESHOLD = 256 * 1024
+# 索引文件格式版本，格式变化时旧的索引文件会被丢弃
+INDEX_VERSION = 1
+
+
+@dataclass
+class FileEntry:
+    mtime_ns: int
+    size: int
+    # 小写内容的 trigram 集合，二进制文件和过大的文件为 None（只参与文件名搜索）
+    trigrams: Optional[frozenset] = None
+
+
+@dataclass
+class ContentMatch:
+    path: str
+    line: int
+    text: str
+
+
+def read_bytes(path: str) -> bytes:
+    """读取整个文件，大文件通过 mmap 读取，避免额外的缓冲区拷贝"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+
+
+def trigrams_of(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def required_literals(pattern: str, regex: bool) -> list[str]:
+    """
+    提取匹配结果中必然出现的字面量（小写），用于通过 trigram 索引筛选候选文件
+
+    正则表达式只分析顶层连续的字面量字符；包含顶层分支（|）时返回空列表，此时需要扫描所有文件。
+    """
+    if not regex:
+        return [pattern.lower()]
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    literals = []
+    current = []
+    for op, value in parsed:
+        if op == sre_parse.LITERAL:
+            current.append(chr(value))
+            continue
+        if op == sre_parse.BRANCH:
+            return []
+        if current:
+            literals.append("".join(current).lower())
+            current = []
+    if current:
+        literals.append("".join(current).lower())
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+class FileIndex:
+    """
+    若干根目录下所有文件的内存索引：文件列表 + 文本文件内容的 trigram 倒排索引
+
+    内容搜索先用查询中必然出现的字面量的 trigram 求候选文件的交集，再只读取候选文件做精确匹配。
+    索引会持久化到 cache_path，重启后只重新读取修改时间或大小发生变化的文件。
+    所有方法都是线程安全的，文件变化检测线程可以直接调用 refresh_path。
+
+    参数:
+        roots (list[str]): 建立索引的根目录
+        cache_path (str): 持久化索引文件路径，None 表示不持久化
+        max_file_bytes (int): 超过该大小的文件不索引内容
+        ignore_dirs (set[str]): 不建立索引的目录名
+    """
+
+    def __init__(
+        self,
+        roots: list[str],
+        cache_path: Optional[str] = None,
+        max_file_bytes: int = 1024 * 1024,
+        ignore_dirs: Optional[set[str]] = None,
+    ):
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.cache_path = cache_path
+        self.max_file_bytes = max_file_bytes
+        self.ignore_dirs = DEFAULT_IGNORE_DIRS if ignore_dirs is None else ignore_dirs
+        self.files: dict[str, FileEntry] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+
+    # ---- 建立和维护索引 ----
+
+    def load_or_build(self):
+        """加载持久化的索引，并与磁盘上的文件比较，只重新索引变化的文件"""
+        start = time.monotonic()
+        cached = self._load_cache()
+        with self._lock:
+            seen = set()
+            reused = 0
+            for path, stat in self.walk():
+                seen.add(path)
+                entry = cached.get(path)
+                if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    self._add(path, entry)
+                    reused += 1
+                else:
+                    self._index_file(path, stat)
+            self._dirty = self._dirty or reused != len(cached) or reused != len(seen)
+        logger.info(
+            f"Indexed {len(self.files)} files ({reused} from cache) in {time.monotonic() - start:.2f}s"
+        )
+
+    def _load_cache(self) -> dict[str, FileEntry]:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return {}
+        if data.get("version") != INDEX_VERSION or data.get("roots") != self.roots:
+            return {}
+        return data["files"]
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"version": INDEX_VERSION, "roots": self.roots, "files": dict(self.files)}
+            self._dirty = False
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+    def is_ignored(self, path: str) -> bool:
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                relative = os.path.relpath(path, root)
+                return any(part in self.ignore_dirs for part in relative.split(os.sep))
+        return True
+
+    def walk(self, top: Optional[str] = None):
+        """遍历文件，返回 (路径, os.stat_result)"""
+        stack = [top] if top else list(self.roots)
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in self.ignore_dirs:
+                                    stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                yield entry.path, entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _index_file(self, path: str, stat: os.stat_result):
+        trigrams = None
+        if stat.st_size <= self.max_file_bytes:
+            try:
+                data = read_bytes(path)
+            except OSError:
+                return
+            # 包含 NUL 字节的视为二进制文件
+            if b"\0" not in data[:8192]:
+                trigrams = frozenset(trigrams_of(data.decode("utf-8", errors="replace").lower()))
+        self._add(path, FileEntry(stat.st_mtime_ns, stat.st_size, trigrams))
+        self._dirty = True
+
+    def _add(self, path: str, entry: FileEntry):
+        self._remove(path)
+        self.files[path] = entry
+        for trigram in entry.trigrams or ():
+            self._postings.setdefault(trigram, set()).add(path)
+
+    def _remove(self, path: str):
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+        for trigram in entry.trigrams or ():
+            paths = self._postings.get(trigram)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._postings[trigram]
+        self._dirty = True
+
+    def refresh_path(self, path: str):
+        """文件或目录发生变化（新建、修改、删除、移动）后更新索引"""
+        path = os.path.realpath(path)
+        if self.is_ignored(path):
+            return
+        with self._lock:
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except OSError:
+                self.remove_tree(path)
+                return
+            if os.path.isdir(path):
+                for file_path, file_stat in self.walk(path):
+                    self._refresh_file(file_path, file_stat)
+            elif os.path.isfile(path):
+                self._refresh_file(path, stat)
+
+    def _refresh_file(self, path: str, stat: os.stat_result):
+        entry = self.files.get(path)
+        if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+            self._index_file(path, stat)
+
+    def remove_tree(self, path: str):
+        with self._lock:
+            prefix = path.rstrip(os.sep) + os.sep
+            for file_path in [p for p in self.files if p == path or p.startswith(prefix)]:
+                self._remove(file_path)
+
+    def rescan(self):
+        """重新遍历所有根目录，用于变化事件丢失（如 inotify 队列溢出）之后"""
+        with self._lock:
+            seen = set()
+            for path, stat in self.walk():
+                seen.add(path)
+                self._refresh_file(path, stat)
+            for path in [p for p in self.files if p not in seen]:
+                self._remove(path)
+
+    # ---- 查询 ----
+
+    def find_files(self, root: str, pattern: str, exclude_patterns: list[str] = ()) -> list[str]:
+        """按文件名查找：pattern 包含通配符时按 glob 匹配，否则按不区分大小写的子串匹配"""
+        root = os.path.realpath(root).rstrip(os.sep) + os.sep
+        is_glob = any(c in pattern for c in "*?[")
+        needle = pattern.lower()
+        with self._lock:
+            paths = [p for p in self.files if p.startswith(root)]
+        results = []
+        for path in paths:
+            name = os.path.basename(path)
+            relative = path[len(root) :]
+            if any(fnmatch.fnmatch(relative, ex) or fnmatch.fnmatch(name, ex) for ex in exclude_patterns):
+                continue
+            if is_glob:
+                if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern):
+                    results.append(path)
+            elif needle in name.lower():
+                results.append(path)
+        return sorted(results)
+
+    def candidates(self, pattern: str, regex: bool, root: str, include: Optional[str]) -> list[str]:
+        root = os.path.realpath(root).rstrip(os.sep) + os.sep
+        with self._lock:
+            candidate_set = None
+            for literal in required_literals(pattern, regex):
+                for trigram in trigrams_of(literal):
+                    paths = self._postings.get(trigram, set())
+                    candidate_set = set(paths) if candidate_set is None else candidate_set & paths
+                    if not candidate_set:
+                        return []
+            if candidate_set is None:
+                # 无法从查询中提取 trigram，检查所有文本文件
+                candidate_set = {p for p, entry in self.files.items() if entry.trigrams is not None}
+        return sorted(
+            p
+            for p in candidate_set
+            if p.startswith(root) and (include is None or fnmatch.fnmatch(os.path.basename(p), include))
+        )
+
+    def search_content(
+        self,
+        pattern: str,
+        root: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        include: Optional[str] = None,
+        max_results: int = 100,
+    ) -> list[ContentMatch]:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+        matches = []
+        for path in self.candidates(pattern, regex, root, include):
+            try:
+                text = read_bytes(path).decode("utf-8", errors="replace")
+            except OSError:
+                continue
+            for number, line in enumerate(text.splitlines(), 1):
+                if compiled.search(line):
+                    matches.append(ContentMatch(path, number, line.strip()[:200]))
+                    if len(matches) >= max_results:
+                        return matches
+        return matches
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "roots": self.roots,
+                "files": len(self.files),
+                "text_files": sum(1 for entry in self.files.values() if entry.trigrams is not None),
+                "trigrams": len(self._postings),
+            }
+
+
+# inotify 事件
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    通过 Linux inotify（ctypes 调用 libc，无需额外依赖）检测文件变化并更新索引
+
+    每个目录一个 watch。事件先收集起来，安静 debounce 秒后再批量更新索引，
+    避免大文件写入过程中的多次 IN_MODIFY 导致重复索引；队列溢出时重新遍历所有根目录。
+    目录被移动时 watch 仍然有效，按 IN_MOVED_FROM/IN_MOVED_TO 的 cookie 把它和所有子目录的 watch
+    改为新的路径；移出索引范围的目录的 watch 被删除。
+    """
+
+    def __init__(self, index: FileIndex, debounce: float = 0.2, max_delay: float = 2.0):
+        self.index = index
+        self.debounce = debounce
+        # 持续有事件时，最早的变化最多等待 max_delay 秒后也会被更新
+        self.max_delay = max_delay
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _add_watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+
+    def _add_tree(self, top: str):
+        if self.index.is_ignored(top):
+            return
+        for directory, subdirs, _ in os.walk(top):
+            subdirs[:] = [d for d in subdirs if d not in self.index.ignore_dirs]
+            self._add_watch(directory)
+
+    def _watches_under(self, path: str) -> list[int]:
+        prefix = path.rstrip(os.sep) + os.sep
+        return [wd for wd, directory in self._watches.items() if directory == path or directory.startswith(prefix)]
+
+    def _move_watches(self, old_path: str, new_path: str):
+        """目录从 old_path 移动到 new_path 后更新它和子目录的 watch 对应的路径"""
+        if self.index.is_ignored(new_path):
+            self._remove_watches(old_path)
+            return
+        for wd in self._watches_under(old_path):
+            self._watches[wd] = new_path + self._watches[wd][len(old_path) :]
+
+    def _remove_watches(self, path: str):
+        for wd in self._watches_under(path):
+            self._libc.inotify_rm_watch(self._fd, wd)
+            self._watches.pop(wd, None)
+
+    def start(self):
+        for root in self.index.roots:
+            self._add_tree(root)
+        self._thread = threading.Thread(target=self._run, name="fs-index-inotify", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        os.close(self._fd)
+
+    def _run(self):
+        dirty: set[str] = set()
+        dirty_since = None
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], self.debounce)
+            if dirty and (not readable or time.monotonic() - dirty_since > self.max_delay):
+                # 安静期，批量更新积累的变化
+                for path in dirty:
+                    try:
+                        self.index.refresh_path(path)
+                    except Exception as e:
+                        logger.warning(f"Failed to index {path}: {e!r}")
+                dirty.clear()
+            if not readable:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            for path, mask in self._parse(data):
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("inotify queue overflow, rescanning the whole tree")
+                    dirty.clear()
+                    self.index.rescan()
+                    continue
+                if path is None:
+                    continue
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                if not dirty:
+                    dirty_since = time.monotonic()
+                dirty.add(path)
+
+    def _parse(self, data: bytes):
+        """
+        解析事件，返回 (路径, mask)
+
+        目录移动在解析时立即更新 watch 的路径，同一批中后续的事件按新的路径解析。
+        """
+        # cookie -> 移出的目录路径，同一批中没有对应的 IN_MOVED_TO 时视为移出了索引范围
+        moved_from: dict[int, str] = {}
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if directory is None:
+                yield None, mask
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                moved_from[cookie] = path
+            elif mask & IN_ISDIR and mask & IN_MOVED_TO and cookie in moved_from:
+                self._move_watches(moved_from.pop(cookie), path)
+            yield path, mask
+        for path in moved_from.values():
+            self._remove_watches(path)
+
+
+class PollingWatcher:
+    """没有 inotify 的系统上定期重新遍历目录，比较修改时间和大小"""
+
+    def __init__(self, index: FileIndex, interval: float = 5.0):
+        self.index = index
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fs-index-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.index.rescan()
+            except Exception as e:
+                logger.warning(f"Failed to rescan file index: {e!r}")
+
+
+def start_watcher(index: FileIndex, poll_interval: float = 5.0):
+    """优先使用 inotify，不可用时退回到定期遍历"""
+    try:
+        watcher = InotifyWatcher(index)
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify unavailable ({e!r}), polling for file changes every {poll_interval}s")
+        watcher = PollingWatcher(index, poll_interval)
+    watcher.start()
+    return watcher
@@ -0,0 +1,446 @@
+from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+import asyncio
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import stat
+import sys
+
+from pydantic import BaseModel
+
+from file_index import FileIndex, start_watcher
+
+from server_setup import create_server
+
+# 允许访问的目录由命令行参数指定（与 @modelcontextprotocol/server-filesystem 相同），默认为当前目录
+ALLOWED_DIRECTORIES = [os.path.realpath(path) for path in (sys.argv[1:] or ["."])]
+CACHE_DIR = os.getenv("MCP_CACHE_DIR", ".cache")
+# 超过该大小的文件不索引内容（只能按文件名搜索）
+FS_INDEX_MAX_FILE_BYTES = int(os.getenv("FS_INDEX_MAX_FILE_BYTES", 1024 * 1024))
+# 没有 inotify 时定期遍历目录的间隔（秒）
+FS_INDEX_POLL_INTERVAL = float(os.getenv("FS_INDEX_POLL_INTERVAL", 5))
+# read_file 单次最多返回的字节数，更大的文件需要通过 read_file_range 分段读取
+FS_MAX_READ_BYTES = int(os.getenv("FS_MAX_READ_BYTES", 256 * 1024))
+# 索引有变化时写回磁盘的间隔（秒）；server 进程通常由客户端直接结束，不能只在退出时保存
+FS_INDEX_SAVE_INTERVAL = float(os.getenv("FS_INDEX_SAVE_INTERVAL", 60))
+
+index_key = hashlib.sha256("\n".join(ALLOWED_DIRECTORIES).encode()).hexdigest()[:16]
+file_index = FileIndex(
+    ALLOWED_DIRECTORIES,
+    cache_path=os.path.join(CACHE_DIR, f"fs_index_{index_key}.pickle"),
+    max_file_bytes=FS_INDEX_MAX_FILE_BYTES,
+)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    # 索引在线程中加载或建立，不阻塞事件循环
+    await asyncio.to_thread(file_index.load_or_build)
+    watcher = start_watcher(file_index, FS_INDEX_POLL_INTERVAL)
+
+    async def save_periodically():
+        while True:
+            await asyncio.to_thread(file_index.save)
+            await asyncio.sleep(FS_INDEX_SAVE_INTERVAL)
+
+    save_task = asyncio.create_task(save_periodically())
+    try:
+        yield
+    finally:
+        save_task.cancel()
+        watcher.stop()
+        await asyncio.to_thread(file_index.save)
+
+
+# Initialize FastMCP server
+mcp = create_server("filesystem", lifespan=server_lifespan)
+
+
+def validate_path(path: str) -> str:
+    """解析为绝对路径，并确认位于允许访问的目录中（解析符号链接之后）"""
+    absolute = os.path.realpath(os.path.expanduser(path))
+    for directory in ALLOWED_DIRECTORIES:
+        if absolute == directory or absolute.startswith(directory.rstrip(os.sep) + os.sep):
+            return absolute
+    raise ValueError(
+        f"Access denied - path outside allowed directories: {absolute} not in {', '.join(ALLOWED_DIRECTORIES)}"
+    )
+
+
+def read_text(path: str, limit: int = FS_MAX_READ_BYTES) -> str:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        data = f.read(limit)
+    text = data.decode("utf-8", errors="replace")
+    if size > limit:
+        text += (
+            f"\n\n[Truncated: showing the first {limit} of {size} bytes. "
+            f"Use read_file_range to read the rest.]"
+        )
+    return text
+
+
+def head_lines(path: str, count: int) -> str:
+    with open(path, "rb") as f:
+        lines = []
+        for _ in range(count):
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+    return b"".join(lines).decode("utf-8", errors="replace")
+
+
+def tail_lines(path: str, count: int) -> str:
+    """通过 mmap 从文件末尾向前查找换行符，不需要读取整个文件"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            # 忽略文件末尾的换行符
+            position = end - 1 if mm[end - 1 : end] == b"\n" else end
+            for _ in range(count):
+                position = mm.rfind(b"\n", 0, position)
+                if position < 0:
+                    break
+            return mm[position + 1 : end].decode("utf-8", errors="replace")
+
+
+def read_line_range(path: str, start_line: int, end_line: Optional[int]) -> str:
+    """通过 mmap 定位第 start_line 到 end_line 行（从 1 开始，包含两端）"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            for _ in range(start_line - 1):
+                start = mm.find(b"\n", start) + 1
+                if start == 0:
+                    return ""
+            end = start
+            if end_line is None:
+                end = len(mm)
+            else:
+                for _ in range(end_line - start_line + 1):
+                    end = mm.find(b"\n", end) + 1
+                    if end == 0:
+                        end = len(mm)
+                        break
+            return mm[start:end].decode("utf-8", errors="replace")
+
+
+@mcp.tool()
+async def read_file(path: str, head: Optional[int] = None, tail: Optional[int] = None) -> str:
+    """Read the complete contents of a file from the file system. Handles various text encodings
+    and provides detailed error messages if the file cannot be read. Use 'head' to read only the
+    first N lines or 'tail' to read only the last N lines. Very large files are truncated; use
+    read_file_range to read them in parts. Only works within allowed directories.
+
+    Args:
+        path: Path of the file to read
+        head: If provided, returns only the first N lines of the file
+        tail: If provided, returns only the last N lines of the file
+    """
+    path = validate_path(path)
+    if head is not None and tail is not None:
+        raise ValueError("Cannot specify both head and tail parameters simultaneously")
+    if head is not None:
+        return await asyncio.to_thread(head_lines, path, head)
+    if tail is not None:
+        return await asyncio.to_thread(tail_lines, path, tail)
+    return await asyncio.to_thread(read_text, path)
+
+
+@mcp.tool()
+async def read_file_range(
+    path: str,
+    offset: Optional[int] = None,
+    length: int = 65536,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+) -> str:
+    """Read part of a file, either a byte range (offset + length) or a line range
+    (start_line to end_line, 1-based and inclusive). Use it to page through large files.
+
+    Args:
+        path: Path of the file to read
+        offset: Byte offset to start reading at
+        length: Number of bytes to read when using offset (default 65536)
+        start_line: First line to read (1-based)
+        end_line: Last line to read (inclusive); reads to the end of the file when omitted
+    """
+    path = validate_path(path)
+    if start_line is not None:
+        if start_line < 1 or (end_line is not None and end_line < start_line):
+            raise ValueError("start_line must be >= 1 and end_line must be >= start_line")
+        return await asyncio.to_thread(read_line_range, path, start_line, end_line)
+
+    def read_range():
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(offset or 0)
+            data = f.read(max(0, length))
+        end = (offset or 0) + len(data)
+        note = f"\n\n[Bytes {offset or 0}-{end} of {size}" + ("]" if end >= size else f", next offset {end}]")
+        return data.decode("utf-8", errors="replace") + note
+
+    return await asyncio.to_thread(read_range)
+
+
+@mcp.tool()
+async def read_multiple_files(paths: list[str]) -> str:
+    """Read the contents of multiple files simultaneously. This is more efficient than reading
+    files one by one when you need to analyze or compare multiple files. Each file's content is
+    returned with its path as a reference. Failed reads for individual files won't stop the
+    entire operation. Only works within allowed directories.
+
+    Args:
+        paths: Paths of the files to read
+    """
+
+    async def read_one(path: str) -> str:
+        try:
+            return f"{path}:\n{await asyncio.to_thread(read_text, validate_path(path))}\n"
+        except Exception as e:
+            return f"{path}: Error - {e}"
+
+    results = await asyncio.gather(*[read_one(path) for path in paths])
+    return "\n---\n".join(results)
+
+
+@mcp.tool()
+async def write_file(path: str, content: str) -> str:
+    """Create a new file or completely overwrite an existing file with new content. Use with
+    caution as it will overwrite existing files without warning. Handles text content with proper
+    encoding. Only works within allowed directories.
+
+    Args:
+        path: Path of the file to write
+        content: Content to write to the file
+    """
+    path = validate_path(path)
+
+    def write():
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        file_index.refresh_path(path)
+
+    await asyncio.to_thread(write)
+    return f"Successfully wrote to {path}"
+
+
+class EditOperation(BaseModel):
+    # Text to search for - must match exactly
+    oldText: str
+    # Text to replace with
+    newText: str
+
+
+@mcp.tool()
+async def edit_file(path: str, edits: list[EditOperation], dryRun: bool = False) -> str:
+    """Make line-based edits to a text file. Each edit replaces exact text sequences with new
+    content. Returns a git-style diff showing the changes made. Only works within allowed
+    directories.
+
+    Args:
+        path: Path of the file to edit
+        edits: List of edits, each replacing oldText with newText
+        dryRun: Preview changes using git-style diff format without writing
+    """
+    path = validate_path(path)
+
+    def edit():
+        with open(path, "r", encoding="utf-8") as f:
+            original = f.read()
+        modified = original
+        for edit_operation in edits:
+            if edit_operation.oldText not in modified:
+                raise ValueError(f"Could not find exact match for edit:\n{edit_operation.oldText}")
+            modified = modified.replace(edit_operation.oldText, edit_operation.newText, 1)
+        diff = "".join(
+            difflib.unified_diff(
+                original.splitlines(keepends=True),
+                modified.splitlines(keepends=True),
+                fromfile=path,
+                tofile=path,
+            )
+        )
+        if not dryRun:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(modified)
+            file_index.refresh_path(path)
+        return f"```diff\n{diff}```"
+
+    return await asyncio.to_thread(edit)
+
+
+@mcp.tool()
+async def create_directory(path: str) -> str:
+    """Create a new directory or ensure a directory exists. Can create multiple nested directories
+    in one operation. If the directory already exists, this operation will succeed silently.
+    Only works within allowed directories.
+
+    Args:
+        path: Path of the directory to create
+    """
+    path = validate_path(path)
+    os.makedirs(path, exist_ok=True)
+    return f"Successfully created directory {path}"
+
+
+@mcp.tool()
+async def list_directory(path: str) -> str:
+    """Get a detailed listing of all files and directories in a specified path. Results clearly
+    distinguish between files and directories with [FILE] and [DIR] prefixes. Only works within
+    allowed directories.
+
+    Args:
+        path: Path of the directory to list
+    """
+    path = validate_path(path)
+    with os.scandir(path) as entries:
+        lines = [
+            f"{'[DIR]' if entry.is_dir() else '[FILE]'} {entry.name}"
+            for entry in sorted(entries, key=lambda entry: entry.name)
+        ]
+    return "\n".join(lines)
+
+
+@mcp.tool()
+async def directory_tree(path: str) -> str:
+    """Get a recursive tree view of files and directories as a JSON structure. Each entry includes
+    'name', 'type' (file/directory) and 'children' for directories. Only works within allowed
+    directories.
+
+    Args:
+        path: Path of the root directory
+    """
+    path = validate_path(path)
+
+    def build(directory: str) -> list[dict]:
+        result = []
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in file_index.ignore_dirs:
+                        continue
+                    result.append({"name": entry.name, "type": "directory", "children": build(entry.path)})
+                else:
+                    result.append({"name": entry.name, "type": "file"})
+        return result
+
+    return json.dumps(await asyncio.to_thread(build, path), indent=2)
+
+
+@mcp.tool()
+async def move_file(source: str, destination: str) -> str:
+    """Move or rename files and directories. Can move files between directories and rename them
+    in a single operation. If the destination exists, the operation will fail. Only works within
+    allowed directories.
+
+    Args:
+        source: Path to move
+        destination: New path
+    """
+    source = validate_path(source)
+    destination = validate_path(destination)
+    if os.path.exists(destination):
+        raise ValueError(f"Destination already exists: {destination}")
+    await asyncio.to_thread(shutil.move, source, destination)
+    file_index.remove_tree(source)
+    await asyncio.to_thread(file_index.refresh_path, destination)
+    return f"Successfully moved {source} to {destination}"
+
+
+@mcp.tool()
+async def search_files(path: str, pattern: str, excludePatterns: list[str] = []) -> str:
+    """Search for files and directories by name. Searches through all subdirectories from the
+    starting path. A pattern containing wildcards (*, ?) is matched as a glob against file names
+    and relative paths; otherwise the search is a case-insensitive substring match on file names.
+    Answers come from an in-memory index and return in milliseconds. Only searches within allowed
+    directories.
+
+    Args:
+        path: Directory to search in
+        pattern: File name pattern
+        excludePatterns: Glob patterns of paths to exclude
+    """
+    path = validate_path(path)
+    results = file_index.find_files(path, pattern, excludePatterns)
+    return "\n".join(results) if results else "No matches found"
+
+
+@mcp.tool()
+async def search_content(
+    path: str,
+    query: str,
+    regex: bool = False,
+    caseSensitive: bool = False,
+    include: Optional[str] = None,
+    maxResults: int = 100,
+) -> str:
+    """Search inside text files for a string or regular expression (like grep). Uses a trigram
+    index so searches over large trees return in milliseconds. Returns matching lines as
+    'path:line: text'. Only searches within allowed directories.
+
+    Args:
+        path: Directory to search in
+        query: Text (or regular expression when regex is true) to search for
+        regex: Treat query as a Python regular expression
+        caseSensitive: Match case exactly
+        include: Only search files whose name matches this glob (e.g. "*.py")
+        maxResults: Maximum number of matching lines to return
+    """
+    path = validate_path(path)
+    matches = await asyncio.to_thread(
+        file_index.search_content, query, path, regex, caseSensitive, include, maxResults
+    )
+    if not matches:
+        return "No matches found"
+    return "\n".join(f"{match.path}:{match.line}: {match.text}" for match in matches)
+
+
+@mcp.tool()
+async def get_file_info(path: str) -> str:
+    """Retrieve detailed metadata about a file or directory. Returns comprehensive information
+    including size, creation time, last modified time, permissions, and type. Only works within
+    allowed directories.
+
+    Args:
+        path: Path of the file or directory
+    """
+    path = validate_path(path)
+    info = os.stat(path)
+    details = {
+        "size": info.st_size,
+        "created": datetime.fromtimestamp(info.st_ctime).isoformat(),
+        "modified": datetime.fromtimestamp(info.st_mtime).isoformat(),
+        "accessed": datetime.fromtimestamp(info.st_atime).isoformat(),
+        "isDirectory": stat.S_ISDIR(info.st_mode),
+        "isFile": stat.S_ISREG(info.st_mode),
+        "permissions": oct(info.st_mode & 0o777)[2:],
+    }
+    return "\n".join(f"{key}: {value}" for key, value in details.items())
+
+
+@mcp.tool()
+async def list_allowed_directories() -> str:
+    """Returns the list of directories that this server is allowed to access."""
+    return "Allowed directories:\n" + "\n".join(ALLOWED_DIRECTORIES)
+
+
+@mcp.resource("filesystem://index/stats")
+def get_index_stats() -> str:
+    """Number of indexed files and trigrams in the filesystem search index"""
+    return json.dumps(file_index.stats())
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from result_class import FlightSearchParams
+
+logger = logging.getLogger(__name__)
+
+# 每写入多少条记录清理一次过期数据
+PRUNE_INTERVAL = 100
+
+
+@dataclass
+class CacheLookup:
+    results: Optional[dict] = None
+    # 条目已过期，但仍在 stale-while-revalidate 窗口内
+    stale: bool = False
+
+
+class FlightSearchCache:
+    """
+    持久化的航班搜索结果缓存（SQLite）
+
+    以规范化后的 FlightSearchParams.model_dump(exclude_none=True)（不含 api_key）作为键，
+    出发航班搜索和携带 departure_token 的返程航班搜索分别使用不同的过期时间和统计。
+    可选的 stale-while-revalidate：过期但仍在窗口内的条目会被直接返回，同时在后台刷新。
+
+    参数:
+        path (str): SQLite 数据库文件路径
+        outbound_ttl (float): 出发航班搜索结果的有效期（秒）
+        return_ttl (float): 返程航班搜索结果的有效期（秒）
+        stale_while_revalidate (float): 过期后仍可返回旧结果的时间窗口（秒），0 表示关闭
+    """
+
+    def __init__(
+        self,
+        path: str,
+        outbound_ttl: float = 1800,
+        return_ttl: float = 1800,
+        stale_while_revalidate: float = 0,
+    ):
+        self.ttl = {"outbound": outbound_ttl, "return": return_ttl}
+        self.stale_while_revalidate = stale_while_revalidate
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 搜索在多个线程中执行，共用一个连接并用锁串行化访问
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_stats (
+                    kind TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    stale_hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    refreshes INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            # 旧版本创建的统计表没有 refreshes 列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_stats)")}
+            if "refreshes" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE cache_stats ADD COLUMN refreshes INTEGER NOT NULL DEFAULT 0"
+                )
+
+    @staticmethod
+    def normalize_params(params: FlightSearchParams) -> dict:
+        """规范化搜索参数：去掉空值和 api_key，去除空白并统一机场代码的大小写"""
+        normalized = params.model_dump(exclude_none=True)
+        normalized.pop("api_key", None)
+        for name in ("departure_id", "arrival_id", "exclude_conns"):
+            if name in normalized:
+                normalized[name] = ",".join(
+                    code.strip().upper() if len(code.strip()) == 3 else code.strip()
+                    for code in normalized[name].split(",")
+                )
+        return normalized
+
+    @staticmethod
+    def kind_of(params: FlightSearchParams) -> str:
+        return "return" if params.departure_token else "outbound"
+
+    def make_key(self, params: FlightSearchParams) -> str:
+        normalized = json.dumps(self.normalize_params(params), sort_keys=True)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def lookup(self, params: FlightSearchParams) -> CacheLookup:
+        kind = self.kind_of(params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, fetched_at FROM search_cache WHERE key = ?",
+                (self.make_key(params),),
+            ).fetchone()
+
+        if row is None:
+            self._record(kind, "misses")
+            return CacheLookup()
+
+        results, fetched_at = row
+        age = time.time() - fetched_at
+        if age < self.ttl[kind]:
+            self._record(kind, "hits")
+            return CacheLookup(results=json.loads(results))
+        if age < self.ttl[kind] + self.stale_while_revalidate:
+            self._record(kind, "stale_hits")
+            return CacheLookup(results=json.loads(results), stale=True)
+
+        self._record(kind, "misses")
+        return CacheLookup()
+
+    def store(self, params: FlightSearchParams, results: dict):
+        normalized = self.normalize_params(params)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.make_key(params),
+                    self.kind_of(params),
+                    json.dumps(normalized, sort_keys=True),
+                    json.dumps(results),
+                    time.time(),
+                ),
+            )
+            self._stores_since_prune += 1
+            if self._stores_since_prune >= PRUNE_INTERVAL:
+                self._prune()
+
+    def _prune(self):
+        now = time.time()
+        for kind, ttl in self.ttl.items():
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE kind = ? AND fetched_at < ?",
+                (kind, now - ttl - self.stale_while_revalidate),
+            )
+        self._stores_since_prune = 0
+
+    def record_refresh(self, params: FlightSearchParams):
+        """记录一次 stale-while-revalidate 的后台刷新，它会消耗一次 SerpApi 调用"""
+        self._record(self.kind_of(params), "refreshes")
+
+    def _record(self, kind: str, outcome: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""INSERT INTO cache_stats (kind, {outcome}) VALUES (?, 1)
+                ON CONFLICT(kind) DO UPDATE SET {outcome} = {outcome} + 1""",
+                (kind,),
+            )
+
+    def stats(self) -> dict:
+        """
+        返回缓存统计信息
+
+        每次命中（包括过期窗口内的命中）都省去了一次同步的 SerpApi 调用，但过期命中触发的后台刷新
+        仍会消耗配额，因此 saved_requests（节省的配额）为命中次数减去后台刷新次数。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, hits, stale_hits, misses, refreshes FROM cache_stats"
+            ).fetchall()
+            entries = self._conn.execute(
+                "SELECT kind, COUNT(*) FROM search_cache GROUP BY kind"
+            ).fetchall()
+
+        stats = {}
+        for kind, hits, stale_hits, misses, refreshes in rows:
+            lookups = hits + stale_hits + misses
+            stats[kind] = {
+                "hits": hits,
+                "stale_hits": stale_hits,
+                "misses": misses,
+                "refreshes": refreshes,
+                "hit_rate": round((hits + stale_hits) / lookups, 4) if lookups else 0.0,
+                "saved_requests": max(0, hits + stale_hits - refreshes),
+            }
+        for kind, count in entries:
+            stats.setdefault(kind, {})["entries"] = count
+        stats["saved_requests"] = sum(
+            s.get("saved_requests", 0) for s in stats.values() if isinstance(s, dict)
+        )
+        return stats
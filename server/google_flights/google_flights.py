@@ -1,12 +1,23 @@
 import os
+import sys
+from datetime import date, timedelta
 from typing import List, Optional, Self
 
 from result_class import FlightDetailsModel, FlightsResponseModel, FlightSearchParams
+from flight_cache import FlightSearchCache
+from projection import PROJECTION_MODES, project_flights, slice_results
+
+# server_setup 位于上一级的 server 目录中，它会再把仓库根目录加入 sys.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from server_setup import create_server
+from util.mytools import estimate_tokens
+from util.rate_limiter import RateLimiter
 
-from mcp.server.fastmcp import FastMCP # Assuming this path is correct
 from serpapi import GoogleSearch
+import asyncio
 import json
 import logging
+import threading
 import dotenv 
 dotenv.load_dotenv()
 
@@ -24,33 +35,33 @@ def create_search_params(params: FlightSearchParams) -> dict:
     return res
 
 # 调用Serpapi API，并将返回的JSON转换为 对应格式的 Dataclass
-def call_search_api(params: FlightSearchParams) -> FlightsResponseModel | str:
+def call_search_api(params: FlightSearchParams, max_results: Optional[int] = None) -> FlightsResponseModel | str:
     """
     调用Google Flights API并返回格式化的航班搜索结果
     
     参数:
         params (FlightSearchParams): 包含航班搜索参数的数据类对象
+        max_results (Optional[int]): 只校验并返回前 max_results 个航班（best_flights 优先），
+            为 None 时校验完整的响应
         
     返回:
         FlightsResponseModel | str: 成功时返回格式化的航班响应数据，失败时返回错误信息字符串
     """
-    # 调用Google Flights API获取搜索结果
-    try:
-        search = GoogleSearch(create_search_params(params))
-        results_dict = search.get_dict()
-    except Exception as e:
-        logger.error(f"Error calling Google Flights API: {e}")
-        return f"Error calling Google Flights API: {e}"
-
-    print_debug_info(results_dict)
+    # 获取搜索结果（优先使用缓存）
+    results_dict = fetch_search_results(params)
+    if isinstance(results_dict, str):
+        return results_dict
 
     # 检查API响应是否包含有效的航班数据
     if "other_flights" not in results_dict:
         return f"API Error: result: {results_dict}"
 
-    # 将API响应数据解析为FlightsResponseModel数据类对象
+    # 将API响应数据解析为FlightsResponseModel数据类对象，只校验会被使用的部分
     try:
-        response_model = FlightsResponseModel.model_validate(results_dict)
+        if max_results is not None:
+            response_model = FlightsResponseModel.model_validate(slice_results(results_dict, max_results))
+        else:
+            response_model = FlightsResponseModel.model_validate(results_dict)
     except Exception as e: # Handles PydanticValidationError, etc.
         logger.error(f"Error parsing outbound API response: {e}. Raw results snippet: {str(results_dict)[:500]}")
         return f"Error parsing API response: {e}. Raw results snippet: {str(results_dict)[:500]}"
@@ -58,10 +69,112 @@ def call_search_api(params: FlightSearchParams) -> FlightsResponseModel | str:
     return response_model
 
 
+def search_serpapi(params: FlightSearchParams) -> dict | str:
+    """
+    直接调用SerpApi获取原始的搜索结果，不经过缓存
+
+    返回:
+        dict | str: 成功时返回API响应的字典，失败时返回错误信息字符串
+    """
+    try:
+        search = GoogleSearch(create_search_params(params))
+        # 经过限流器发出请求，被限流（429）时按 Retry-After 排队等待后重试
+        for attempt in range(SERPAPI_MAX_RATE_LIMIT_RETRIES + 1):
+            serpapi_rate_limiter.acquire()
+            response = search.get_response()
+            serpapi_rate_limiter.update_from_headers(response.headers, status_code=response.status_code)
+            if response.status_code != 429:
+                break
+            logger.warning(f"SerpApi rate limited (attempt {attempt + 1}), waiting in queue")
+        results_dict = json.loads(response.text)
+    except Exception as e:
+        logger.error(f"Error calling Google Flights API: {e}")
+        return f"Error calling Google Flights API: {e}"
+
+    print_debug_info(results_dict)
+    return results_dict
+
+
+def fetch_search_results(params: FlightSearchParams) -> dict | str:
+    """
+    获取原始的搜索结果：缓存命中时直接返回，否则调用SerpApi并缓存有效的结果
+
+    开启 stale-while-revalidate 时，过期窗口内的旧结果会被直接返回，同时在后台线程中刷新。
+    """
+    if flight_cache is not None:
+        cached = flight_cache.lookup(params)
+        if cached.results is not None:
+            if cached.stale:
+                refresh_in_background(params)
+            return cached.results
+
+    results_dict = search_serpapi(params)
+    # 只缓存包含航班数据的有效结果，错误响应不缓存
+    if flight_cache is not None and isinstance(results_dict, dict) and "other_flights" in results_dict:
+        flight_cache.store(params, results_dict)
+    return results_dict
+
+
+_refreshing_keys: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def refresh_in_background(params: FlightSearchParams):
+    """在后台线程中刷新过期的缓存条目，同一条目同时只刷新一次"""
+    key = flight_cache.make_key(params)
+    with _refreshing_lock:
+        if key in _refreshing_keys:
+            return
+        _refreshing_keys.add(key)
+    flight_cache.record_refresh(params)
+
+    def refresh():
+        try:
+            results_dict = search_serpapi(params)
+            if isinstance(results_dict, dict) and "other_flights" in results_dict:
+                flight_cache.store(params, results_dict)
+        finally:
+            with _refreshing_lock:
+                _refreshing_keys.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
 # Initialize FastMCP server
-mcp = FastMCP("google_flights")
+mcp = create_server("google_flights")
 
 GOOGLE_FLIGHTS_API_KEY = os.getenv("SERPAPI_API_KEY")
+# 指向本地的 SerpApi 替身（如 loadtest/mock_serpapi.py），用于压测时不消耗真实配额
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL")
+if SERPAPI_BASE_URL:
+    GoogleSearch.BACKEND = SERPAPI_BASE_URL.rstrip("/")
+# SerpApi 的每分钟请求数上限（0 表示不限制，仍会根据 429 和 Retry-After 自动等待），以及被限流后的重试次数
+SERPAPI_REQUESTS_PER_MINUTE = float(os.getenv("SERPAPI_REQUESTS_PER_MINUTE", 0))
+SERPAPI_MAX_RATE_LIMIT_RETRIES = int(os.getenv("SERPAPI_MAX_RATE_LIMIT_RETRIES", 3))
+serpapi_rate_limiter = RateLimiter("serpapi", requests_per_minute=SERPAPI_REQUESTS_PER_MINUTE or None)
+# 往返查询时同时进行的返程航班搜索数量上限
+RETURN_SEARCH_CONCURRENCY = int(os.getenv("FLIGHTS_RETURN_SEARCH_CONCURRENCY", 5))
+# 日期价格矩阵查询时同时进行的搜索数量上限，以及单次查询最多搜索的日期组合数
+DATE_MATRIX_CONCURRENCY = int(os.getenv("FLIGHTS_DATE_MATRIX_CONCURRENCY", 5))
+DATE_MATRIX_MAX_CELLS = int(os.getenv("FLIGHTS_DATE_MATRIX_MAX_CELLS", 60))
+
+# 航班搜索缓存配置：出发航班和返程航班结果的有效期、stale-while-revalidate 窗口（秒，0 表示关闭）
+CACHE_DIR = os.getenv("MCP_CACHE_DIR", ".cache")
+FLIGHTS_CACHE_ENABLED = os.getenv("FLIGHTS_CACHE_ENABLED", "1") != "0"
+FLIGHTS_CACHE_TTL = float(os.getenv("FLIGHTS_CACHE_TTL", 1800))
+FLIGHTS_RETURN_CACHE_TTL = float(os.getenv("FLIGHTS_RETURN_CACHE_TTL", 1800))
+FLIGHTS_CACHE_STALE_WHILE_REVALIDATE = float(os.getenv("FLIGHTS_CACHE_STALE_WHILE_REVALIDATE", 0))
+
+flight_cache = (
+    FlightSearchCache(
+        os.path.join(CACHE_DIR, "flight_search.sqlite3"),
+        outbound_ttl=FLIGHTS_CACHE_TTL,
+        return_ttl=FLIGHTS_RETURN_CACHE_TTL,
+        stale_while_revalidate=FLIGHTS_CACHE_STALE_WHILE_REVALIDATE,
+    )
+    if FLIGHTS_CACHE_ENABLED
+    else None
+)
 
 def print_debug_info(results_dict: dict):
     """
@@ -103,9 +216,11 @@ def get_return_flights(flight_details: FlightDetailsModel, search_params: Flight
         return []
 
     logger.info(f"Getting return flights for {flight_details.departure_token}")
-    # 设置搜索参数中的出发令牌
-    search_params.departure_token = flight_details.departure_token
-    response = call_search_api(search_params)
+    # 每次搜索使用独立的参数副本并设置出发令牌，避免并发搜索互相覆盖
+    return_params = search_params.model_copy(
+        update={"departure_token": flight_details.departure_token}
+    )
+    response = call_search_api(return_params, max_results)
     # 如果API调用返回错误信息，则返回空列表
     if isinstance(response, str):
         return []
@@ -118,6 +233,32 @@ def get_return_flights(flight_details: FlightDetailsModel, search_params: Flight
     else:
         return []
 
+async def attach_return_flights(
+    departure_flights: List[FlightDetailsModel],
+    search_params: FlightSearchParams,
+    max_results: int,
+    concurrency: int = RETURN_SEARCH_CONCURRENCY,
+):
+    """
+    并发获取每个出发航班的返程航班，并写入其 return_flights 字段
+
+    参数:
+        departure_flights (List[FlightDetailsModel]): 出发航班列表
+        search_params (FlightSearchParams): 出发航班的搜索参数
+        max_results (int): 每个出发航班返回的返程航班最大数量
+        concurrency (int): 同时进行的返程搜索数量上限
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(flight_detail: FlightDetailsModel):
+        async with semaphore:
+            # SerpApi 客户端是阻塞调用，放到线程中执行，避免阻塞事件循环
+            flight_detail.return_flights = await asyncio.to_thread(
+                get_return_flights, flight_detail, search_params, max_results
+            )
+
+    await asyncio.gather(*[fetch(flight_detail) for flight_detail in departure_flights])
+
 # mcp工具
 @mcp.tool()
 async def search_flights(
@@ -126,7 +267,8 @@ async def search_flights(
     outbound_date: str,  # Format: YYYY-MM-DD
     type: int,  # 1 for Round trip, 2 for One way
     return_date: Optional[str] = None,  # Format: YYYY-MM-DD, required if type is 1,
-    max_results: Optional[int] = 10
+    max_results: Optional[int] = 10,
+    projection: Optional[str] = "compact",
 ) -> str:
     """
     Searches for flight information using the Google Flights API via SerpApi.
@@ -153,15 +295,24 @@ async def search_flights(
                      required if [type](file:///Users/zhangzhihao/mcp/mcp-demo/server/google_flights/result_class.py#L39-L39) is 1, and ignored otherwise.
         max_results: The maximum number of search flight results to return for each
                      category (e.g., best outbound, other outbound, best return, etc.). Default is 10.
+        projection: How much detail to return. Default is "compact".
+              - "compact": price, durations, stops, and per-leg airline, flight number, airports and times.
+              - "table": the same itineraries as a flat table with "columns" and "rows"; return flights
+                are separate rows whose id is "<departure id>.<return index>" (e.g. "2.1").
+              - "full": every field returned by Google Flights (logos, extensions, booking tokens, ...).
 
     Returns:
-        A list of flight objects. Each flight object is the departure flight, 
+        A JSON object with "projection", "approx_tokens" (approximate size of the flights payload)
+        and "flights". In "compact" and "full" mode, "flights" is a list of flight objects. Each flight object is the departure flight, 
         and if the trip is a round trip, its return_flights field will also include the return flights of the departure flight.
         note the return size is controlled by the max_results parameter.
         if the type is round trip, and if max_results is 2, in the returned results there are 2 departure flights, and each of them has 2 return flights,
         So there are totally 4 round trip flights.
         if the type is one way, the returned results will only include the departure flights.
     """
+    if projection not in PROJECTION_MODES:
+        return f"Error: projection must be one of {', '.join(PROJECTION_MODES)}."
+
     # 检查往返类型是否提供了返回日期
     if type == 1 and not return_date:
         return "Error: Return date is required for round trip flights (type=1)."
@@ -178,8 +329,8 @@ async def search_flights(
     if type == 1 and return_date:
         params_outbound.return_date = return_date
 
-    # 调用API获取出发出程航班数据
-    response_model_outbound = call_search_api(params_outbound)
+    # 调用API获取出发出程航班数据（阻塞调用放到线程中执行）
+    response_model_outbound = await asyncio.to_thread(call_search_api, params_outbound, max_results)
     if isinstance(response_model_outbound, str):
         return response_model_outbound
 
@@ -191,23 +342,160 @@ async def search_flights(
     if not departure_flights:
         return "No flight data (best_flights or other_flights) found in the API response for the outbound journey."
 
-    # 如果是往返类型，为每个出发出程航班获取对应的返程航班
+    # 如果是往返类型，并发地为每个出发出程航班获取对应的返程航班
     if type == 1:
-        for flight_detail in departure_flights:
-            return_flights = get_return_flights(flight_detail, params_outbound, max_results)
-            flight_detail.return_flights = return_flights
-
-    # 将航班对象转换为字典并排除空值字段
-    output_data = [flight.model_dump(exclude_none=True) for flight in departure_flights]
+        await attach_return_flights(departure_flights, params_outbound, max_results)
 
-    # 尝试将结果序列化为JSON字符串返回
+    # 按投影模式转换航班对象，并估算结果的 token 数量
     try:
-        json_output = json.dumps(output_data)
-        return json_output
+        output_data = project_flights(departure_flights, projection)
+        flights_json = json.dumps(output_data)
+        approx_tokens = estimate_tokens(flights_json)
+        logger.info(f"search_flights output: projection={projection}, {len(flights_json)} chars, ~{approx_tokens} tokens")
+        return json.dumps({"projection": projection, "approx_tokens": approx_tokens, "flights": output_data})
     except Exception as e:
         logger.error(f"Error formatting output data to JSON: {e}")
         return f"Error formatting output data to JSON: {e}"
 
+def date_range(start: str, end: Optional[str]) -> List[str]:
+    """返回从 start 到 end（包含）的所有日期，格式为 YYYY-MM-DD"""
+    first = date.fromisoformat(start)
+    last = date.fromisoformat(end) if end else first
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def cheapest_option(results_dict: dict) -> Optional[dict]:
+    """
+    从原始搜索结果中找出最便宜的航班
+
+    直接读取原始字典，不做 Pydantic 校验。价格、航空公司、经停次数和总时长都来自同一个航班；
+    price_insights 中的 lowest_price 可能对应另一个航班，作为单独的字段返回。
+
+    返回:
+        Optional[dict]: 包含价格、航空公司、经停次数和总时长的精简结果，没有带价格的航班时返回 None
+    """
+    flights = [
+        flight
+        for flight in (results_dict.get("best_flights") or []) + (results_dict.get("other_flights") or [])
+        if flight.get("price") is not None
+    ]
+    cheapest = min(flights, key=lambda flight: flight["price"], default=None)
+    if cheapest is None:
+        return None
+
+    airlines = [leg.get("airline") for leg in cheapest.get("flights") or []]
+    option = {
+        "price": cheapest["price"],
+        "airlines": "/".join(dict.fromkeys(airline for airline in airlines if airline)),
+        "stops": len(cheapest.get("layovers") or []),
+        "total_duration": cheapest.get("total_duration"),
+    }
+    lowest_price = (results_dict.get("price_insights") or {}).get("lowest_price")
+    if lowest_price is not None:
+        option["price_insights_lowest_price"] = lowest_price
+    return option
+
+
+@mcp.tool()
+async def search_flight_date_matrix(
+    departure_id: str,
+    arrival_id: str,
+    outbound_date_start: str,  # Format: YYYY-MM-DD
+    outbound_date_end: Optional[str] = None,  # Format: YYYY-MM-DD
+    return_date_start: Optional[str] = None,  # Format: YYYY-MM-DD
+    return_date_end: Optional[str] = None,  # Format: YYYY-MM-DD
+) -> str:
+    """
+    Finds the cheapest dates to fly by searching every combination of outbound and return dates
+    in the given ranges in one call. Use this instead of calling search_flights once per date when the
+    user asks questions like "what's the cheapest day to fly next week?".
+
+    Args:
+        departure_id: The departure airport code (e.g., "SFO") or a Google KG Midtown ID (e.g., "/m/0vzm").
+        arrival_id: The arrival airport code (e.g., "CDG") or a Google KG Midtown ID (e.g., "/m/04jpl").
+        outbound_date_start: First outbound date to search, formatted as YYYY-MM-DD.
+        outbound_date_end: Last outbound date to search (inclusive), formatted as YYYY-MM-DD.
+                           Defaults to outbound_date_start.
+        return_date_start: First return date to search, formatted as YYYY-MM-DD. If omitted, one-way
+                           flights are searched.
+        return_date_end: Last return date to search (inclusive), formatted as YYYY-MM-DD.
+                         Defaults to return_date_start.
+
+    Returns:
+        A JSON object with "outbound_dates", "return_dates" (round trips only), a "grid" whose rows are
+        outbound dates and whose columns are return dates, and the overall "cheapest" cell. Each cell is
+        null (no flights or return before outbound) or the cheapest option for that date pair:
+        {"price", "airlines", "stops", "total_duration"} of the cheapest listed flight, plus
+        "price_insights_lowest_price" (Google's lowest price for the date pair, which may belong to a
+        flight that is not listed) when available. Round-trip prices are for the whole trip.
+        Use search_flights on the chosen dates to get the full itineraries.
+    """
+    try:
+        outbound_dates = date_range(outbound_date_start, outbound_date_end)
+        return_dates = date_range(return_date_start, return_date_end) if return_date_start else [None]
+    except ValueError as e:
+        return f"Error: invalid date: {e}. Dates must be formatted as YYYY-MM-DD."
+
+    # 只搜索返程日期不早于出发日期的组合
+    cells = [
+        (i, j)
+        for i, outbound_date in enumerate(outbound_dates)
+        for j, return_date in enumerate(return_dates)
+        if return_date is None or return_date >= outbound_date
+    ]
+    if not cells:
+        return "Error: no valid date combinations, return dates must not be before outbound dates."
+    if len(cells) > DATE_MATRIX_MAX_CELLS:
+        return f"Error: {len(cells)} date combinations requested, at most {DATE_MATRIX_MAX_CELLS} are allowed. Narrow the date ranges."
+
+    semaphore = asyncio.Semaphore(DATE_MATRIX_CONCURRENCY)
+    grid: List[List[Optional[dict]]] = [[None] * len(return_dates) for _ in outbound_dates]
+
+    async def search_cell(i: int, j: int):
+        params = FlightSearchParams(
+            departure_id=departure_id,
+            arrival_id=arrival_id,
+            outbound_date=outbound_dates[i],
+            return_date=return_dates[j],
+            type=1 if return_dates[j] else 2,
+        )
+        async with semaphore:
+            # SerpApi 客户端是阻塞调用，放到线程中执行；结果会经过航班搜索缓存
+            results_dict = await asyncio.to_thread(fetch_search_results, params)
+        if isinstance(results_dict, dict):
+            grid[i][j] = cheapest_option(results_dict)
+
+    await asyncio.gather(*[search_cell(i, j) for i, j in cells])
+
+    cheapest = None
+    for i, j in cells:
+        option = grid[i][j]
+        if option is not None and (cheapest is None or option["price"] < cheapest["price"]):
+            cheapest = {"outbound_date": outbound_dates[i], "return_date": return_dates[j], **option}
+    if cheapest is None:
+        return "No flight prices found for any of the requested dates."
+    if return_dates == [None]:
+        cheapest.pop("return_date")
+
+    output = {"outbound_dates": outbound_dates}
+    if return_dates != [None]:
+        output["return_dates"] = return_dates
+    output["grid"] = grid
+    output["cheapest"] = cheapest
+    return json.dumps(output)
+
+@mcp.resource("flights://cache/stats")
+def get_cache_stats() -> str:
+    """Hit rate and SerpApi requests saved by the flight search cache"""
+    if flight_cache is None:
+        return json.dumps({"enabled": False})
+    return json.dumps({"enabled": True, **flight_cache.stats()})
+
+@mcp.resource("flights://rate-limit/stats")
+def get_rate_limit_stats() -> str:
+    """Current SerpApi rate limiter bucket levels and throttling counters"""
+    return json.dumps(serpapi_rate_limiter.metrics())
+
 if __name__ == "__main__":
     # This allows running the MCP server directly for this tool
     # Ensure that mcp.server.fastmcp is accessible in your PYTHONPATH
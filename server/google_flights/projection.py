@@ -0,0 +1,129 @@
+from typing import List, Optional
+
+from result_class import FlightDetailsModel
+
+# 可选的输出投影模式
+PROJECTION_MODES = ("full", "compact", "table")
+
+# 表格模式的列
+TABLE_COLUMNS = [
+    "id",
+    "direction",
+    "price",
+    "total_duration",
+    "stops",
+    "airlines",
+    "flight_numbers",
+    "route",
+    "departure_time",
+    "arrival_time",
+]
+
+
+def slice_results(results_dict: dict, max_results: Optional[int]) -> dict:
+    """
+    截取API响应中实际会被使用的部分，只对这部分数据进行校验
+
+    best_flights 在前、other_flights 在后，合计最多保留 max_results 个航班，
+    与 search_flights 和 get_return_flights 的取数方式一致。
+
+    参数:
+        results_dict (dict): SerpApi 返回的原始结果
+        max_results (Optional[int]): 最多保留的航班数量，为 None 时保留全部
+
+    返回:
+        dict: 只包含 best_flights、other_flights 和 price_insights 的精简结果
+    """
+    best = results_dict.get("best_flights") or []
+    other = results_dict.get("other_flights") or []
+    if max_results is not None:
+        best = best[:max_results]
+        other = other[: max(0, max_results - len(best))]
+    return {
+        "best_flights": best,
+        "other_flights": other,
+        "price_insights": results_dict.get("price_insights"),
+    }
+
+
+def _compact_flight(flight: FlightDetailsModel) -> dict:
+    legs = []
+    for leg in flight.flights:
+        compact_leg = {
+            "airline": leg.airline,
+            "flight_number": leg.flight_number,
+            "from": leg.departure_airport.id,
+            "departure_time": leg.departure_airport.time,
+            "to": leg.arrival_airport.id,
+            "arrival_time": leg.arrival_airport.time,
+            "duration": leg.duration,
+        }
+        # 只保留为真的提示信息
+        if leg.overnight:
+            compact_leg["overnight"] = True
+        if leg.often_delayed_by_over_30_min:
+            compact_leg["often_delayed_by_over_30_min"] = True
+        legs.append(compact_leg)
+
+    result = {
+        "price": flight.price,
+        "total_duration": flight.total_duration,
+        "stops": len(flight.layovers or []),
+        "legs": legs,
+    }
+    if flight.layovers:
+        result["layovers"] = [
+            {"airport": layover.id, "duration": layover.duration}
+            for layover in flight.layovers
+        ]
+    if flight.return_flights:
+        result["return_flights"] = [_compact_flight(f) for f in flight.return_flights]
+    return result
+
+
+def _table_row(flight: FlightDetailsModel, row_id: str, direction: str) -> list:
+    first_leg, last_leg = flight.flights[0], flight.flights[-1]
+    airports = [first_leg.departure_airport.id] + [leg.arrival_airport.id for leg in flight.flights]
+    return [
+        row_id,
+        direction,
+        flight.price,
+        flight.total_duration,
+        len(flight.layovers or []),
+        "/".join(dict.fromkeys(leg.airline for leg in flight.flights)),
+        ",".join(leg.flight_number for leg in flight.flights),
+        "-".join(airports),
+        first_leg.departure_airport.time,
+        last_leg.arrival_airport.time,
+    ]
+
+
+def _table(flights: List[FlightDetailsModel]) -> dict:
+    # 返程航班作为单独的行，id 形如 "2.1" 表示第 2 个出发航班的第 1 个返程航班
+    rows = []
+    for i, flight in enumerate(flights, start=1):
+        rows.append(_table_row(flight, str(i), "outbound"))
+        for j, return_flight in enumerate(flight.return_flights or [], start=1):
+            rows.append(_table_row(return_flight, f"{i}.{j}", "return"))
+    return {"columns": TABLE_COLUMNS, "rows": rows}
+
+
+def project_flights(flights: List[FlightDetailsModel], mode: str) -> list | dict:
+    """
+    按投影模式转换航班结果
+
+    参数:
+        flights (List[FlightDetailsModel]): 出发航班列表（往返时包含 return_flights）
+        mode (str): "full" 保留所有字段；"compact" 只保留价格、时长、航段等关键字段；
+                    "table" 输出扁平的表格（columns + rows）
+
+    返回:
+        list | dict: 可直接序列化为 JSON 的结果
+    """
+    if mode == "full":
+        return [flight.model_dump(exclude_none=True) for flight in flights]
+    if mode == "compact":
+        return [_compact_flight(flight) for flight in flights]
+    if mode == "table":
+        return _table(flights)
+    raise ValueError(f"Unknown projection mode: {mode}. Expected one of {PROJECTION_MODES}")
@@ -0,0 +1,59 @@
+import json
+import os
+from typing import Any
+
+
+class GridpointIndex:
+    """Persistent on-disk index from rounded lat/lon to NWS gridpoint.
+
+    NWS forecasts need a /points/{lat},{lon} lookup to find the grid office and
+    coordinates first. The result never changes for a location, so it is kept
+    in a small JSON file and repeat locations skip the lookup entirely.
+    """
+
+    def __init__(self, path: str, precision: int = 2):
+        self.path = path
+        # 2 decimals is ~1 km, well inside a 2.5 km NWS grid cell
+        self.precision = precision
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def round(self, latitude: float, longitude: float) -> tuple[float, float]:
+        return round(latitude, self.precision), round(longitude, self.precision)
+
+    def key(self, latitude: float, longitude: float) -> str:
+        lat, lon = self.round(latitude, longitude)
+        return f"{lat:.{self.precision}f},{lon:.{self.precision}f}"
+
+    def get(self, latitude: float, longitude: float) -> dict[str, Any] | None:
+        return self._entries.get(self.key(latitude, longitude))
+
+    def put(self, latitude: float, longitude: float, gridpoint: dict[str, Any]):
+        self._entries[self.key(latitude, longitude)] = gridpoint
+        self._dirty = True
+
+    def discard(self, latitude: float, longitude: float):
+        if self._entries.pop(self.key(latitude, longitude), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Write the index to disk if it changed, atomically replacing the old file."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
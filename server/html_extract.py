@@ -0,0 +1,191 @@
+"""
+从 HTML 中提取可读内容并转换为 Markdown
+
+只依赖标准库的 html.parser：去掉脚本、样式、导航等非正文元素，保留标题、段落、列表、链接、
+代码块和表格的基本结构。函数不访问共享状态，可以在线程中执行。
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+# 内容（包括子元素）全部丢弃的元素，按开始和结束标签计数嵌套深度，因此只能包含结束标签不可省略的元素。
+# <head> 和 <option> 的结束标签可以省略，分别由 <body> 和 <select> 处理。
+# 很多页面把整个正文放在 <form> 中，因此 <form> 和 <button> 的文本保留，只丢弃表单控件的值
+# （<input> 的值在属性中，本来就不输出）
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "footer", "aside", "textarea",
+}
+# 前后需要换行的块级元素
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "blockquote", "ul", "ol",
+    "table", "tr", "dl", "dt", "dd", "figure", "figcaption", "br", "hr",
+}
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col", "embed", "source", "track", "wbr"}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+
+class MarkdownExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.title: Optional[str] = None
+        self._skip_depth = 0
+        self._in_title = False
+        # <select> 中的选项文本不是正文，<option> 的结束标签经常省略，只跟踪 <select> 本身
+        self._in_select = False
+        self._pre_depth = 0
+        self._list_stack: list[list] = []  # [tag, 序号]
+        self._link_href: Optional[str] = None
+        self._link_start = 0
+
+    def _newline(self, count: int = 2):
+        self.parts.append("\n" * count)
+
+    def handle_starttag(self, tag, attrs):
+        # <title> 的文本作为文档标题单独保存，不输出到正文
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag == "body":
+            # <head> 中未闭合的元素（如缺少结束标签的 <noscript>）不能吞掉正文
+            self._skip_depth = 0
+            self._in_title = False
+            return
+        if tag == "select":
+            self._in_select = True
+            return
+        if self._skip_depth:
+            if tag in SKIP_TAGS and tag not in VOID_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth = 1
+            return
+
+        attributes = dict(attrs)
+        if tag in HEADING_TAGS:
+            self._newline()
+            self.parts.append("#" * HEADING_TAGS[tag] + " ")
+        elif tag == "pre":
+            self._pre_depth += 1
+            self._newline()
+            self.parts.append("```\n")
+        elif tag == "code" and not self._pre_depth:
+            self.parts.append("`")
+        elif tag in ("ul", "ol"):
+            self._list_stack.append([tag, 0])
+            self._newline(1)
+        elif tag == "li":
+            self._newline(1)
+            indent = "  " * max(0, len(self._list_stack) - 1)
+            if self._list_stack and self._list_stack[-1][0] == "ol":
+                self._list_stack[-1][1] += 1
+                self.parts.append(f"{indent}{self._list_stack[-1][1]}. ")
+            else:
+                self.parts.append(f"{indent}- ")
+        elif tag in ("strong", "b"):
+            self.parts.append("**")
+        elif tag in ("em", "i"):
+            self.parts.append("*")
+        elif tag == "a":
+            self._link_href = attributes.get("href")
+            self._link_start = len(self.parts)
+        elif tag == "img":
+            alt = (attributes.get("alt") or "").strip()
+            if alt:
+                self.parts.append(f"[image: {alt}]")
+        elif tag in ("td", "th"):
+            self.parts.append(" | ")
+        elif tag == "hr":
+            self._newline()
+            self.parts.append("---")
+            self._newline()
+        elif tag in BLOCK_TAGS:
+            self._newline(1 if tag in ("br", "tr", "dd", "dt") else 2)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag == "select":
+            self._in_select = False
+            return
+        if self._skip_depth:
+            if tag in SKIP_TAGS:
+                self._skip_depth -= 1
+            return
+        if tag in HEADING_TAGS:
+            self._newline()
+        elif tag == "pre" and self._pre_depth:
+            self._pre_depth -= 1
+            self.parts.append("\n```")
+            self._newline()
+        elif tag == "code" and not self._pre_depth:
+            self.parts.append("`")
+        elif tag in ("ul", "ol"):
+            if self._list_stack:
+                self._list_stack.pop()
+            self._newline(1)
+        elif tag in ("strong", "b"):
+            self.parts.append("**")
+        elif tag in ("em", "i"):
+            self.parts.append("*")
+        elif tag == "a":
+            href = self._link_href
+            self._link_href = None
+            text = "".join(self.parts[self._link_start :]).strip()
+            if href and text and not href.startswith(("#", "javascript:")):
+                del self.parts[self._link_start :]
+                self.parts.append(f"[{text}]({href})")
+        elif tag in BLOCK_TAGS:
+            self._newline(1 if tag in ("tr", "dd", "dt") else 2)
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+            return
+        if self._skip_depth or self._in_select:
+            return
+        if self._pre_depth:
+            self.parts.append(data)
+            return
+        data = re.sub(r"\s+", " ", data)
+        # 行首的空白没有意义（列表缩进由 <li> 输出）
+        if not self.parts or self.parts[-1].endswith("\n"):
+            data = data.lstrip()
+        if data:
+            self.parts.append(data)
+
+    def markdown(self) -> str:
+        text = "".join(self.parts)
+        # 去掉行尾空格，合并多个空行
+        text = re.sub(r"[ \t]+\n", "\n", text)
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        return text.strip()
+
+
+def html_to_markdown(html: str) -> str:
+    """把 HTML 转换为 Markdown，有 <title> 时作为一级标题放在开头"""
+    extractor = MarkdownExtractor()
+    extractor.feed(html)
+    extractor.close()
+    body = extractor.markdown()
+    if extractor.title and not body.startswith("# "):
+        return f"# {extractor.title}\n\n{body}"
+    return body
+
+
+def is_html(content_type: str, text: str) -> bool:
+    if "html" in content_type:
+        return True
+    return not content_type and "<html" in text[:1000].lower()
+
+
+def extract_content(content: bytes, content_type: str, encoding: str, raw: bool) -> str:
+    """把响应体解码为文本，HTML（raw 为 False 时）转换为 Markdown"""
+    text = content.decode(encoding or "utf-8", errors="replace")
+    if not raw and is_html(content_type.lower(), text):
+        return html_to_markdown(text)
+    return text
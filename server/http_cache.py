@@ -0,0 +1,255 @@
+"""
+带连接池和 HTTP 缓存的异步 HTTP 客户端
+
+整个 Server 生命周期内共享一个 httpx.AsyncClient（支持时启用 HTTP/2），复用 TCP/TLS 连接；
+在其之上实现遵循 Cache-Control / Expires / ETag / Last-Modified 语义的内存缓存：
+新鲜的缓存条目直接从内存返回，过期的条目通过条件请求重新验证。
+"""
+
+import asyncio
+import email.utils
+import importlib.util
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+# 安装了 h2 时才能启用 HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class CacheEntry:
+    status_code: int
+    headers: dict[str, str]
+    content: bytes
+    # 条目被存储（或最近一次重新验证）的时间
+    stored_at: float
+    # 从 stored_at 开始计算的新鲜期（秒）
+    freshness_lifetime: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Cache-Control: no-cache，每次使用前都必须重新验证
+    must_revalidate: bool = False
+
+    def is_fresh(self, now: float) -> bool:
+        return not self.must_revalidate and now - self.stored_at < self.freshness_lifetime
+
+    def can_revalidate(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    stored: int = 0
+
+
+def parse_cache_control(value: Optional[str]) -> dict[str, Optional[str]]:
+    directives = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: httpx.Headers) -> float:
+    """根据 Cache-Control: max-age 或 Expires/Date 计算响应的剩余新鲜期（秒）"""
+    directives = parse_cache_control(headers.get("cache-control"))
+    age = float(headers.get("age", 0) or 0)
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(directives["max-age"]) - age)
+        except (TypeError, ValueError):
+            return 0.0
+    expires = _parse_http_date(headers.get("expires"))
+    if expires is not None:
+        date = _parse_http_date(headers.get("date")) or time.time()
+        return max(0.0, expires - date - age)
+    return 0.0
+
+
+class CachingHTTPClient:
+    """
+    共享连接池 + HTTP 缓存的异步客户端
+
+    参数:
+        headers (dict): 每个请求都会携带的默认请求头
+        timeout (float): 请求超时时间（秒）
+        max_connections (int): 连接池的最大连接数
+        max_keepalive_connections (int): 连接池保持的最大空闲连接数
+        max_entries (int): 内存缓存的最大条目数，超出时淘汰最久未使用的条目
+        max_entry_bytes (int): 单个响应体超过该大小时不缓存
+        max_connections_per_host (int): 同一主机同时进行的上游请求数上限，None 表示只受连接池限制
+        follow_redirects (bool): 是否自动跟随重定向
+    """
+
+    def __init__(
+        self,
+        headers: Optional[dict] = None,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        max_entries: int = 256,
+        max_entry_bytes: int = 2 * 1024 * 1024,
+        max_connections_per_host: Optional[int] = None,
+        follow_redirects: bool = False,
+    ):
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=follow_redirects,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # 相同 URL 的并发请求只发出一次上游请求
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.max_connections_per_host = max_connections_per_host
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _cache_key(self, url: str, headers: Optional[dict]) -> str:
+        accept = (headers or {}).get("Accept") or self.client.headers.get("accept", "")
+        return f"{accept} {url}"
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """发送 GET 请求，可用缓存时直接返回缓存的响应（response.extensions["from_cache"] 为 True）"""
+        key = self._cache_key(url, headers)
+        entry = self._entries.get(key)
+        if entry is not None and entry.is_fresh(time.time()):
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return self._to_response(url, entry)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._fetch(url, key, headers, entry)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fetch(
+        self, url: str, key: str, headers: Optional[dict], entry: Optional[CacheEntry]
+    ) -> httpx.Response:
+        request_headers = dict(headers or {})
+        if entry is not None and entry.can_revalidate():
+            # 条件请求：资源未变化时服务器返回 304，无需重新传输响应体
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+
+        if self.max_connections_per_host is None:
+            response = await self.client.get(url, headers=request_headers)
+        else:
+            async with self._host_semaphore(url):
+                response = await self.client.get(url, headers=request_headers)
+
+        if response.status_code == 304 and entry is not None:
+            self.stats.revalidated += 1
+            self._refresh(entry, response.headers)
+            self._entries.move_to_end(key)
+            return self._to_response(url, entry)
+
+        self.stats.misses += 1
+        self._store(key, response)
+        return response
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = httpx.URL(url).host
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return semaphore
+
+    def _refresh(self, entry: CacheEntry, headers: httpx.Headers):
+        directives = parse_cache_control(headers.get("cache-control"))
+        entry.stored_at = time.time()
+        if "cache-control" in headers or "expires" in headers:
+            entry.freshness_lifetime = freshness_lifetime(headers)
+            entry.must_revalidate = "no-cache" in directives
+        entry.etag = headers.get("etag", entry.etag)
+        entry.last_modified = headers.get("last-modified", entry.last_modified)
+
+    def _store(self, key: str, response: httpx.Response):
+        if response.status_code != 200:
+            return
+        directives = parse_cache_control(response.headers.get("cache-control"))
+        if "no-store" in directives or len(response.content) > self.max_entry_bytes:
+            self._entries.pop(key, None)
+            return
+
+        entry = CacheEntry(
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=response.content,
+            stored_at=time.time(),
+            freshness_lifetime=freshness_lifetime(response.headers),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            must_revalidate="no-cache" in directives,
+        )
+        # 既不新鲜也无法重新验证的响应没有缓存价值
+        if entry.freshness_lifetime <= 0 and not entry.can_revalidate():
+            self._entries.pop(key, None)
+            return
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.stats.stored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _to_response(self, url: str, entry: CacheEntry) -> httpx.Response:
+        # 缓存中的响应体已解码，去掉与编码相关的响应头
+        headers = {
+            k: v
+            for k, v in entry.headers.items()
+            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        return httpx.Response(
+            entry.status_code,
+            headers=headers,
+            content=entry.content,
+            request=httpx.Request("GET", url),
+            extensions={"from_cache": True},
+        )
@@ -0,0 +1,322 @@
+"""
+预热的 Python 工作进程池
+
+每个工作进程都是从 forkserver 模板进程 fork 出来的独立解释器，模板进程预先导入了
+numpy、pandas 等常用重量级模块，因此每次执行代码时无需再承担导入开销。
+代码在工作进程中执行，不会阻塞 MCP Server 的事件循环，也不会破坏 Server 进程本身。
+"""
+
+import asyncio
+import contextlib
+import importlib
+import io
+import linecache
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 工作进程启动时预先导入的模块，导入失败（未安装）时直接忽略
+PRELOAD_MODULES = ["numpy", "pandas"]
+
+# 被执行代码在 traceback 中显示的文件名
+CODE_FILENAME = "<code>"
+
+# 补充工作进程失败时的重试间隔（秒），每次失败后加倍，直到上限
+RESPAWN_RETRY_DELAY = 1
+RESPAWN_MAX_RETRY_DELAY = 60
+
+
+@dataclass
+class ExecutionResult:
+    stdout: str = ""
+    stderr: str = ""
+    # 执行代码抛出异常时的 traceback
+    error: Optional[str] = None
+    timed_out: bool = False
+    # 有状态会话的工作进程被重建，之前定义的变量已丢失
+    session_reset: bool = False
+
+
+def _preload(modules: list[str]):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def _worker_main(conn, preload_modules: list[str]):
+    """工作进程主循环：接收代码、执行并返回输出，收到 None 时退出"""
+    # Server 进程的标准输出是 MCP 的 stdio 通道，将工作进程的 fd 1 指向标准错误，
+    # 防止子进程或 C 扩展直接写 fd 1 时破坏协议数据
+    os.dup2(2, 1)
+    _preload(preload_modules)
+    # 通知主进程本工作进程已完成预热
+    conn.send(True)
+
+    # 有状态会话在多次调用之间共享的命名空间
+    session_namespace = {}
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+
+        code, keep_state = request
+        output_buffer = io.StringIO()
+        error_buffer = io.StringIO()
+        result = ExecutionResult()
+        # 注册源码，使 traceback 能显示出错的代码行
+        linecache.cache[CODE_FILENAME] = (len(code), None, code.splitlines(True), CODE_FILENAME)
+        try:
+            compiled = compile(code, CODE_FILENAME, "exec")
+            with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(error_buffer):
+                exec(compiled, session_namespace if keep_state else {})
+        except BaseException as e:
+            # SystemExit 等也只影响本次执行，不会让工作进程退出
+            # 去掉工作进程自身的栈帧，只保留用户代码部分
+            result.error = "".join(
+                traceback.format_exception(type(e), e, e.__traceback__.tb_next)
+            )
+
+        result.stdout = output_buffer.getvalue()
+        result.stderr = error_buffer.getvalue()
+        try:
+            conn.send(result)
+        except (BrokenPipeError, EOFError):
+            break
+
+
+class _Worker:
+    """对单个工作进程及其通信管道的封装，run/close 均为阻塞调用，需在线程中执行"""
+
+    def __init__(self, ctx, preload_modules: list[str]):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, preload_modules), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        # 等待工作进程完成模块预加载，保证进入进程池的都是已预热的进程
+        try:
+            self.conn.recv()
+        except BaseException:
+            self.kill()
+            raise
+        self.executions = 0
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def run(self, code: str, keep_state: bool, timeout: float) -> ExecutionResult:
+        self.executions += 1
+        self.last_used = time.monotonic()
+        try:
+            self.conn.send((code, keep_state))
+            if not self.conn.poll(timeout):
+                # 超时后直接杀掉工作进程，由进程池负责补充新的进程
+                self.kill()
+                return ExecutionResult(timed_out=True)
+            return self.conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            self.process.join(timeout=1)
+            return ExecutionResult(
+                error=f"工作进程异常退出 (退出码 {self.process.exitcode})"
+            )
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PythonWorkerPool:
+    """
+    Python 代码执行进程池
+
+    参数:
+        size (int): 无状态调用使用的工作进程数量
+        max_executions_per_worker (int): 每个工作进程执行多少次后被回收重建
+        timeout (float): 单次执行的默认墙钟超时时间（秒）
+        preload_modules (list[str]): 工作进程预先导入的模块
+        max_sessions (int): 同时保留的有状态会话数量上限，超出时淘汰最久未使用的会话
+        session_idle_timeout (float): 有状态会话空闲多久（秒）后被回收
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        max_executions_per_worker: int = 50,
+        timeout: float = 30,
+        preload_modules: Optional[list[str]] = None,
+        max_sessions: int = 8,
+        session_idle_timeout: float = 1800,
+    ):
+        self.size = size
+        self.max_executions_per_worker = max_executions_per_worker
+        self.timeout = timeout
+        self.preload_modules = PRELOAD_MODULES if preload_modules is None else preload_modules
+        self.max_sessions = max_sessions
+        self.session_idle_timeout = session_idle_timeout
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            # 模板进程预先导入重量级模块，之后 fork 出的工作进程直接共享这些模块
+            self._ctx.set_forkserver_preload(self.preload_modules)
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+
+        self._idle: asyncio.Queue[_Worker] = asyncio.Queue()
+        # session_id -> 该会话专属的工作进程，按最近使用时间排序
+        self._sessions: OrderedDict[str, _Worker] = OrderedDict()
+        self._session_locks: dict[str, asyncio.Lock] = {}
+        self._background_tasks: set[asyncio.Task] = set()
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._started:
+                return
+            workers = await asyncio.gather(
+                *[self._spawn_worker() for _ in range(self.size)]
+            )
+            for worker in workers:
+                self._idle.put_nowait(worker)
+            self._started = True
+            logger.info(f"Python worker pool started with {self.size} workers")
+
+    async def shutdown(self):
+        for task in list(self._background_tasks):
+            task.cancel()
+        workers = list(self._sessions.values())
+        self._sessions.clear()
+        while not self._idle.empty():
+            workers.append(self._idle.get_nowait())
+        await asyncio.gather(
+            *[asyncio.to_thread(worker.close) for worker in workers],
+            return_exceptions=True,
+        )
+        self._started = False
+
+    async def execute(
+        self, code: str, session_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> ExecutionResult:
+        """在空闲的工作进程中执行代码；指定 session_id 时在该会话专属的进程中执行并保留变量"""
+        await self.start()
+        timeout = timeout or self.timeout
+        if session_id:
+            return await self._execute_in_session(code, session_id, timeout)
+
+        worker = await self._idle.get()
+        try:
+            return await asyncio.to_thread(worker.run, code, False, timeout)
+        finally:
+            self._release(worker)
+
+    async def _spawn_worker(self) -> _Worker:
+        return await asyncio.to_thread(_Worker, self._ctx, self.preload_modules)
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _reusable(self, worker: _Worker) -> bool:
+        return worker.is_alive() and worker.executions < self.max_executions_per_worker
+
+    def _release(self, worker: _Worker):
+        """归还工作进程；进程已退出或达到执行次数上限时回收并在后台补充新进程"""
+        if self._reusable(worker):
+            self._idle.put_nowait(worker)
+            return
+        self._run_in_background(self._replace(worker))
+
+    async def _replace(self, worker: Optional[_Worker]):
+        if worker is not None:
+            await asyncio.to_thread(worker.close)
+        # 新进程启动失败（例如预加载时崩溃）时重试，否则进程池会永久少一个进程
+        delay = RESPAWN_RETRY_DELAY
+        while True:
+            try:
+                new_worker = await self._spawn_worker()
+                break
+            except Exception:
+                logger.exception(f"Failed to start Python worker, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RESPAWN_MAX_RETRY_DELAY)
+        self._idle.put_nowait(new_worker)
+
+    async def _execute_in_session(
+        self, code: str, session_id: str, timeout: float
+    ) -> ExecutionResult:
+        self._evict_idle_sessions()
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session_reset = False
+            worker = self._sessions.get(session_id)
+            if worker is not None and not worker.is_alive():
+                # 会话进程已退出（例如上次执行超时），之前的变量已丢失
+                del self._sessions[session_id]
+                worker = None
+                session_reset = True
+
+            if worker is None:
+                # 直接借用一个已预热的进程作为会话进程，并在后台为进程池补充一个新进程
+                worker = await self._idle.get()
+                self._run_in_background(self._replace(None))
+                self._sessions[session_id] = worker
+                self._evict_overflow_sessions()
+
+            self._sessions.move_to_end(session_id)
+            result = await asyncio.to_thread(worker.run, code, True, timeout)
+            result.session_reset = session_reset
+            if worker.is_alive() and not self._reusable(worker):
+                # 与进程池中的进程相同，达到执行次数上限后回收；下次调用走上面的重建分支
+                await asyncio.to_thread(worker.close)
+            return result
+
+    def _close_session(self, session_id: str):
+        worker = self._sessions.pop(session_id)
+        self._session_locks.pop(session_id, None)
+        self._run_in_background(asyncio.to_thread(worker.close))
+
+    def _evict_idle_sessions(self):
+        now = time.monotonic()
+        for session_id, worker in list(self._sessions.items()):
+            lock = self._session_locks.get(session_id)
+            if lock is not None and lock.locked():
+                continue
+            if now - worker.last_used > self.session_idle_timeout:
+                self._close_session(session_id)
+
+    def _evict_overflow_sessions(self):
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            lock = self._session_locks.get(session_id)
+            if lock is not None and lock.locked():
+                continue
+            self._close_session(session_id)
@@ -0,0 +1,60 @@
+"""
+server 脚本共用的设置
+
+server 以脚本方式运行（python ./server/xxx.py），sys.path 中只有脚本所在的目录；导入本模块时
+将仓库根目录加入 sys.path，server 之后就可以导入共享的 util 模块。
+
+create_server 创建 FastMCP server，设置 LOOP_MONITOR_ENABLED=1 时为其加上事件循环监控。
+"""
+
+import json
+import os
+import sys
+
+from mcp.server.fastmcp import FastMCP
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+from util.loop_monitor import LoopMonitor  # noqa: E402
+
+
+class MonitoredFastMCP(FastMCP):
+    """
+    带事件循环监控的 FastMCP server
+
+    覆盖 FastMCP.call_tool（server 初始化时注册为工具调用的处理函数）：监控在第一次工具调用时
+    于 server 的事件循环中启动，每次工具调用都登记工具名、请求 id 和会话作为卡顿报告的上下文；
+    监控数据可从 loop-monitor://stats 资源读取。
+    """
+
+    def __init__(self, name: str, monitor: LoopMonitor, **settings):
+        super().__init__(name, **settings)
+        self.loop_monitor = monitor
+
+        @self.resource("loop-monitor://stats")
+        def get_loop_monitor_stats() -> str:
+            """Event loop lag percentiles and recent stalls of this server"""
+            return json.dumps(monitor.stats())
+
+    async def call_tool(self, name, arguments):
+        self.loop_monitor.start()
+        fields = {"tool": name, "arguments": json.dumps(arguments, default=str)[:200]}
+        try:
+            context = self.get_context()
+            fields["request_id"] = context.request_id
+            fields["session"] = hex(id(context.session))
+        except ValueError:
+            # 不在请求上下文中（如直接调用工具）
+            pass
+        with self.loop_monitor.context(**fields):
+            return await super().call_tool(name, arguments)
+
+
+def create_server(name: str, **settings) -> FastMCP:
+    """创建 FastMCP server；server 的事件循环监控默认关闭，LOOP_MONITOR_ENABLED=1 时开启"""
+    monitor = LoopMonitor.from_env(name, default_enabled=False)
+    if monitor is None:
+        return FastMCP(name, **settings)
+    return MonitoredFastMCP(name, monitor, **settings)
@@ -1,27 +1,70 @@
 from typing import Any
-import httpx
-from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+import asyncio
+import os
+from pydantic import BaseModel
 
-# Initialize FastMCP server
-mcp = FastMCP("weather")
+from gridpoint_index import GridpointIndex
+from http_cache import CachingHTTPClient
+
+from server_setup import create_server
 
 # Constants
-NWS_API_BASE = "https://api.weather.gov"
+# NWS_API_BASE can be overridden to point the server at a local stub NWS server
+NWS_API_BASE = os.getenv("NWS_API_BASE", "https://api.weather.gov")
 USER_AGENT = "weather-app/1.0"
+CACHE_DIR = os.getenv("MCP_CACHE_DIR", ".cache")
+# Number of forecast periods returned per location
+FORECAST_PERIODS = 5
+# Forecast statuses meaning the indexed gridpoint itself is gone, not a transient failure
+GRIDPOINT_GONE_STATUSES = (404, 410)
 
-async def make_nws_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the NWS API with proper error handling."""
-    headers = {
+# One pooled, caching HTTP client shared by every request for the server's lifetime
+http_client = CachingHTTPClient(
+    headers={
         "User-Agent": USER_AGENT,
         "Accept": "application/geo+json"
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    },
+    timeout=30.0,
+)
+
+# Persistent lat/lon -> gridpoint index, so repeat locations need a single upstream request
+gridpoint_index = GridpointIndex(os.path.join(CACHE_DIR, "weather_gridpoints.json"))
+
+
+@asynccontextmanager
+async def server_lifespan(server):
+    try:
+        yield
+    finally:
+        gridpoint_index.save()
+        await http_client.aclose()
+
+
+# Initialize FastMCP server
+mcp = create_server("weather", lifespan=server_lifespan)
+
+async def fetch_nws(url: str) -> tuple[int | None, dict[str, Any] | None]:
+    """Request the NWS API, returning (status code, JSON body).
+
+    The body is None on any failure; the status is None when no response was received.
+    """
+    try:
+        response = await http_client.get(url)
+    except Exception:
+        return None, None
+    if not response.is_success:
+        return response.status_code, None
+    try:
+        return response.status_code, response.json()
+    except ValueError:
+        return response.status_code, None
+
+
+async def make_nws_request(url: str) -> dict[str, Any] | None:
+    """Make a request to the NWS API with proper error handling."""
+    _, data = await fetch_nws(url)
+    return data
 
 
 def format_alert(feature: dict) -> str:
@@ -54,6 +97,101 @@ async def get_alerts(state: str) -> str:
     alerts = [format_alert(feature) for feature in data["features"]]
     return "\n---\n".join(alerts)
 
+class Location(BaseModel):
+    latitude: float
+    longitude: float
+    name: str | None = None
+
+
+async def resolve_gridpoint(latitude: float, longitude: float) -> dict[str, Any] | None:
+    """Resolve a location to its NWS gridpoint, using the persistent index when possible."""
+    gridpoint = gridpoint_index.get(latitude, longitude)
+    if gridpoint is not None:
+        return gridpoint
+
+    lat, lon = gridpoint_index.round(latitude, longitude)
+    data = await make_nws_request(f"{NWS_API_BASE}/points/{lat},{lon}")
+    if not data or "properties" not in data:
+        return None
+
+    try:
+        props = data["properties"]
+        relative_location = props.get("relativeLocation", {}).get("properties", {})
+        gridpoint = {
+            "grid_id": props["gridId"],
+            "grid_x": props["gridX"],
+            "grid_y": props["gridY"],
+            "place": ", ".join(
+                part for part in (relative_location.get("city"), relative_location.get("state")) if part
+            ),
+        }
+    except (AttributeError, KeyError, TypeError):
+        # Malformed response
+        return None
+    gridpoint_index.put(latitude, longitude, gridpoint)
+    return gridpoint
+
+
+def format_period(period: dict) -> str:
+    """Format a forecast period into a readable string."""
+    return f"""
+{period['name']}:
+Temperature: {period['temperature']}°{period['temperatureUnit']}
+Wind: {period['windSpeed']} {period['windDirection']}
+Forecast: {period['detailedForecast']}
+"""
+
+
+async def forecast_for_location(location: Location) -> str:
+    label = location.name or f"{location.latitude},{location.longitude}"
+    gridpoint = await resolve_gridpoint(location.latitude, location.longitude)
+    if gridpoint is None:
+        return f"{label}: Unable to fetch forecast data for this location."
+
+    forecast_url = (
+        f"{NWS_API_BASE}/gridpoints/{gridpoint['grid_id']}/"
+        f"{gridpoint['grid_x']},{gridpoint['grid_y']}/forecast"
+    )
+    status, data = await fetch_nws(forecast_url)
+    try:
+        periods = [format_period(period) for period in data["properties"]["periods"][:FORECAST_PERIODS]]
+    except (KeyError, TypeError):
+        # Failed request or malformed response. Only a missing gridpoint means the index entry is
+        # outdated and must be resolved again; transient failures keep it.
+        if status in GRIDPOINT_GONE_STATUSES:
+            gridpoint_index.discard(location.latitude, location.longitude)
+        return f"{label}: Unable to fetch detailed forecast."
+
+    place = f" ({gridpoint['place']})" if gridpoint.get("place") else ""
+    return f"Forecast for {label}{place}:\n" + "\n---\n".join(periods)
+
+
+@mcp.tool()
+async def get_forecast(latitude: float, longitude: float) -> str:
+    """Get weather forecast for a location in the US.
+
+    Args:
+        latitude: Latitude of the location
+        longitude: Longitude of the location
+    """
+    result = await forecast_for_location(Location(latitude=latitude, longitude=longitude))
+    gridpoint_index.save()
+    return result
+
+
+@mcp.tool()
+async def get_forecasts(locations: list[Location]) -> str:
+    """Get weather forecasts for several US locations in one call. Prefer this over
+    calling get_forecast repeatedly when the user asks about multiple places.
+
+    Args:
+        locations: List of locations, each with latitude, longitude and an optional name (e.g. city name)
+    """
+    results = await asyncio.gather(*[forecast_for_location(location) for location in locations])
+    gridpoint_index.save()
+    return "\n===\n".join(results)
+
+
 if __name__ == "__main__":
     # Initialize and run the server
     mcp.run(transport='stdio')
\ No newline at end of file
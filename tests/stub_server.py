@@ -0,0 +1,108 @@
+"""
+测试使用的本地 HTTP 桩服务器
+
+在后台线程中运行 ThreadingHTTPServer，按路径返回测试设置的响应，并记录收到的请求和
+同时处理的最大请求数，测试无需访问网络。
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+@dataclass
+class StubResponse:
+    status: int = 200
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    # 返回响应前等待的时间（秒），用于模拟较慢的上游
+    delay: float = 0.0
+
+
+@dataclass
+class StubRequest:
+    path: str
+    headers: dict[str, str]
+
+
+# 根据请求生成响应；也可以直接设置固定的 StubResponse
+Route = Callable[[StubRequest], StubResponse] | StubResponse
+
+
+class StubServer:
+    """
+    本地 HTTP 桩服务器，用作上下文管理器
+
+    参数:
+        routes (dict[str, Route]): 路径（不含查询参数）到响应的映射，未设置的路径返回 404
+    """
+
+    def __init__(self, routes: dict[str, Route] | None = None):
+        self.routes: dict[str, Route] = dict(routes or {})
+        self.requests: list[StubRequest] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def count(self, path: str) -> int:
+        """收到的指定路径的请求数"""
+        return sum(1 for request in self.requests if request.path == path)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _respond(self, request: StubRequest) -> StubResponse:
+        route = self.routes.get(request.path.split("?", 1)[0])
+        if route is None:
+            return StubResponse(404, body=b"not found")
+        return route(request) if callable(route) else route
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                request = StubRequest(self.path, {k.lower(): v for k, v in self.headers.items()})
+                with stub._lock:
+                    stub.requests.append(request)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    response = stub._respond(request)
+                    if response.delay:
+                        time.sleep(response.delay)
+                    self.send_response(response.status)
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(response.body)))
+                    self.end_headers()
+                    self.wfile.write(response.body)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
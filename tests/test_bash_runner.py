@@ -0,0 +1,90 @@
+"""
+异步 bash 脚本执行（server/bash_runner.py）的测试
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from bash_runner import run_bash_script  # noqa: E402
+
+
+def process_running(pid: int) -> bool:
+    """进程存在并且不是僵尸进程（容器中被杀掉的孤儿进程可能没有被回收）"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class RunBashScriptTest(unittest.IsolatedAsyncioTestCase):
+    async def test_output_and_returncode(self):
+        result = await run_bash_script("echo out; echo err >&2; exit 3")
+
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.stdout, "out\n")
+        self.assertEqual(result.stderr, "err\n")
+        self.assertFalse(result.timed_out)
+
+    async def test_error_line_numbers_are_unchanged(self):
+        result = await run_bash_script("true\nno_such_command_xyz")
+
+        self.assertIn("line 2", result.stderr)
+
+    async def test_resource_limits(self):
+        result = await run_bash_script("ulimit -t; ulimit -v", cpu_seconds=7, memory_bytes=512 * 1024 * 1024)
+
+        self.assertEqual(result.stdout.split(), ["7", str(512 * 1024)])
+
+    async def test_output_cap_keeps_head_and_tail(self):
+        result = await run_bash_script(
+            "echo first; for i in $(seq 1 20000); do echo line $i; done; echo last", output_limit=1000
+        )
+
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(result.stdout.startswith("first\n"))
+        self.assertTrue(result.stdout.endswith("last\n"))
+        self.assertIn("已截断", result.stdout)
+        self.assertLess(len(result.stdout), 1100)
+
+    async def test_timeout_kills_the_process_group(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pid_file = os.path.join(tmpdir, "pid")
+            start = time.monotonic()
+            # 后台子进程继承了输出管道，只杀掉 bash 时读取会一直等待
+            result = await run_bash_script(f"sleep 60 & echo $! > {pid_file}; echo started; wait", timeout=0.5)
+            elapsed = time.monotonic() - start
+            with open(pid_file) as f:
+                child_pid = int(f.read())
+
+        self.assertTrue(result.timed_out)
+        self.assertIsNone(result.returncode)
+        self.assertEqual(result.stdout, "started\n")
+        self.assertLess(elapsed, 5)
+        self.assertFalse(process_running(child_pid))
+
+    async def test_progress_callback_receives_partial_output(self):
+        updates = []
+
+        async def on_progress(total_bytes, text):
+            updates.append((total_bytes, text))
+
+        result = await run_bash_script(
+            "printf '中文'; sleep 0.2; printf 'done'", progress_callback=on_progress, progress_interval=0
+        )
+
+        self.assertEqual(result.stdout, "中文done")
+        self.assertEqual("".join(text for _, text in updates), "中文done")
+        self.assertEqual(updates[-1][0], len("中文done".encode()))
+
+
+if __name__ == "__main__":
+    unittest.main()
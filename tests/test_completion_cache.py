@@ -0,0 +1,102 @@
+"""
+补全缓存（model/CachedModel.py、model/CompletionCache.py）的测试，模型使用 MockModel
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.CachedModel import CachedModel  # noqa: E402
+from model.CompletionCache import CompletionCache  # noqa: E402
+from model.MockModel import MockModel  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class CountingModel(MockModel):
+    """记录请求次数的 MockModel"""
+
+    def __init__(self):
+        super().__init__(tokens_per_second=0, time_to_first_token=0, thinking_tokens=3, answer_tokens=5)
+        self.requests = 0
+
+    async def get_chat_completion(self, messages, tools=None):
+        self.requests += 1
+        return await super().get_chat_completion(messages, tools)
+
+
+class ThreadRecordingCache(CompletionCache):
+    """记录持久层读写所在的线程"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.io_threads = set()
+
+    def _load(self, key):
+        self.io_threads.add(threading.get_ident())
+        return super()._load(key)
+
+    def _store(self, key, entry):
+        self.io_threads.add(threading.get_ident())
+        super()._store(key, entry)
+
+
+async def collect(stream) -> list[dict]:
+    return [chunk.model_dump(mode="json", exclude={"created"}) async for chunk in stream]
+
+
+class CompletionCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "completions.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def test_replays_cached_stream(self):
+        model = CountingModel()
+        cached = CachedModel(model, CompletionCache(path=self.path), nondeterministic_tools=["*"])
+
+        live = await collect(await cached.get_chat_completion(MESSAGES, []))
+        replayed = await collect(await cached.get_chat_completion(MESSAGES, []))
+
+        self.assertEqual(model.requests, 1)
+        self.assertEqual(replayed, live)
+        self.assertEqual(cached.cache.stats()["hits"], 1)
+
+    async def test_persistent_store_survives_restart_off_the_event_loop(self):
+        model = CountingModel()
+        first = CachedModel(model, ThreadRecordingCache(path=self.path))
+        live = await collect(await first.get_chat_completion(MESSAGES, []))
+
+        # 新的缓存实例内存层为空，从 SQLite 中读取
+        cache = ThreadRecordingCache(path=self.path)
+        restarted = CachedModel(model, cache)
+        replayed = await collect(await restarted.get_chat_completion(MESSAGES, []))
+
+        self.assertEqual(model.requests, 1)
+        self.assertEqual(replayed, live)
+        self.assertTrue(cache.io_threads)
+        self.assertNotIn(threading.get_ident(), first.cache.io_threads | cache.io_threads)
+
+    async def test_incomplete_stream_is_not_cached(self):
+        model = CountingModel()
+        cached = CachedModel(model, CompletionCache())
+
+        stream = await cached.get_chat_completion(MESSAGES, [])
+        await anext(stream)
+        await stream.aclose()
+        await collect(await cached.get_chat_completion(MESSAGES, []))
+
+        self.assertEqual(model.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
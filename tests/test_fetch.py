@@ -0,0 +1,170 @@
+"""
+fetch server 的测试，上游是本地的 HTTP 桩服务器，不访问网络
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import unittest
+
+from stub_server import StubRequest, StubResponse, StubServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+import fetch  # noqa: E402
+from http_cache import CachingHTTPClient  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+PAGE = """<html><head><title>Stub page</title></head><body>
+<nav><a href="/">Home</a></nav>
+<h2>Heading</h2><p>First paragraph with <a href="https://example.com">a link</a>.</p>
+</body></html>"""
+PAGE_MARKDOWN = (
+    "# Stub page\n\n## Heading\n\nFirst paragraph with [a link](https://example.com)."
+)
+NEXT_INDEX = re.compile(r"start_index of (\d+)")
+
+
+def html_response(body: str, **headers) -> StubResponse:
+    return StubResponse(
+        headers={"Content-Type": "text/html; charset=utf-8", **headers}, body=body.encode()
+    )
+
+
+def page_content(result: str, url: str) -> str:
+    """去掉工具结果的前缀和截断提示，只保留页面内容"""
+    prefix = f"Contents of {url}:\n"
+    assert result.startswith(prefix), result
+    return result[len(prefix) :].split("\n\n<error>Content truncated.")[0]
+
+
+class FetchToolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.stub.__enter__()
+        self.original = (fetch.http_client, fetch.content_cache, fetch.robots_cache)
+        fetch.http_client = CachingHTTPClient(max_connections_per_host=2, follow_redirects=True)
+        fetch.content_cache = fetch.ContentCache(1024 * 1024)
+        fetch.robots_cache = fetch.RobotsCache(60)
+
+    async def asyncTearDown(self):
+        await fetch.http_client.aclose()
+        fetch.http_client, fetch.content_cache, fetch.robots_cache = self.original
+        self.stub.__exit__(None, None, None)
+
+    async def test_extracts_markdown(self):
+        self.stub.routes["/page"] = html_response(PAGE)
+        url = self.stub.url("/page")
+
+        markdown = await fetch.fetch(url)
+        raw = await fetch.fetch(url, raw=True)
+
+        self.assertEqual(markdown, f"Contents of {url}:\n{PAGE_MARKDOWN}")
+        self.assertEqual(raw, f"Contents of {url}:\n{PAGE}")
+
+    async def test_fresh_response_served_from_cache(self):
+        self.stub.routes["/page"] = html_response(PAGE, **{"Cache-Control": "max-age=60"})
+        url = self.stub.url("/page")
+
+        first = await fetch.fetch(url)
+        second = await fetch.fetch(url)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.stub.count("/page"), 1)
+        self.assertEqual(fetch.http_client.stats.hits, 1)
+        self.assertEqual(fetch.content_cache.hits, 1)
+
+    async def test_revalidation_reuses_extracted_content(self):
+        def route(request: StubRequest) -> StubResponse:
+            headers = {"Cache-Control": "no-cache", "ETag": '"v1"'}
+            if request.headers.get("if-none-match") == '"v1"':
+                return StubResponse(304, headers=headers)
+            return html_response(PAGE, **headers)
+
+        self.stub.routes["/page"] = route
+        url = self.stub.url("/page")
+
+        first = await fetch.fetch(url)
+        second = await fetch.fetch(url)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.stub.count("/page"), 2)
+        self.assertEqual(self.stub.requests[-1].headers.get("if-none-match"), '"v1"')
+        self.assertEqual(fetch.http_client.stats.revalidated, 1)
+        # 304 返回的响应体与之前相同，不需要再次提取
+        self.assertEqual(fetch.content_cache.hits, 1)
+
+    async def test_per_host_connection_limit(self):
+        slow = html_response(PAGE)
+        slow.delay = 0.1
+        paths = [f"/page/{i}" for i in range(8)]
+        for path in paths:
+            self.stub.routes[path] = slow
+
+        results = await asyncio.gather(*[fetch.fetch(self.stub.url(path)) for path in paths])
+
+        self.assertTrue(all(PAGE_MARKDOWN in result for result in results))
+        self.assertEqual(self.stub.max_active, 2)
+
+    async def test_byte_offset_pagination(self):
+        text = "".join(f"第{i}行 line {i}\n" for i in range(40))
+        self.stub.routes["/text"] = StubResponse(
+            headers={"Content-Type": "text/plain; charset=utf-8", "Cache-Control": "max-age=60"},
+            body=text.encode(),
+        )
+        url = self.stub.url("/text")
+
+        for max_length in (1, 2, 7, 500):
+            pages, start_index = [], 0
+            while True:
+                result = await fetch.fetch(url, max_length=max_length, start_index=start_index)
+                pages.append(page_content(result, url))
+                match = NEXT_INDEX.search(result)
+                if match is None:
+                    break
+                self.assertGreater(int(match.group(1)), start_index)
+                start_index = int(match.group(1))
+            self.assertEqual("".join(pages), text, f"max_length={max_length}")
+
+        result = await fetch.fetch(url, start_index=len(text.encode()))
+        self.assertIn("No more content available", result)
+
+    async def test_robots_txt_is_checked_once_per_site(self):
+        self.stub.routes["/robots.txt"] = StubResponse(
+            headers={"Content-Type": "text/plain"},
+            body="User-agent: *\nDisallow: /private\n".encode(),
+        )
+        self.stub.routes["/page"] = html_response(PAGE)
+        self.stub.routes["/private/page"] = html_response(PAGE)
+
+        self.assertIn(PAGE_MARKDOWN, await fetch.fetch(self.stub.url("/page")))
+        with self.assertRaisesRegex(ValueError, "robots.txt"):
+            await fetch.fetch(self.stub.url("/private/page"))
+
+        self.assertEqual(self.stub.count("/robots.txt"), 1)
+        self.assertEqual(self.stub.count("/private/page"), 0)
+        self.assertEqual(fetch.robots_cache.stats(), {"sites": 1, "hits": 1, "misses": 1})
+
+    async def test_robots_txt_forbidden(self):
+        self.stub.routes["/robots.txt"] = StubResponse(403)
+        self.stub.routes["/page"] = html_response(PAGE)
+
+        with self.assertRaisesRegex(ValueError, "robots.txt"):
+            await fetch.fetch(self.stub.url("/page"))
+        self.assertEqual(self.stub.count("/page"), 0)
+
+    async def test_error_status(self):
+        self.stub.routes["/missing"] = StubResponse(404, body=b"missing")
+
+        with self.assertRaisesRegex(ValueError, "status code 404"):
+            await fetch.fetch(self.stub.url("/missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+文件系统 server 的索引（server/file_index.py）的测试
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+import file_index  # noqa: E402
+from file_index import FileIndex, InotifyWatcher, required_literals  # noqa: E402
+
+
+def write(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class IndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp(prefix="file-index-test-"))
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def path(self, relative: str) -> str:
+        return os.path.join(self.root, relative)
+
+    def build(self) -> FileIndex:
+        index = FileIndex([self.root])
+        index.load_or_build()
+        return index
+
+
+class SearchContentTest(IndexTestCase):
+    def setUp(self):
+        super().setUp()
+        write(self.path("a.py"), "def connect_database():\n    return open_pool()\n")
+        write(self.path("b.py"), "def close():\n    pass\n")
+        write(self.path("docs/notes.md"), "Connect the DATABASE before use.\n")
+        write(self.path(".git/config"), "connect_database\n")
+        with open(self.path("blob.bin"), "wb") as f:
+            f.write(b"\0connect_database")
+        self.index = self.build()
+
+    def test_literal_search_reads_only_candidates(self):
+        read_paths = []
+        read_bytes = file_index.read_bytes
+
+        def recording_read_bytes(path):
+            read_paths.append(path)
+            return read_bytes(path)
+
+        file_index.read_bytes = recording_read_bytes
+        try:
+            matches = self.index.search_content("connect_database", self.root)
+        finally:
+            file_index.read_bytes = read_bytes
+
+        self.assertEqual(read_paths, [self.path("a.py")])
+        self.assertEqual([(m.path, m.line) for m in matches], [(self.path("a.py"), 1)])
+
+    def test_regex_uses_required_literals(self):
+        self.assertEqual(required_literals(r"connect.*database", True), ["connect", "database"])
+
+        candidates = self.index.candidates(r"connect.*database", True, self.root, None)
+        matches = self.index.search_content(r"connect.*database", self.root, regex=True)
+
+        # trigram 不区分大小写，notes.md 也是候选文件；精确匹配也不区分大小写
+        self.assertEqual(candidates, [self.path("a.py"), self.path("docs/notes.md")])
+        self.assertEqual(
+            [m.path for m in matches], [self.path("a.py"), self.path("docs/notes.md")]
+        )
+
+    def test_case_sensitive_and_include(self):
+        matches = self.index.search_content("DATABASE", self.root, case_sensitive=True)
+        self.assertEqual([m.path for m in matches], [self.path("docs/notes.md")])
+
+        matches = self.index.search_content("database", self.root, include="*.md")
+        self.assertEqual([m.path for m in matches], [self.path("docs/notes.md")])
+
+    def test_no_trigram_falls_back_to_text_files(self):
+        candidates = self.index.candidates("a|b", True, self.root, None)
+
+        self.assertEqual(
+            candidates, [self.path("a.py"), self.path("b.py"), self.path("docs/notes.md")]
+        )
+
+    def test_refresh_updates_postings(self):
+        write(self.path("b.py"), "connect_database()\n")
+        os.remove(self.path("a.py"))
+        self.index.refresh_path(self.path("b.py"))
+        self.index.refresh_path(self.path("a.py"))
+
+        self.assertEqual(
+            self.index.candidates("connect_database", False, self.root, None), [self.path("b.py")]
+        )
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on Linux")
+class InotifyWatcherTest(IndexTestCase):
+    def setUp(self):
+        super().setUp()
+        write(self.path("sub/deep/a.txt"), "alpha")
+        self.index = self.build()
+        self.watcher = InotifyWatcher(self.index, debounce=0.05, max_delay=0.2)
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+
+    def wait_for(self, condition, timeout: float = 3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail(f"index did not update: {sorted(self.index.files)}")
+
+    def watched(self) -> list[str]:
+        return sorted(os.path.relpath(path, self.root) for path in self.watcher._watches.values())
+
+    def test_new_and_modified_files(self):
+        write(self.path("sub/b.txt"), "bravo")
+        self.wait_for(lambda: self.path("sub/b.txt") in self.index.files)
+
+        write(self.path("sub/b.txt"), "charlie")
+        self.wait_for(lambda: self.index.candidates("charlie", False, self.root, None))
+        os.remove(self.path("sub/b.txt"))
+        self.wait_for(lambda: self.path("sub/b.txt") not in self.index.files)
+
+    def test_renamed_directory_updates_watch_paths(self):
+        os.rename(self.path("sub"), self.path("sub2"))
+        self.wait_for(lambda: self.path("sub2/deep/a.txt") in self.index.files)
+
+        self.assertNotIn(self.path("sub/deep/a.txt"), self.index.files)
+        self.assertEqual(self.watched(), [".", "sub2", "sub2/deep"])
+
+        write(self.path("sub2/deep/c.txt"), "gamma")
+        self.wait_for(lambda: self.path("sub2/deep/c.txt") in self.index.files)
+        self.assertEqual(
+            self.index.candidates("gamma", False, self.root, None), [self.path("sub2/deep/c.txt")]
+        )
+
+    def test_directory_moved_out_of_the_tree(self):
+        outside = tempfile.mkdtemp(prefix="file-index-outside-")
+        self.addCleanup(shutil.rmtree, outside, True)
+
+        os.rename(self.path("sub"), os.path.join(outside, "sub"))
+        self.wait_for(lambda: not self.index.files)
+
+        self.assertEqual(self.watched(), ["."])
+
+    def test_directory_renamed_to_ignored_name(self):
+        os.rename(self.path("sub"), self.path("node_modules"))
+        self.wait_for(lambda: not self.index.files)
+
+        self.assertEqual(self.watched(), ["."])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+html_extract 的测试
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from html_extract import extract_content, html_to_markdown  # noqa: E402
+
+
+class HtmlToMarkdownTest(unittest.TestCase):
+    def test_structure(self):
+        html = """<html><head><title>Doc</title><style>p { color: red }</style></head>
+        <body><nav><a href="/">Home</a></nav>
+        <h2>Section</h2><p>Some <strong>bold</strong> and <a href="https://example.com">a link</a>.</p>
+        <ul><li>one</li><li>two</li></ul>
+        <pre>  indented
+    code</pre>
+        <script>var x = 1;</script><footer>footer</footer></body></html>"""
+
+        markdown = html_to_markdown(html)
+
+        self.assertEqual(
+            markdown,
+            "# Doc\n\n## Section\n\nSome **bold** and [a link](https://example.com).\n\n"
+            "- one\n- two\n\n```\n  indented\n    code\n```",
+        )
+
+    def test_unclosed_head_keeps_body(self):
+        markdown = html_to_markdown("<html><head><title>T</title><body><p>Body text</p>")
+
+        self.assertEqual(markdown, "# T\n\nBody text")
+
+    def test_unclosed_skipped_element_in_head_keeps_body(self):
+        markdown = html_to_markdown("<head><noscript><p>Enable JS</p><body><p>Body text</p>")
+
+        self.assertEqual(markdown, "Body text")
+
+    def test_options_without_end_tags(self):
+        markdown = html_to_markdown(
+            "<p>Choose:</p><select><option>a<option>b</select><p>After the select</p>"
+        )
+
+        self.assertEqual(markdown, "Choose:\n\nAfter the select")
+
+    def test_form_wrapping_body_keeps_content(self):
+        markdown = html_to_markdown(
+            "<html><body><form id=form1><div><h1>Title</h1><p>Main article text</p></div>"
+            "<input name=q value=secret><textarea>draft</textarea>"
+            "<select><option>a<option>b</select><button>Search</button></form></body></html>"
+        )
+
+        self.assertEqual(markdown, "# Title\n\nMain article text\n\nSearch")
+
+    def test_extract_content_raw_and_plain_text(self):
+        html = b"<html><body><p>x</p></body></html>"
+
+        self.assertEqual(extract_content(html, "text/html", "utf-8", raw=True), html.decode())
+        self.assertEqual(extract_content(html, "text/html; charset=utf-8", "utf-8", raw=False), "x")
+        self.assertEqual(extract_content(b"<p>x</p>", "text/plain", "utf-8", raw=False), "<p>x</p>")
+
+
+if __name__ == "__main__":
+    unittest.main()
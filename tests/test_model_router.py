@@ -0,0 +1,77 @@
+"""
+模型路由（model/ModelRouter.py）的测试
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.ModelRouter import ModelRouter  # noqa: E402
+
+
+class FakeStream:
+    """模拟 openai 的 AsyncStream：可迭代，并记录是否被关闭"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeProvider:
+    def __init__(self, name, chunks=None, error=None):
+        self.name = name
+        self.chunks = chunks or []
+        self.error = error
+        self.streams = []
+
+    async def get_chat_completion(self, messages, tools):
+        if self.error is not None:
+            raise self.error
+        stream = FakeStream(self.chunks)
+        self.streams.append(stream)
+        return stream
+
+
+class ModelRouterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_fails_over_to_next_provider(self):
+        broken = FakeProvider("broken", error=RuntimeError("boom"))
+        healthy = FakeProvider("healthy", chunks=["a", "b"])
+        router = ModelRouter([broken, healthy])
+
+        chunks = [chunk async for chunk in await router.get_chat_completion([], [])]
+
+        self.assertEqual(chunks, ["a", "b"])
+        self.assertEqual(router.stats["broken"].consecutive_failures, 1)
+        self.assertEqual(router.stats["healthy"].outstanding, 0)
+
+    async def test_early_stop_closes_provider_stream(self):
+        provider = FakeProvider("only", chunks=["a", "b", "c"])
+        router = ModelRouter([provider])
+
+        stream = await router.get_chat_completion([], [])
+        self.assertEqual(await anext(stream), "a")
+        await stream.aclose()
+
+        self.assertTrue(provider.streams[0].closed)
+        self.assertEqual(router.stats["only"].outstanding, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+工具计划（client/ToolPlan.py）中校验计划和替换引用的测试
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from client.ToolPlan import PlanError, lookup, resolve_references, validate_plan  # noqa: E402
+
+TOOLS = {"search", "read"}
+
+
+class ValidatePlanTest(unittest.TestCase):
+    def test_dependencies_from_references_and_depends_on(self):
+        steps = [
+            {"id": "a", "tool": "search", "arguments": {"q": "x"}},
+            {"id": "b", "tool": "read", "arguments": {"path": "${a.items.0}"}},
+            {"id": "c", "tool": "read", "depends_on": ["a", "b"]},
+        ]
+
+        self.assertEqual(validate_plan(steps, TOOLS), {"a": set(), "b": {"a"}, "c": {"a", "b"}})
+
+    def test_invalid_plans(self):
+        cases = {
+            "steps must be a list": {"id": "a", "tool": "search"},
+            "each step must be an object": ["a"],
+            "invalid step id": [{"id": "1a", "tool": "search"}],
+            "duplicate step id": [{"id": "a", "tool": "search"}, {"id": "a", "tool": "read"}],
+            "unknown tool": [{"id": "a", "tool": ["search"]}],
+            "unknown tool 'write'": [{"id": "a", "tool": "write"}],
+            "arguments of step 'a' must be an object": [{"id": "a", "tool": "search", "arguments": "x"}],
+            "depends_on of step 'a'": [{"id": "a", "tool": "search", "depends_on": 5}],
+            "must be a list of step ids": [{"id": "a", "tool": "search", "depends_on": [["b"]]}],
+            "unknown steps": [{"id": "a", "tool": "search", "arguments": {"q": "${b}"}}],
+            "dependency cycle": [
+                {"id": "a", "tool": "search", "depends_on": ["b"]},
+                {"id": "b", "tool": "read", "depends_on": ["a"]},
+            ],
+        }
+        for message, steps in cases.items():
+            with self.subTest(message), self.assertRaisesRegex(PlanError, message):
+                validate_plan(steps, TOOLS)
+
+
+class ReferenceTest(unittest.TestCase):
+    def test_lookup(self):
+        result = '{"items": [{"name": "first"}, {"name": "last"}], "count": 2}'
+
+        self.assertEqual(lookup(result, ""), result)
+        self.assertEqual(lookup(result, ".count"), 2)
+        self.assertEqual(lookup(result, ".items.0.name"), "first")
+        self.assertEqual(lookup(result, ".items.-1.name"), "last")
+        with self.assertRaisesRegex(PlanError, "field '2' not found"):
+            lookup(result, ".items.2")
+        with self.assertRaisesRegex(PlanError, "not JSON"):
+            lookup("plain text", ".field")
+
+    def test_resolve_references(self):
+        results = {"a": '{"city": "Paris", "ids": [1, 2]}', "b": "plain text"}
+        arguments = {
+            "ids": "${a.ids}",
+            "query": "weather in ${a.city}",
+            "nested": [{"text": "${b}"}, 3],
+            "ids_text": "ids: ${a.ids}",
+        }
+
+        self.assertEqual(
+            resolve_references(arguments, results),
+            {
+                # 整个字符串是引用时保留类型
+                "ids": [1, 2],
+                "query": "weather in Paris",
+                "nested": [{"text": "plain text"}, 3],
+                "ids_text": "ids: [1, 2]",
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
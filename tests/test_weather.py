@@ -0,0 +1,265 @@
+"""
+weather server 和 CachingHTTPClient 的测试，上游是本地的 NWS 桩服务器，不访问网络
+
+运行（在仓库根目录）:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import httpx
+
+from stub_server import StubRequest, StubResponse, StubServer
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+sys.path.insert(0, SERVER_DIR)
+# 导入 weather 之前设置缓存目录，避免写入仓库中的 .cache
+os.environ.setdefault("MCP_CACHE_DIR", tempfile.mkdtemp(prefix="weather-test-"))
+
+import weather  # noqa: E402
+from gridpoint_index import GridpointIndex  # noqa: E402
+from http_cache import CachingHTTPClient  # noqa: E402
+
+# FastMCP 把日志级别设为 INFO，关闭 httpx 的逐请求日志
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+POINTS_PATH = "/points/40.71,-74.01"
+FORECAST_PATH = "/gridpoints/OKX/33,35/forecast"
+ALERTS_PATH = "/alerts/active/area/NY"
+
+
+def json_response(data, status=200, **headers) -> StubResponse:
+    return StubResponse(
+        status,
+        headers={"Content-Type": "application/geo+json", **headers},
+        body=json.dumps(data).encode(),
+    )
+
+
+def points_response(**headers) -> StubResponse:
+    return json_response(
+        {
+            "properties": {
+                "gridId": "OKX",
+                "gridX": 33,
+                "gridY": 35,
+                "relativeLocation": {"properties": {"city": "New York", "state": "NY"}},
+            }
+        },
+        **headers,
+    )
+
+
+def forecast_response(**headers) -> StubResponse:
+    periods = [
+        {
+            "name": f"Period {i}",
+            "temperature": 60 + i,
+            "temperatureUnit": "F",
+            "windSpeed": "5 mph",
+            "windDirection": "NW",
+            "detailedForecast": "Sunny.",
+        }
+        for i in range(8)
+    ]
+    return json_response({"properties": {"periods": periods}}, **headers)
+
+
+class RevalidatingRoute:
+    """带 ETag 或 Last-Modified 的资源：条件请求匹配时返回 304"""
+
+    def __init__(self, etag=None, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __call__(self, request: StubRequest) -> StubResponse:
+        validators = {}
+        if self.etag:
+            validators["ETag"] = self.etag
+        if self.last_modified:
+            validators["Last-Modified"] = self.last_modified
+        if (self.etag and request.headers.get("if-none-match") == self.etag) or (
+            self.last_modified and request.headers.get("if-modified-since") == self.last_modified
+        ):
+            return StubResponse(304, headers={"Cache-Control": "max-age=0", **validators})
+        return forecast_response(**{"Cache-Control": "max-age=0", **validators})
+
+
+class CachingHTTPClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.stub.__enter__()
+        self.client = CachingHTTPClient()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.stub.__exit__(None, None, None)
+
+    async def test_fresh_response_served_from_cache(self):
+        self.stub.routes[FORECAST_PATH] = forecast_response(**{"Cache-Control": "max-age=60"})
+
+        first = await self.client.get(self.stub.url(FORECAST_PATH))
+        second = await self.client.get(self.stub.url(FORECAST_PATH))
+
+        self.assertEqual(self.stub.count(FORECAST_PATH), 1)
+        self.assertNotIn("from_cache", first.extensions)
+        self.assertTrue(second.extensions["from_cache"])
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.stats.hits, 1)
+
+    async def test_etag_revalidation(self):
+        self.stub.routes[FORECAST_PATH] = RevalidatingRoute(etag='"v1"')
+
+        first = await self.client.get(self.stub.url(FORECAST_PATH))
+        second = await self.client.get(self.stub.url(FORECAST_PATH))
+
+        self.assertEqual(self.stub.count(FORECAST_PATH), 2)
+        self.assertEqual(self.stub.requests[-1].headers.get("if-none-match"), '"v1"')
+        self.assertTrue(second.extensions["from_cache"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.stats.revalidated, 1)
+
+    async def test_last_modified_revalidation(self):
+        last_modified = "Mon, 02 Jun 2025 10:00:00 GMT"
+        self.stub.routes[FORECAST_PATH] = RevalidatingRoute(last_modified=last_modified)
+
+        await self.client.get(self.stub.url(FORECAST_PATH))
+        second = await self.client.get(self.stub.url(FORECAST_PATH))
+
+        self.assertEqual(self.stub.requests[-1].headers.get("if-modified-since"), last_modified)
+        self.assertTrue(second.extensions["from_cache"])
+        self.assertEqual(self.client.stats.revalidated, 1)
+
+    async def test_concurrent_requests_are_coalesced(self):
+        response = forecast_response(**{"Cache-Control": "max-age=60"})
+        response.delay = 0.2
+        self.stub.routes[FORECAST_PATH] = response
+
+        responses = await asyncio.gather(
+            *[self.client.get(self.stub.url(FORECAST_PATH)) for _ in range(5)]
+        )
+
+        self.assertEqual(self.stub.count(FORECAST_PATH), 1)
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+
+    async def test_error_response_is_not_cached(self):
+        self.stub.routes[FORECAST_PATH] = json_response({"detail": "boom"}, status=500)
+
+        first = await self.client.get(self.stub.url(FORECAST_PATH))
+        second = await self.client.get(self.stub.url(FORECAST_PATH))
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(second.status_code, 500)
+        self.assertEqual(self.stub.count(FORECAST_PATH), 2)
+
+    async def test_connection_error_reaches_every_waiter(self):
+        # 端口已关闭，所有合并的等待者都收到同一个异常
+        url = self.stub.url(FORECAST_PATH)
+        self.stub.__exit__(None, None, None)
+        self.stub = StubServer()
+        self.stub.__enter__()
+
+        results = await asyncio.gather(
+            *[self.client.get(url) for _ in range(3)], return_exceptions=True
+        )
+
+        self.assertTrue(all(isinstance(r, httpx.TransportError) for r in results))
+        self.assertEqual(self.client._inflight, {})
+
+
+class WeatherToolsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stub = StubServer(
+            {
+                POINTS_PATH: points_response(),
+                FORECAST_PATH: forecast_response(**{"Cache-Control": "max-age=60"}),
+            }
+        )
+        self.stub.__enter__()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.original = (weather.NWS_API_BASE, weather.http_client, weather.gridpoint_index)
+        weather.NWS_API_BASE = self.stub.base_url
+        weather.http_client = CachingHTTPClient()
+        weather.gridpoint_index = GridpointIndex(os.path.join(self.tmpdir.name, "gridpoints.json"))
+
+    async def asyncTearDown(self):
+        await weather.http_client.aclose()
+        weather.NWS_API_BASE, weather.http_client, weather.gridpoint_index = self.original
+        self.stub.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    async def test_forecast_uses_gridpoint_index_and_cache(self):
+        first = await weather.get_forecast(40.7128, -74.006)
+        second = await weather.get_forecast(40.7128, -74.006)
+
+        self.assertIn("Forecast for 40.7128,-74.006 (New York, NY)", first)
+        self.assertEqual(first.count("Temperature:"), weather.FORECAST_PERIODS)
+        self.assertEqual(second, first)
+        self.assertEqual(self.stub.count(POINTS_PATH), 1)
+        self.assertEqual(self.stub.count(FORECAST_PATH), 1)
+        # 网格点索引已写入磁盘，重启后无需再次查询
+        reloaded = GridpointIndex(weather.gridpoint_index.path)
+        self.assertEqual(reloaded.get(40.7128, -74.006)["grid_id"], "OKX")
+
+    async def test_get_forecasts_shares_requests(self):
+        locations = [
+            weather.Location(latitude=40.7128, longitude=-74.006, name=name)
+            for name in ("Manhattan", "Lower Manhattan")
+        ]
+
+        result = await weather.get_forecasts(locations)
+
+        self.assertIn("Forecast for Manhattan", result)
+        self.assertIn("Forecast for Lower Manhattan", result)
+        self.assertEqual(self.stub.count(FORECAST_PATH), 1)
+
+    async def test_alerts_error_path(self):
+        self.stub.routes[ALERTS_PATH] = json_response({"detail": "boom"}, status=500)
+
+        result = await weather.get_alerts("NY")
+
+        self.assertEqual(result, "Unable to fetch alerts or no alerts found.")
+
+    async def test_forecast_error_path(self):
+        self.stub.routes[POINTS_PATH] = json_response({"detail": "boom"}, status=500)
+
+        result = await weather.get_forecast(40.7128, -74.006)
+
+        self.assertIn("Unable to fetch forecast data for this location", result)
+        self.assertIsNone(weather.gridpoint_index.get(40.7128, -74.006))
+
+
+    async def test_transient_forecast_failure_keeps_gridpoint(self):
+        self.stub.routes[FORECAST_PATH] = json_response({"detail": "unavailable"}, status=503)
+
+        result = await weather.get_forecast(40.7128, -74.006)
+
+        self.assertIn("Unable to fetch detailed forecast", result)
+        self.assertIsNotNone(weather.gridpoint_index.get(40.7128, -74.006))
+
+    async def test_missing_gridpoint_is_dropped_from_index(self):
+        self.stub.routes[FORECAST_PATH] = json_response({"detail": "not found"}, status=404)
+
+        result = await weather.get_forecast(40.7128, -74.006)
+
+        self.assertIn("Unable to fetch detailed forecast", result)
+        self.assertIsNone(weather.gridpoint_index.get(40.7128, -74.006))
+
+    async def test_malformed_forecast(self):
+        self.stub.routes[FORECAST_PATH] = json_response({"properties": {"updated": "now"}})
+
+        result = await weather.get_forecast(40.7128, -74.006)
+
+        self.assertIn("Unable to fetch detailed forecast", result)
+        self.assertIsNotNone(weather.gridpoint_index.get(40.7128, -74.006))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1 +1,2 @@
-SERVER_CONFIG_FILE = ".server_config.json"
\ No newline at end of file
+SERVER_CONFIG_FILE = ".server_config.json"
+MODEL_CONFIG_FILE = ".model_config.json"
\ No newline at end of file
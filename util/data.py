@@ -1,14 +1,29 @@
 from dataclasses import dataclass
-from mcp.types import CallToolResult
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mcp.types import CallToolResult
+
 
 @dataclass
 class AssistantResponseChunk:
     type: str
-    content: str | dict 
+    content: str | dict
+
 
 @dataclass
 class ToolCallInfo:
     id: str
     name: str
     args: dict
-    result: CallToolResult
\ No newline at end of file
+    result: "CallToolResult"
+
+
+@dataclass
+class ToolCallProgress:
+    id: str
+    name: str
+    progress: float
+    total: float | None = None
+    # 自上一次通知以来的新消息（如部分输出），没有时为空字符串
+    message: str = ""
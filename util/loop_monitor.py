@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from util.mytools import percentiles
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    事件循环延迟监控和阻塞调用检测
+
+    事件循环中的心跳协程每隔 interval 秒唤醒一次，记录实际唤醒时间比预期晚了多少（循环延迟）；
+    后台看门狗线程发现心跳超过 threshold 秒没有更新时，抓取事件循环线程当前的调用栈，
+    这就是正在阻塞循环的代码。循环恢复后将这次卡顿连同持续时间、调用栈、当时运行的任务和
+    通过 context() 登记的上下文（工具名、会话等）写入日志，指定 report_file 时追加为 JSON Lines。
+
+    参数:
+        name (str): 进程名称，出现在报告中
+        threshold (float): 心跳停顿超过该秒数时视为卡顿
+        interval (float): 心跳间隔（秒）
+        report_file (str): 卡顿报告的 JSON Lines 文件，None 表示只写日志
+        max_samples (int): 保留的循环延迟样本数量
+        max_stalls (int): 保留的最近卡顿报告数量
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: float = 0.25,
+        interval: float = 0.05,
+        report_file: Optional[str] = None,
+        max_samples: int = 2000,
+        max_stalls: int = 20,
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.interval = interval
+        self.report_file = report_file
+        self.samples: deque[float] = deque(maxlen=max_samples)
+        self.stalls: deque[dict] = deque(maxlen=max_stalls)
+        self.stall_count = 0
+        self._contexts: weakref.WeakKeyDictionary[asyncio.Task, dict] = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        # 看门狗发现但尚未结束的卡顿
+        self._pending: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, name: str, default_enabled: bool = True) -> Optional["LoopMonitor"]:
+        """
+        根据 LOOP_MONITOR_* 环境变量创建监控器
+
+        LOOP_MONITOR_ENABLED 为 0 时返回 None，为 1 时开启，未设置时由 default_enabled 决定。
+        """
+        if os.getenv("LOOP_MONITOR_ENABLED", "1" if default_enabled else "0") == "0":
+            return None
+        return cls(
+            name,
+            threshold=float(os.getenv("LOOP_MONITOR_THRESHOLD", 0.25)),
+            report_file=os.getenv("LOOP_MONITOR_REPORT_FILE") or None,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start(self):
+        """在当前正在运行的事件循环中启动监控"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    @contextmanager
+    def context(self, **fields):
+        """为当前任务登记上下文信息，任务阻塞事件循环时会出现在卡顿报告中"""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        previous = self._contexts.get(task)
+        self._contexts[task] = {**(previous or {}), **fields}
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._contexts.pop(task, None)
+            else:
+                self._contexts[task] = previous
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.samples.append(max(0.0, now - start - self.interval))
+            with self._lock:
+                self._last_beat = now
+                pending, self._pending = self._pending, None
+            if pending is not None:
+                self._finish_stall(pending, now)
+
+    def _watch(self):
+        while not self._stop.wait(min(self.interval, self.threshold / 2)):
+            with self._lock:
+                blocked_for = time.monotonic() - self._last_beat
+                if blocked_for < self.threshold or self._pending is not None:
+                    continue
+                self._pending = self._capture(blocked_for)
+
+    def _capture(self, blocked_for: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        return {
+            "process": self.name,
+            "pid": os.getpid(),
+            "detected_after": round(blocked_for, 3),
+            "started_at": self._last_beat,
+            "task": task.get_name() if task is not None else None,
+            "context": dict(self._contexts.get(task) or {}) if task is not None else {},
+            "stack": traceback.format_stack(frame) if frame is not None else [],
+        }
+
+    def _finish_stall(self, stall: dict, now: float):
+        stall["duration"] = round(now - stall.pop("started_at") - self.interval, 3)
+        stall["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.stall_count += 1
+        self.stalls.append(stall)
+        logger.warning(
+            f"Event loop blocked for {stall['duration']}s in {self.name} "
+            f"(task={stall['task']}, context={stall['context']}):\n{''.join(stall['stack'])}"
+        )
+        if self.report_file:
+            try:
+                with open(self.report_file, "a") as f:
+                    f.write(json.dumps(stall) + "\n")
+            except OSError as e:
+                logger.warning(f"Cannot write loop monitor report {self.report_file}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "process": self.name,
+            "running": self.running,
+            "threshold": self.threshold,
+            "loop_lag": percentiles(self.samples),
+            "stall_count": self.stall_count,
+            "recent_stalls": [
+                {key: value for key, value in stall.items() if key != "stack"} | {"top_frame": stall["stack"][-1:]}
+                for stall in self.stalls
+            ],
+        }
@@ -19,4 +19,30 @@ def is_valid_json(json_str):
         json.loads(json_str)
         return True
     except json.JSONDecodeError:
-        return False
\ No newline at end of file
+        return False
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数量
+
+    ASCII 字符约 4 个对应一个 token，其它字符（如中文）按每个字符一个 token 计算。
+    """
+    ascii_chars = len(text.encode("ascii", errors="ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+def percentiles(values) -> dict:
+    """延迟等样本的 p50/p95/p99、平均值和最大值，没有样本时返回空字典"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pick(50), 4),
+        "p95": round(pick(95), 4),
+        "p99": round(pick(99), 4),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "max": round(ordered[-1], 4),
+    }
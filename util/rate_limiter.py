@@ -0,0 +1,208 @@
+import asyncio
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# 响应头中 x-ratelimit-*-<bucket> 的后缀与令牌桶名称的对应关系
+HEADER_BUCKETS = {"requests": "requests", "tokens": "tokens", "": "requests"}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """解析 "1.5"、"20ms"、"6m0s"、"1h2m3s" 形式的时长（秒）"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """从 retry-after-ms 或 Retry-After（秒数或 HTTP 日期）中取得需要等待的秒数"""
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    每分钟限额的令牌桶
+
+    预约式扣减：请求到来时立即扣除令牌，余额可以为负，调用方按照余额恢复到 0 所需的时间等待。
+    先到的请求总是先被放行，等价于一个按到达顺序排队的等待队列。
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """扣除 amount 个令牌，返回需要等待的秒数"""
+        self.refill(now)
+        # 单次请求超过容量时只要求桶是满的，否则永远无法放行
+        amount = min(amount, self.capacity)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def set_limit(self, per_minute: float):
+        if per_minute <= 0 or per_minute == self.capacity:
+            return
+        self.level = self.level * per_minute / self.capacity
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+
+
+class RateLimiter:
+    """
+    请求数（RPM）和 token 数（TPM）两个令牌桶组成的限流器，线程安全，同步和异步调用方都可以使用
+
+    调用方在发出请求前调用 acquire / acquire_async，超出限额时排队等待而不是失败。
+    响应返回后调用 update_from_headers，根据 x-ratelimit-* 头调整限额和余额，
+    根据 Retry-After 暂停所有请求。未配置的桶会在响应头首次给出限额时自动创建。
+
+    参数:
+        name (str): 限流器名称，用于指标
+        requests_per_minute (float): 每分钟请求数上限，None 表示不限制
+        tokens_per_minute (float): 每分钟 token 数上限，None 表示不限制
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.name = name
+        self.buckets: dict[str, TokenBucket] = {}
+        if requests_per_minute:
+            self.buckets["requests"] = TokenBucket(requests_per_minute)
+        if tokens_per_minute:
+            self.buckets["tokens"] = TokenBucket(tokens_per_minute)
+        # 在此时间之前暂停所有请求（来自 Retry-After）
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.throttled = 0
+        self.rate_limited_responses = 0
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            amounts = {"requests": 1, "tokens": tokens}
+            for name, bucket in self.buckets.items():
+                if amounts[name]:
+                    delay = max(delay, bucket.reserve(amounts[name], now))
+            if delay > 0:
+                self.throttled += 1
+                self.total_wait += delay
+            return delay
+
+    def acquire(self, tokens: float = 0):
+        """阻塞当前线程直到可以发出请求"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            with self._lock:
+                self.waiting += 1
+            try:
+                time.sleep(delay)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+    async def acquire_async(self, tokens: float = 0):
+        """等待直到可以发出请求，不阻塞事件循环"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.waiting -= 1
+
+    def update_from_headers(self, headers: Mapping[str, str], status_code: Optional[int] = None):
+        headers = {key.lower(): value for key, value in headers.items()}
+        with self._lock:
+            now = time.monotonic()
+            for suffix, name in HEADER_BUCKETS.items():
+                suffix = f"-{suffix}" if suffix else ""
+                limit = _to_float(headers.get(f"x-ratelimit-limit{suffix}"))
+                remaining = _to_float(headers.get(f"x-ratelimit-remaining{suffix}"))
+                if limit:
+                    if name not in self.buckets:
+                        self.buckets[name] = TokenBucket(limit)
+                    self.buckets[name].set_limit(limit)
+                if remaining is not None and name in self.buckets:
+                    bucket = self.buckets[name]
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, remaining)
+                # 限额已经用完时，在重置之前暂停
+                reset = headers.get(f"x-ratelimit-reset{suffix}")
+                if remaining is not None and remaining <= 0 and reset:
+                    reset_after = parse_duration(reset)
+                    if reset_after is not None:
+                        self.paused_until = max(self.paused_until, now + reset_after)
+
+            retry_after = parse_retry_after(headers)
+            if status_code == 429:
+                self.rate_limited_responses += 1
+                if retry_after is None:
+                    retry_after = 1.0
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in self.buckets.items():
+                bucket.refill(now)
+                buckets[name] = {
+                    "capacity": bucket.capacity,
+                    "level": round(bucket.level, 2),
+                    "fill_ratio": round(bucket.level / bucket.capacity, 4),
+                }
+            return {
+                "name": self.name,
+                "buckets": buckets,
+                "paused_for": round(max(0.0, self.paused_until - now), 3),
+                "waiting": self.waiting,
+                "throttled": self.throttled,
+                "rate_limited_responses": self.rate_limited_responses,
+                "total_wait": round(self.total_wait, 3),
+            }
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
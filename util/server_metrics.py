@@ -0,0 +1,350 @@
+"""
+MCP Server 的资源占用和工具调用统计
+
+通过 /proc 采样每个 stdio server 进程（包括它启动的子进程，如 npx 启动的 node）的内存、CPU 时间、
+打开的文件描述符数和运行时间，并统计每个工具的调用次数、错误次数和耗时分布。
+统计结果可以通过本地 HTTP 端点以 Prometheus 文本格式（/metrics）或 JSON（/metrics.json）读取，
+也可以定期写入 JSON 文件。只依赖标准库；没有 /proc 的系统上只有工具调用统计。
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 工具调用耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+    PAGE_SIZE = 4096
+
+
+@dataclass
+class ProcessSample:
+    pid: int
+    # 进程树中的进程数（server 进程及其所有子孙进程）
+    processes: int
+    rss_bytes: int
+    cpu_seconds: float
+    open_fds: int
+    uptime_seconds: float
+
+
+def _read_stat(pid: int) -> Optional[list[str]]:
+    """读取 /proc/<pid>/stat 中进程名之后的字段（进程名可能包含空格）"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def _read_cmdline(pid: int) -> list[str]:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return [arg.decode(errors="replace") for arg in f.read().split(b"\0") if arg]
+    except OSError:
+        return []
+
+
+def _parent_map() -> dict[int, list[int]]:
+    """父进程 pid -> 子进程 pid 列表"""
+    children: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        stat = _read_stat(int(entry))
+        if stat is not None:
+            children.setdefault(int(stat[1]), []).append(int(entry))
+    return children
+
+
+def _system_uptime() -> float:
+    with open("/proc/uptime", "r") as f:
+        return float(f.read().split()[0])
+
+
+def find_server_pids(servers: dict[str, dict], claimed: set[int]) -> dict[str, int]:
+    """
+    在当前进程的子进程中找出各个 server 的进程
+
+    stdio_client 没有暴露子进程，这里按命令行匹配：子进程的命令行以配置中的 args 结尾
+    （npx、uvx 等脚本经过解释器启动，argv[0] 会变成解释器）。已经被其它 server 占用的 pid 不会重复分配。
+
+    参数:
+        servers (dict): server 名称 -> 启动配置（command、args）
+        claimed (set): 已经分配的 pid
+    """
+    candidates = [pid for pid in _parent_map().get(os.getpid(), []) if pid not in claimed]
+    cmdlines = {pid: _read_cmdline(pid) for pid in candidates}
+    found = {}
+    for name, config in servers.items():
+        args = list(config.get("args", []))
+        command = os.path.basename(config.get("command", ""))
+        for pid, cmdline in cmdlines.items():
+            if pid in found.values() or not cmdline:
+                continue
+            if args and cmdline[-len(args) :] == args or not args and os.path.basename(cmdline[0]) == command:
+                found[name] = pid
+                break
+    return found
+
+
+def sample_process_tree(pid: int, children: Optional[dict[int, list[int]]] = None) -> Optional[ProcessSample]:
+    """采样 pid 及其所有子孙进程的资源占用，进程已退出或没有 /proc 时返回 None"""
+    stat = _read_stat(pid)
+    if stat is None:
+        return None
+    children = _parent_map() if children is None else children
+    try:
+        # 字段序号见 proc(5)：utime=14, stime=15, starttime=22, rss=24，这里从第 3 个字段开始计数
+        uptime = _system_uptime() - int(stat[19]) / CLOCK_TICKS
+    except (OSError, ValueError):
+        uptime = 0.0
+
+    processes = rss = fds = 0
+    cpu = 0.0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        current_stat = stat if current == pid else _read_stat(current)
+        if current_stat is None:
+            continue
+        processes += 1
+        cpu += (int(current_stat[11]) + int(current_stat[12])) / CLOCK_TICKS
+        rss += int(current_stat[21]) * PAGE_SIZE
+        try:
+            fds += len(os.listdir(f"/proc/{current}/fd"))
+        except OSError:
+            pass
+        pending.extend(children.get(current, []))
+    return ProcessSample(
+        pid=pid,
+        processes=processes,
+        rss_bytes=rss,
+        cpu_seconds=round(cpu, 2),
+        open_fds=fds,
+        uptime_seconds=round(uptime, 1),
+    )
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    latency_sum: float = 0.0
+    # 每个桶的计数（不累计），最后一个元素为超过最大桶上限的调用
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def observe(self, duration: float, is_error: bool):
+        self.calls += 1
+        self.errors += int(is_error)
+        self.latency_sum += duration
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+
+class ServerMetrics:
+    """按 (server, tool) 统计工具调用，server 重新加载后统计数据保留"""
+
+    def __init__(self):
+        self.tools: dict[tuple[str, str], ToolStats] = {}
+
+    def record_call(self, server: str, tool: str, duration: float, is_error: bool):
+        stats = self.tools.get((server, tool))
+        if stats is None:
+            stats = self.tools[(server, tool)] = ToolStats()
+        stats.observe(duration, is_error)
+
+
+def _labels(**labels) -> str:
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def snapshot(metrics: ServerMetrics, servers: dict[str, dict]) -> dict:
+    """
+    生成统计快照
+
+    参数:
+        metrics (ServerMetrics): 工具调用统计
+        servers (dict): server 名称 -> {"pid": int | None, "in_flight": int}
+    """
+    children = _parent_map()
+    result = {"timestamp": time.time(), "servers": {}, "tools": []}
+    for name, info in servers.items():
+        sample = sample_process_tree(info["pid"], children) if info.get("pid") else None
+        result["servers"][name] = {
+            "pid": info.get("pid"),
+            "in_flight": info.get("in_flight", 0),
+            "process": asdict(sample) if sample else None,
+        }
+    # 在线程中调用时，事件循环可能同时在添加新的工具，先复制一份
+    for (server, tool), stats in sorted(list(metrics.tools.items())):
+        result["tools"].append({"server": server, "tool": tool, **asdict(stats)})
+    return result
+
+
+def prometheus_text(data: dict) -> str:
+    """把 snapshot 的结果转换为 Prometheus 文本格式"""
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(**labels)} {value}")
+
+    servers = data["servers"]
+    processes = {name: info["process"] for name, info in servers.items() if info["process"]}
+    metric("mcp_server_up", "gauge", "Whether the MCP server process is running",
+           [({"server": name}, int(name in processes)) for name in servers])
+    metric("mcp_server_in_flight_calls", "gauge", "Tool calls currently in flight",
+           [({"server": name}, info["in_flight"]) for name, info in servers.items()])
+    metric("mcp_server_processes", "gauge", "Processes in the server process tree",
+           [({"server": name, "pid": p["pid"]}, p["processes"]) for name, p in processes.items()])
+    metric("mcp_server_resident_memory_bytes", "gauge", "Resident memory of the server process tree",
+           [({"server": name}, p["rss_bytes"]) for name, p in processes.items()])
+    metric("mcp_server_cpu_seconds_total", "counter", "User and system CPU time of the server process tree",
+           [({"server": name}, p["cpu_seconds"]) for name, p in processes.items()])
+    metric("mcp_server_open_fds", "gauge", "Open file descriptors of the server process tree",
+           [({"server": name}, p["open_fds"]) for name, p in processes.items()])
+    metric("mcp_server_uptime_seconds", "gauge", "Seconds since the server process started",
+           [({"server": name}, p["uptime_seconds"]) for name, p in processes.items()])
+
+    tools = data["tools"]
+    metric("mcp_tool_calls_total", "counter", "Tool calls",
+           [({"server": t["server"], "tool": t["tool"]}, t["calls"]) for t in tools])
+    metric("mcp_tool_errors_total", "counter", "Tool calls that raised or returned an error",
+           [({"server": t["server"], "tool": t["tool"]}, t["errors"]) for t in tools])
+    lines.append("# HELP mcp_tool_call_duration_seconds Tool call latency")
+    lines.append("# TYPE mcp_tool_call_duration_seconds histogram")
+    for t in tools:
+        labels = {"server": t["server"], "tool": t["tool"]}
+        cumulative = 0
+        for bound, count in zip([*LATENCY_BUCKETS, "+Inf"], t["buckets"]):
+            cumulative += count
+            lines.append(f"mcp_tool_call_duration_seconds_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"mcp_tool_call_duration_seconds_sum{_labels(**labels)} {round(t['latency_sum'], 6)}")
+        lines.append(f"mcp_tool_call_duration_seconds_count{_labels(**labels)} {t['calls']}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    统计数据导出：本地 HTTP 端点和/或定期写入的 JSON 文件
+
+    参数:
+        collect (Callable): 返回 snapshot 结果的函数，在线程中调用（采样需要读取 /proc）
+        port (int): HTTP 端点端口，None 表示不启动
+        host (str): HTTP 端点监听地址
+        dump_file (str): 定期写入 JSON 快照的文件，None 表示不写入
+        interval (float): 写入 JSON 文件的间隔（秒）
+    """
+
+    def __init__(
+        self,
+        collect: Callable[[], dict],
+        port: Optional[int] = None,
+        host: str = "127.0.0.1",
+        dump_file: Optional[str] = None,
+        interval: float = 60.0,
+    ):
+        self.collect = collect
+        self.port = port
+        self.host = host
+        self.dump_file = dump_file
+        self.interval = interval
+        self._server: Optional[asyncio.Server] = None
+        self._dump_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, collect: Callable[[], dict]) -> Optional["MetricsExporter"]:
+        """根据 MCP_METRICS_* 环境变量创建导出器，MCP_METRICS_PORT 和 MCP_METRICS_FILE 都未设置时返回 None"""
+        port = os.getenv("MCP_METRICS_PORT")
+        dump_file = os.getenv("MCP_METRICS_FILE")
+        if not port and not dump_file:
+            return None
+        return cls(
+            collect,
+            port=int(port) if port else None,
+            host=os.getenv("MCP_METRICS_HOST", "127.0.0.1"),
+            dump_file=dump_file or None,
+            interval=float(os.getenv("MCP_METRICS_INTERVAL", 60)),
+        )
+
+    async def start(self):
+        if self.port is not None and self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"MCP server metrics available at http://{self.host}:{self.port}/metrics")
+        if self.dump_file and self._dump_task is None:
+            self._dump_task = asyncio.create_task(self._dump_periodically(), name="mcp-metrics-dump")
+
+    async def stop(self):
+        if self._dump_task is not None:
+            self._dump_task.cancel()
+            self._dump_task = None
+            # 退出前写入最后一次快照
+            await self.dump()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def dump(self):
+        data = await asyncio.to_thread(self.collect)
+        tmp_path = f"{self.dump_file}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.dump_file)
+        except OSError as e:
+            logger.warning(f"Cannot write MCP server metrics to {self.dump_file}: {e}")
+
+    async def _dump_periodically(self):
+        while True:
+            await self.dump()
+            await asyncio.sleep(self.interval)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # 读取并丢弃请求头
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+            if path == "/metrics":
+                status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+                body = prometheus_text(await asyncio.to_thread(self.collect))
+            elif path == "/metrics.json":
+                status, content_type = "200 OK", "application/json"
+                body = json.dumps(await asyncio.to_thread(self.collect), indent=2)
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "Not Found\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,101 @@
+"""
+启动耗时统计和导入耗时分析
+
+在入口脚本的最开始导入本模块（它只依赖标准库），记录进程启动到各个阶段（如第一次出现输入提示）
+的耗时；设置 STARTUP_METRICS_FILE 时每次启动的记录会以 JSON Lines 格式追加到该文件，便于跟踪冷启动时间。
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# 本模块被导入时的时间，无法读取进程启动时间时以此为起点
+_IMPORTED_AT = time.perf_counter()
+
+
+def process_uptime() -> float:
+    """进程启动到现在的秒数（包括解释器初始化）；非 Linux 系统上从本模块被导入时开始计算"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # 第 22 个字段为进程启动时间（开机后的时钟周期数），进程名可能包含空格，从右括号之后开始解析
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _IMPORTED_AT
+
+
+class StartupTimer:
+    """记录启动过程中各个阶段距进程启动的耗时"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.marks: dict[str, float] = {}
+        self._reported = False
+
+    def mark(self, stage: str):
+        self.marks[stage] = round(process_uptime(), 3)
+
+    def report(self, stage: str = "first_prompt"):
+        """记录最后一个阶段并输出本次启动的耗时，只在第一次调用时生效"""
+        if self._reported:
+            return
+        self._reported = True
+        self.mark(stage)
+        record = {
+            "app": self.name,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cold_start": self.marks[stage],
+            "marks": self.marks,
+        }
+        logger.info(f"startup: {json.dumps(record)}")
+        metrics_file = os.getenv("STARTUP_METRICS_FILE")
+        if metrics_file:
+            try:
+                with open(metrics_file, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Cannot write startup metrics {metrics_file}: {e}")
+
+
+def profile_imports(module: str, top: int = 25) -> list[dict]:
+    """
+    在子进程中以 -X importtime 导入 module，返回累计导入耗时最多的 top 个模块
+
+    返回:
+        list[dict]: [{"module", "self_ms", "cumulative_ms"}]，按 cumulative_ms 从大到小排序
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.getcwd(),
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append(
+                {
+                    "module": match.group(4),
+                    "self_ms": int(match.group(1)) / 1000,
+                    "cumulative_ms": int(match.group(2)) / 1000,
+                }
+            )
+    if result.returncode != 0:
+        logger.warning(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+
+
+def print_import_profile(module: str, top: int = 25):
+    rows = profile_imports(module, top)
+    print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+    for row in rows:
+        print(f"{row['cumulative_ms']:>16.1f} {row['self_ms']:>10.1f}  {row['module']}")